@@ -1,33 +1,26 @@
-import os
-import io
 import time
 import random
-import torch
 import requests
 import base64
-import json
-import re
 from PIL import Image
 from io import BytesIO
-from .utils import pil2tensor, tensor2pil
+from .utils import pil2tensor, fingerprint_inputs, tensor_to_png_base64, estimate_encode_bytes, Base64ImageSink
+from .streaming_json import parse_chunks
+from .http_timing import timed_session
+from .metrics import StageTimer, stage, timed_iter, record_api_call
+from . import json_codec
+from .prompt_compiler import build_port_mapping, rewrite_image_refs
+from .config_service import get_config, update_config
+from .memory_governor import MEMORY_GOVERNOR, PeakMemoryTracker
+from .tutu_logging import get_logger, configure_logging, LazyJSON
 
+logger = get_logger("banana_pro")
 
-def get_config():
-    """获取配置文件"""
-    try:
-        config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Tutuapi.json')
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        return config
-    except:
-        return {}
+# 响应中以流式方式直接解码为图片的base64字段（谷歌 inlineData.data / T8Star b64_json）
+STREAMED_IMAGE_PATHS = (("inlineData", "data"), ("inline_data", "data"))
 
 
-def save_config(config):
-    """保存配置文件"""
-    config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Tutuapi.json')
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=4)
+configure_logging(get_config())
 
 
 class TutuNanoBananaPro:
@@ -117,10 +110,23 @@ class TutuNanoBananaPro:
     FUNCTION = "generate"
     CATEGORY = "Tutu"
     
+    @classmethod
+    def IS_CHANGED(cls, seed=0, api_provider="", aspect_ratio="", image_size="",
+                   google_api_key="", t8star_api_key="", enable_google_search=False, **linked_inputs):
+        """
+        种子为0时每次都重新生成；否则按控件值判断是否需要重新调用API
+        （ComfyUI 只向 IS_CHANGED 传入控件值，提示词和图片等连线输入的变化由执行缓存自行判断）
+        """
+        return fingerprint_inputs(
+            seed, api_provider, aspect_ratio, image_size,
+            google_api_key, t8star_api_key, enable_google_search
+        )
+    
     def __init__(self):
         config = get_config()
         self.google_api_key = config.get('google_api_key', '')
         self.t8star_api_key = config.get('t8star_api_key', '')
+        MEMORY_GOVERNOR.configure_from(config)
     
     def get_api_config(self, api_provider):
         """获取API配置"""
@@ -138,17 +144,19 @@ class TutuNanoBananaPro:
             }
     
     def save_api_key(self, google_key=None, t8star_key=None):
-        """保存API密钥到配置文件"""
-        config = get_config()
+        """保存API密钥到配置文件（仅在密钥变化时写入）"""
+        changes = {}
         if google_key is not None:
-            config['google_api_key'] = google_key
+            changes['google_api_key'] = google_key
             self.google_api_key = google_key
-            print(f"[Tutu] Google API密钥已保存")
         if t8star_key is not None:
-            config['t8star_api_key'] = t8star_key
+            changes['t8star_api_key'] = t8star_key
             self.t8star_api_key = t8star_key
-            print(f"[Tutu] T8Star API密钥已保存")
-        save_config(config)
+        if changes and update_config(changes):
+            if 'google_api_key' in changes:
+                logger.info("Google API密钥已保存")
+            if 't8star_api_key' in changes:
+                logger.info("T8Star API密钥已保存")
     
     def add_random_variation(self, prompt, seed=0):
         """
@@ -166,6 +174,19 @@ class TutuNanoBananaPro:
         
         return f"{prompt} [variation-{random_id}]"
     
+    def iter_encoded_images(self, input_images):
+        """
+        逐张转换并编码输入图片（流式处理）
+        每次只持有一张图片的中间数据，编码完成后立即释放，
+        并通过全局内存调度器限制同时进行的大图编码数量
+        """
+        for i, img_tensor in enumerate(input_images):
+            if img_tensor is None:
+                continue
+            with MEMORY_GOVERNOR.reserve(estimate_encode_bytes(img_tensor)):
+                img_base64 = tensor_to_png_base64(img_tensor, optimize=True, quality=95)
+            yield i + 1, img_base64
+    
     def build_request_payload(self, prompt, input_images, enable_google_search, aspect_ratio, image_size, seed, provider):
         """构建API请求 - 根据provider选择格式"""
         if provider == "google":
@@ -175,58 +196,30 @@ class TutuNanoBananaPro:
     
     def build_google_payload(self, prompt, input_images, enable_google_search, aspect_ratio, image_size, seed):
         """构建谷歌官方 Gemini API 格式的请求"""
-        # 添加随机变化因子
-        varied_prompt = self.add_random_variation(prompt, seed)
-        
         # 构建端口号到数组索引的映射
-        port_to_array_map = {}  # 端口号 -> 数组索引
-        array_idx = 0
-        for port_idx, img in enumerate(input_images, 1):
-            if img is not None:
-                array_idx += 1
-                port_to_array_map[port_idx] = array_idx
+        port_to_array_map = build_port_mapping(input_images)
         
-        # 自动转换提示词中的图片引用（端口号 -> 数组索引）
-        import re
-        original_prompt = varied_prompt
-        for port_num, array_num in port_to_array_map.items():
-            # 替换各种可能的引用格式
-            patterns = [
-                (rf'图{port_num}(?![0-9])', f'图{array_num}'),  # 图2 -> 图1
-                (rf'图片{port_num}(?![0-9])', f'图片{array_num}'),  # 图片2 -> 图片1
-                (rf'第{port_num}张图', f'第{array_num}张图'),  # 第2张图 -> 第1张图
-                (rf'第{port_num}个图', f'第{array_num}个图'),  # 第2个图 -> 第1个图
-            ]
-            for pattern, replacement in patterns:
-                varied_prompt = re.sub(pattern, replacement, varied_prompt)
+        # 自动转换提示词中的图片引用（端口号 -> 数组索引），先转换再添加随机变化因子
+        converted_prompt = rewrite_image_refs(prompt, port_to_array_map)
+        varied_prompt = self.add_random_variation(converted_prompt, seed)
         
         # 构建 contents 数组（Google官方格式）
         parts = []
         
-        # 添加所有输入图片 - 保持原始索引位置
+        # 添加所有输入图片 - 保持原始索引位置（逐张编码，控制峰值内存）
         array_position = 0  # 追踪在API数组中的实际位置
-        for i in range(len(input_images)):
-            img_tensor = input_images[i]
-            if img_tensor is not None:
-                # 转换为PIL图片
-                pil_image = tensor2pil(img_tensor)[0]
-                
-                # 转换为base64
-                buffered = BytesIO()
-                pil_image.save(buffered, format="PNG", optimize=True, quality=95)
-                img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                
-                # 添加图片到parts
-                parts.append({
-                    "inline_data": {
-                        "mime_type": "image/png",
-                        "data": img_base64
-                    }
-                })
-                
-                # 输出时显示真实的图片编号（i+1 对应 input_image_1 到 input_image_14）
-                array_position += 1
-                print(f"[Tutu] 已添加输入端口 {i+1} 的图片, Base64大小: {len(img_base64)} 字符")
+        for port_num, img_base64 in self.iter_encoded_images(input_images):
+            # 添加图片到parts
+            parts.append({
+                "inline_data": {
+                    "mime_type": "image/png",
+                    "data": img_base64
+                }
+            })
+            
+            # 输出时显示真实的图片编号（port_num 对应 input_image_1 到 input_image_14）
+            array_position += 1
+            logger.debug("已添加输入端口 %s 的图片, Base64大小: %s 字符", port_num, len(img_base64))
         
         # 添加文本提示词
         parts.append({
@@ -250,53 +243,35 @@ class TutuNanoBananaPro:
         # 如果启用搜索增强，添加tools
         if enable_google_search:
             payload["tools"] = [{"google_search": {}}]
-            print(f"[Tutu] 已启用Google搜索增强")
+            logger.info("已启用Google搜索增强")
         
-        print(f"[Tutu] 图像配置: {aspect_ratio} @ {image_size}")
-        print(f"[Tutu] 输入图片数: {len([img for img in input_images if img is not None])}")
+        logger.info("图像配置: %s @ %s", aspect_ratio, image_size)
+        logger.info("输入图片数: %s", len([img for img in input_images if img is not None]))
         
         # 添加图片索引映射提示
         if array_position > 0:
-            print(f"[Tutu] 🔍 自动映射转换（端口号 → API数组索引）:")
+            logger.info("🔍 自动映射转换（端口号 → API数组索引）:")
             for port_num, array_num in port_to_array_map.items():
-                print(f"[Tutu]    - 图{port_num} → 图{array_num} (端口{port_num} → API第{array_num}张)")
+                logger.info("   - 图%s → 图%s (端口%s → API第%s张)", port_num, array_num, port_num, array_num)
         
         # 打印提示词转换
-        if original_prompt != varied_prompt:
-            print(f"[Tutu] 📝 提示词已自动转换:")
-            print(f"[Tutu]    原始: {original_prompt}")
-            print(f"[Tutu]    转换后: {varied_prompt}")
+        if converted_prompt != prompt:
+            logger.info("📝 提示词已自动转换:")
+            logger.debug("   原始: %s", prompt)
+            logger.debug("   转换后: %s", varied_prompt)
         else:
-            print(f"[Tutu] 📝 最终发送给模型的提示词: {varied_prompt}")
+            logger.debug("📝 最终发送给模型的提示词: %s", varied_prompt)
         
         return payload
     
     def build_t8star_payload(self, prompt, input_images, aspect_ratio, image_size, seed):
         """构建T8Star API格式的请求 (OpenAI Dall-e 格式)"""
-        # 添加随机变化因子
-        varied_prompt = self.add_random_variation(prompt, seed)
-        
         # 构建端口号到数组索引的映射
-        port_to_array_map = {}  # 端口号 -> 数组索引
-        array_idx = 0
-        for port_idx, img in enumerate(input_images, 1):
-            if img is not None:
-                array_idx += 1
-                port_to_array_map[port_idx] = array_idx
+        port_to_array_map = build_port_mapping(input_images)
         
-        # 自动转换提示词中的图片引用（端口号 -> 数组索引）
-        import re
-        original_prompt = varied_prompt
-        for port_num, array_num in port_to_array_map.items():
-            # 替换各种可能的引用格式
-            patterns = [
-                (rf'图{port_num}(?![0-9])', f'图{array_num}'),  # 图2 -> 图1
-                (rf'图片{port_num}(?![0-9])', f'图片{array_num}'),  # 图片2 -> 图片1
-                (rf'第{port_num}张图', f'第{array_num}张图'),  # 第2张图 -> 第1张图
-                (rf'第{port_num}个图', f'第{array_num}个图'),  # 第2个图 -> 第1个图
-            ]
-            for pattern, replacement in patterns:
-                varied_prompt = re.sub(pattern, replacement, varied_prompt)
+        # 自动转换提示词中的图片引用（端口号 -> 数组索引），先转换再添加随机变化因子
+        converted_prompt = rewrite_image_refs(prompt, port_to_array_map)
+        varied_prompt = self.add_random_variation(converted_prompt, seed)
         
         # 构建payload - T8Star固定使用 nano-banana-2 (香蕉2/gemini-3-pro-image-preview)
         payload = {
@@ -309,45 +284,39 @@ class TutuNanoBananaPro:
         
         # 添加参考图片（如果有）
         image_array = []
-        for i in range(len(input_images)):
-            img_tensor = input_images[i]
-            if img_tensor is not None:
-                # 转换为PIL图片
-                pil_image = tensor2pil(img_tensor)[0]
-                
-                # 转换为base64
-                buffered = BytesIO()
-                pil_image.save(buffered, format="PNG", optimize=True, quality=95)
-                img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-                
-                # T8Star使用data URI格式
-                data_uri = f"data:image/png;base64,{img_base64}"
-                image_array.append(data_uri)
-                
-                print(f"[Tutu] 已添加输入端口 {i+1} 的图片, Base64大小: {len(img_base64)} 字符")
+        for port_num, img_base64 in self.iter_encoded_images(input_images):
+            # T8Star使用data URI格式
+            image_array.append(f"data:image/png;base64,{img_base64}")
+            logger.debug("已添加输入端口 %s 的图片, Base64大小: %s 字符", port_num, len(img_base64))
         
         if image_array:
             payload["image"] = image_array
         
-        print(f"[Tutu] 图像配置: {aspect_ratio} @ {image_size}")
-        print(f"[Tutu] 输入图片数: {len(image_array)}")
+        logger.info("图像配置: %s @ %s", aspect_ratio, image_size)
+        logger.info("输入图片数: %s", len(image_array))
         
         # 添加图片索引映射提示
         if image_array:
-            print(f"[Tutu] 🔍 自动映射转换（端口号 → API数组索引）:")
+            logger.info("🔍 自动映射转换（端口号 → API数组索引）:")
             for port_num, array_num in port_to_array_map.items():
-                print(f"[Tutu]    - 图{port_num} → 图{array_num} (端口{port_num} → API第{array_num}张)")
+                logger.info("   - 图%s → 图%s (端口%s → API第%s张)", port_num, array_num, port_num, array_num)
         
         # 打印提示词转换
-        if original_prompt != varied_prompt:
-            print(f"[Tutu] 📝 提示词已自动转换:")
-            print(f"[Tutu]    原始: {original_prompt}")
-            print(f"[Tutu]    转换后: {varied_prompt}")
+        if converted_prompt != prompt:
+            logger.info("📝 提示词已自动转换:")
+            logger.debug("   原始: %s", prompt)
+            logger.debug("   转换后: %s", varied_prompt)
         else:
-            print(f"[Tutu] 📝 最终发送给模型的提示词: {varied_prompt}")
+            logger.debug("📝 最终发送给模型的提示词: %s", varied_prompt)
         
         return payload
     
+    def image_sink_for(self, path):
+        """流式解析回调：图片base64字段交给解码器，其余字段正常保留"""
+        if path[-2:] in STREAMED_IMAGE_PATHS or path[-1:] == ("b64_json",):
+            return Base64ImageSink()
+        return None
+    
     def parse_response(self, response_json, provider):
         """解析API响应 - 根据provider选择格式"""
         if provider == "google":
@@ -389,15 +358,21 @@ class TutuNanoBananaPro:
                 if "inlineData" in part:
                     # 图片数据
                     inline_data = part["inlineData"]
-                    if "data" in inline_data:
+                    data = inline_data.get("data")
+                    if isinstance(data, str):
                         # Base64格式
-                        image_url = f"data:{inline_data.get('mimeType', 'image/png')};base64,{inline_data['data']}"
+                        image_url = f"data:{inline_data.get('mimeType', 'image/png')};base64,{data}"
                         images.append(image_url)
+                    elif data is not None:
+                        # 流式解析时已直接解码为PIL图片
+                        images.append(data)
+                    elif "data" in inline_data:
+                        logger.warning("⚠️ 图片数据解码失败，已跳过")
                 elif "text" in part:
                     # 文本数据
                     text_parts.append(part["text"])
             
-            print(f"[Tutu] 解析到 {len(images)} 张图片, {len(text_parts)} 段文本")
+            logger.info("解析到 %s 张图片, %s 段文本", len(images), len(text_parts))
             
             return {
                 'images': images,
@@ -406,8 +381,8 @@ class TutuNanoBananaPro:
             }
             
         except Exception as e:
-            print(f"[Tutu] 响应解析错误: {str(e)}")
-            print(f"[Tutu] 响应内容: {json.dumps(response_json, indent=2, ensure_ascii=False)[:500]}")
+            logger.error("响应解析错误: %s", str(e))
+            logger.debug("响应内容: %s", LazyJSON(response_json))
             raise Exception(f"响应解析失败: {str(e)}")
     
     def parse_t8star_response(self, response_json):
@@ -428,12 +403,15 @@ class TutuNanoBananaPro:
             for item in response_json["data"]:
                 if "url" in item:
                     images.append(item["url"])
-                elif "b64_json" in item:
+                elif isinstance(item.get("b64_json"), str):
                     # 如果返回base64格式
                     image_url = f"data:image/png;base64,{item['b64_json']}"
                     images.append(image_url)
+                elif item.get("b64_json") is not None:
+                    # 流式解析时已直接解码为PIL图片
+                    images.append(item["b64_json"])
             
-            print(f"[Tutu] 解析到 {len(images)} 张图片")
+            logger.info("解析到 %s 张图片", len(images))
             
             return {
                 'images': images,
@@ -442,40 +420,59 @@ class TutuNanoBananaPro:
             }
             
         except Exception as e:
-            print(f"[Tutu] 响应解析错误: {str(e)}")
-            print(f"[Tutu] 响应内容: {json.dumps(response_json, indent=2, ensure_ascii=False)[:500]}")
+            logger.error("响应解析错误: %s", str(e))
+            logger.debug("响应内容: %s", LazyJSON(response_json))
             raise Exception(f"响应解析失败: {str(e)}")
     
-    def decode_image(self, image_url):
-        """下载或解码图片"""
+    def decode_image(self, image_url, reserve_bytes=0):
+        """下载或解码图片（通过全局内存调度器限制并发解码）"""
         try:
-            if image_url.startswith('data:image/'):
-                # Base64图片
-                base64_data = image_url.split(',', 1)[1]
-                image_data = base64.b64decode(base64_data)
-                pil_image = Image.open(BytesIO(image_data))
-            else:
-                # HTTP URL图片 - 使用独立session避免代理连接复用问题
-                session = requests.Session()
-                session.trust_env = True
-                try:
-                    response = session.get(image_url, timeout=60)
-                    response.raise_for_status()
-                    pil_image = Image.open(BytesIO(response.content))
-                finally:
-                    session.close()
-            
-            # 转换为RGB模式
-            if pil_image.mode != 'RGB':
-                pil_image = pil_image.convert('RGB')
-            
-            print(f"[Tutu] 图片解码成功: {pil_image.size}")
-            return pil2tensor(pil_image)
+            with MEMORY_GOVERNOR.reserve(reserve_bytes):
+                if isinstance(image_url, Image.Image):
+                    # 流式解析时已解码
+                    pil_image = image_url
+                elif image_url.startswith('data:image/'):
+                    # Base64图片
+                    with stage("decode"):
+                        base64_data = image_url.split(',', 1)[1]
+                        image_data = base64.b64decode(base64_data)
+                        del base64_data
+                        pil_image = Image.open(BytesIO(image_data))
+                        pil_image.load()
+                else:
+                    # HTTP URL图片 - 使用独立session避免代理连接复用问题
+                    session = timed_session()
+                    session.trust_env = True
+                    try:
+                        with stage("download"):
+                            response = session.get(image_url, timeout=60)
+                            response.raise_for_status()
+                            image_data = response.content
+                    finally:
+                        session.close()
+                    with stage("decode"):
+                        pil_image = Image.open(BytesIO(image_data))
+                        pil_image.load()
+                
+                # 转换为RGB模式
+                with stage("decode"):
+                    if pil_image.mode != 'RGB':
+                        pil_image = pil_image.convert('RGB')
+                
+                logger.info("图片解码成功: %s", pil_image.size)
+                with stage("tensor"):
+                    return pil2tensor(pil_image)
             
         except Exception as e:
-            print(f"[Tutu] 图片解码失败: {str(e)}")
+            logger.error("图片解码失败: %s", str(e))
             raise
     
+    def estimate_decode_bytes(self, image_size):
+        """估算解码一张输出图片所需的临时内存（压缩数据 + RGB + float32张量）"""
+        size_map = {"1K": 1024, "2K": 2048, "4K": 4096}
+        pixels = size_map.get(image_size, 2048) ** 2
+        return pixels * 3 * 2 + pixels * 3 * 4
+    
     def create_default_image(self, aspect_ratio, image_size):
         """创建默认占位图"""
         # 宽高比映射
@@ -515,12 +512,17 @@ class TutuNanoBananaPro:
         """
         主处理函数 - 支持多种API提供商
         """
-        print(f"\n[Tutu] ========== 🍌 香蕉模型专业版开始处理 ==========")
-        print(f"[Tutu] API提供商: {api_provider}")
-        print(f"[Tutu] 分辨率: {image_size} @ {aspect_ratio}")
-        print(f"[Tutu] 提示词长度: {len(prompt)} 字符")
-        print(f"[Tutu] 随机种子: {seed}")
+        logger.info("\n========== 🍌 香蕉模型专业版开始处理 ==========")
+        logger.info("API提供商: %s", api_provider)
+        logger.info("分辨率: %s @ %s", image_size, aspect_ratio)
+        logger.info("提示词长度: %s 字符", len(prompt))
+        logger.info("随机种子: %s", seed)
         
+        config = self.get_api_config(api_provider)
+        # 峰值内存统计与分阶段耗时（写入响应文本和 /tutu/metrics）
+        mem_tracker = PeakMemoryTracker().start()
+        timer = StageTimer().activate()
+        status = None
         try:
             # 1. 准备输入图片 - 保持为完整数组，不过滤None以保持索引对应
             input_images = [
@@ -532,18 +534,17 @@ class TutuNanoBananaPro:
             
             # 统计非None图片数量
             non_none_count = len([img for img in input_images if img is not None])
-            print(f"[Tutu] 输入图片: {non_none_count} 张")
+            logger.info("输入图片: %s 张", non_none_count)
             
             # 显示具体连接了哪些端口
             connected_ports = [i+1 for i, img in enumerate(input_images) if img is not None]
             if connected_ports:
-                print(f"[Tutu] 已连接的输入端口: {connected_ports}")
+                logger.info("已连接的输入端口: %s", connected_ports)
             
             if non_none_count > 14:
-                print(f"[Tutu] ⚠️ 警告: 输入图片超过14张，只使用前14张")
+                logger.warning("⚠️ 警告: 输入图片超过14张，只使用前14张")
             
-            # 2. 获取API配置
-            config = self.get_api_config(api_provider)
+            # 2. API配置
             provider = config['provider']
             
             # 3. 确定使用哪个API Key
@@ -562,7 +563,7 @@ class TutuNanoBananaPro:
                 if t8star_api_key.strip():
                     self.save_api_key(t8star_key=t8star_api_key)
             
-            print(f"[Tutu] API Key: {api_key[:10]}***")
+            logger.info("API Key: %s***", api_key[:10])
             
             # 4. 构建请求
             payload = self.build_request_payload(
@@ -582,70 +583,94 @@ class TutuNanoBananaPro:
                 }
             
             # 6. 发送请求
-            print(f"[Tutu] 发送请求到: {config['endpoint']}")
-            print(f"[Tutu] 模型: {config['model']}")
-            print(f"[Tutu] 模式: {'img2img' if non_none_count > 0 else 'text2img'}")
+            logger.info("发送请求到: %s", config['endpoint'])
+            logger.info("模型: %s", config['model'])
+            logger.info("模式: %s", 'img2img' if non_none_count > 0 else 'text2img')
             
             start_time = time.time()
             
+            with stage("serialize"):
+                body = json_codec.dumps(payload)
+            # 序列化后释放payload中的base64图片数据
+            del payload
+            
             # 使用独立session避免代理连接复用问题
-            session = requests.Session()
+            session = timed_session()
             session.trust_env = True
             try:
-                response = session.post(
-                    config['endpoint'],
-                    headers=headers,
-                    json=payload,
-                    timeout=180
-                )
+                # stream=True: 响应体边接收边解析，图片base64直接流入解码器
+                # ttfb 不含其中的 connect/upload 阶段，只计等待响应头的时间
+                with stage("ttfb"):
+                    response = session.post(
+                        config['endpoint'],
+                        headers=headers,
+                        data=body,
+                        timeout=180,
+                        stream=True
+                    )
+                
+                # 请求已发送，释放请求体后再解码结果
+                del body
+                mem_tracker.checkpoint()
+                
+                logger.info("响应状态: %s (等待: %.1f秒)", response.status_code, time.time() - start_time)
+                
+                # 检查HTTP错误
+                if response.status_code != 200:
+                    status = str(response.status_code)
+                    error_text = response.text[:500]
+                    logger.error("错误响应: %s", error_text)
+                    raise Exception(f"API错误 ({response.status_code}): {error_text}")
+                
+                # 7. 增量解析响应（必须在session关闭前读取响应体）
+                # receive: 等待网络数据; parse: JSON解析; decode: 流式图片解码
+                with MEMORY_GOVERNOR.reserve(self.estimate_decode_bytes(image_size)), stage("parse"):
+                    chunks = timed_iter("receive", response.iter_content(chunk_size=64 * 1024))
+                    response_json = parse_chunks(chunks, self.image_sink_for)
             finally:
                 session.close()
             
             elapsed = time.time() - start_time
-            print(f"[Tutu] 响应状态: {response.status_code} (耗时: {elapsed:.1f}秒)")
+            logger.info("响应接收完成 (耗时: %.1f秒)", elapsed)
             
-            # 检查HTTP错误
-            if response.status_code != 200:
-                error_text = response.text[:500]
-                print(f"[Tutu] 错误响应: {error_text}")
-                raise Exception(f"API错误 ({response.status_code}): {error_text}")
-            
-            # 7. 解析响应
-            result = self.parse_response(response.json(), provider)
+            result = self.parse_response(response_json, provider)
+            del response_json
             
             if not result['success'] or not result['images']:
-                print(f"[Tutu] ⚠️ 未生成图片")
-                print(f"[Tutu] 响应文本: {result['text'][:200]}")
+                logger.warning("⚠️ 未生成图片")
+                logger.info("响应文本: %s", result['text'][:200])
+                status = "no_image"
                 raise Exception("未生成图片。可能原因：\n1. 提示词不够清晰\n2. 模型理解为纯文本任务\n3. API限制\n\n请调整提示词后重试。")
             
             # 8. 下载/解码所有图片，选择分辨率最大的
-            print(f"[Tutu] 开始解码图片 (共 {len(result['images'])} 张)...")
+            logger.info("开始解码图片 (共 %s 张)...", len(result['images']))
             decoded_images = []
             
             for idx, img_url in enumerate(result['images'], 1):
                 try:
-                    tensor = self.decode_image(img_url)
+                    tensor = self.decode_image(img_url, self.estimate_decode_bytes(image_size))
                     # 获取图片尺寸 (batch, height, width, channels)
                     h, w = tensor.shape[1:3]
                     resolution = h * w
                     decoded_images.append((tensor, w, h, resolution, idx))
-                    print(f"[Tutu] 图片 {idx}: {w}x{h} (像素总数: {resolution:,})")
+                    logger.info("图片 %s: %sx%s (像素总数: %s)", idx, w, h, format(resolution, ','))
                 except Exception as e:
-                    print(f"[Tutu] ⚠️ 图片 {idx} 解码失败: {str(e)}")
+                    logger.warning("⚠️ 图片 %s 解码失败: %s", idx, str(e))
             
             if not decoded_images:
+                status = "decode_error"
                 raise Exception("所有图片解码失败")
             
             # 按分辨率排序，选择最大的
             decoded_images.sort(key=lambda x: x[3], reverse=True)
             image_tensor, final_w, final_h, final_res, selected_idx = decoded_images[0]
-            print(f"[Tutu] ✓ 已选择图片 {selected_idx}: {final_w}x{final_h} (最高分辨率)")
+            logger.info("✓ 已选择图片 %s: %sx%s (最高分辨率)", selected_idx, final_w, final_h)
             
             # 如果有多张图片，显示未选择的图片信息
             if len(decoded_images) > 1:
-                print(f"[Tutu] 其他图片已忽略:")
+                logger.info("其他图片已忽略:")
                 for tensor, w, h, res, idx in decoded_images[1:]:
-                    print(f"[Tutu]   - 图片 {idx}: {w}x{h}")
+                    logger.info("  - 图片 %s: %sx%s", idx, w, h)
             
             # 9. 格式化响应文本
             timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -662,36 +687,49 @@ class TutuNanoBananaPro:
             if provider == "google":
                 formatted_response += f"\n**搜索增强**: {'是' if enable_google_search else '否'}"
             
-            formatted_response += f"\n**生成时间**: {elapsed:.1f} 秒\n\n✓ 生成成功"
+            mem_tracker.checkpoint()
+            formatted_response += f"\n**生成时间**: {elapsed:.1f} 秒"
+            formatted_response += f"\n**峰值内存**: {mem_tracker.summary()}"
+            formatted_response += f"\n**阶段耗时**: {timer.summary()}\n\n✓ 生成成功"
             
             # 如果有返回的文本，添加到响应中
             if result['text'].strip():
                 formatted_response += f"\n\n**模型返回文本**:\n{result['text']}"
             
-            print(f"[Tutu] ========== ✓ 处理完成 ==========\n")
+            logger.info("========== ✓ 处理完成 ==========\n")
             
+            status = "ok"
             return (image_tensor, formatted_response)
             
         except requests.exceptions.Timeout:
+            status = "timeout"
             error_msg = "❌ 请求超时（180秒）\n\n可能原因：\n1. 网络连接不稳定\n2. 图片太多/太大\n3. API服务响应慢\n\n建议：减少输入图片数量或稍后重试"
-            print(f"[Tutu] {error_msg}")
+            error_msg += f"\n\n**阶段耗时**: {timer.summary()}"
+            logger.error("%s", error_msg)
             default_image = self.create_default_image(aspect_ratio, image_size)
             return (default_image, error_msg)
             
         except requests.exceptions.RequestException as e:
+            status = "network_error"
             error_msg = f"❌ 网络请求错误: {str(e)}\n\n请检查：\n1. 网络连接\n2. API端点是否可访问\n3. API密钥是否正确"
-            print(f"[Tutu] {error_msg}")
+            error_msg += f"\n\n**阶段耗时**: {timer.summary()}"
+            logger.error("%s", error_msg)
             default_image = self.create_default_image(aspect_ratio, image_size)
             return (default_image, error_msg)
             
         except Exception as e:
-            error_msg = f"❌ 错误: {str(e)}"
-            print(f"[Tutu] {error_msg}")
-            print(f"[Tutu] 详细错误: {repr(e)}")
+            error_msg = f"❌ 错误: {str(e)}\n\n**阶段耗时**: {timer.summary()}"
+            logger.error("%s", error_msg)
+            logger.debug("详细错误: %r", e)
             
             # 返回默认图和错误信息
             default_image = self.create_default_image(aspect_ratio, image_size)
             return (default_image, error_msg)
+        
+        finally:
+            mem_tracker.stop()
+            timer.deactivate()
+            record_api_call(timer, config['provider'], config['model'], status or "error")
 
 
 # 节点注册
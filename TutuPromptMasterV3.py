@@ -12,9 +12,9 @@ import os
 import sys
 
 try:
-    from .template_adapter import PromptTemplateAdapter
+    from .template_adapter import get_template_adapter
 except ImportError:
-    from template_adapter import PromptTemplateAdapter
+    from template_adapter import get_template_adapter
 
 
 class TutuPromptMasterV3:
@@ -28,15 +28,10 @@ class TutuPromptMasterV3:
     - One-click template loading and combination
     """
     
-    def __init__(self):
-        """Initialize with template adapter"""
-        try:
-            self.adapter = PromptTemplateAdapter()
-            self.initialized = True
-        except Exception as e:
-            print(f"[Tutu v3] ERROR: Failed to initialize adapter: {e}")
-            self.adapter = None
-            self.initialized = False
+    @property
+    def adapter(self):
+        """Shared template catalog (loaded on first use, not per node instance)"""
+        return get_template_adapter()
     
     @classmethod
     def INPUT_TYPES(cls):
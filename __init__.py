@@ -2,11 +2,16 @@ from .Tutu import NODE_CLASS_MAPPINGS as TUTU_MAPPINGS, NODE_DISPLAY_NAME_MAPPIN
 from .TutuPromptMasterV3 import NODE_CLASS_MAPPINGS as PROMPT_V3_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as PROMPT_V3_DISPLAY_MAPPINGS
 from .TutuNanoBananaPro import NODE_CLASS_MAPPINGS as BANANA_PRO_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as BANANA_PRO_DISPLAY_MAPPINGS
 import aiohttp.web
-from .template_adapter import PromptTemplateAdapter
+from .template_adapter import get_template_adapter, warm_up_template_adapter
 from .user_templates_manager import UserTemplatesManager
+from . import json_codec
+from .search_index import search_indexes, fuse_rankings
+from .thumbnails import THUMBNAIL_FORMATS, ThumbnailService
+from .http_cache import ResponseCache, etag_matches, respond
+from .background_io import LinePipe, run_blocking, run_in_thread
+from .metrics import REGISTRY as METRICS_REGISTRY
+import asyncio
 import server
-import os
-import json
 from pathlib import Path
 
 # 合并所有节点映射
@@ -14,13 +19,91 @@ NODE_CLASS_MAPPINGS = {**TUTU_MAPPINGS, **PROMPT_V3_MAPPINGS, **BANANA_PRO_MAPPI
 NODE_DISPLAY_NAME_MAPPINGS = {**TUTU_DISPLAY_MAPPINGS, **PROMPT_V3_DISPLAY_MAPPINGS, **BANANA_PRO_DISPLAY_MAPPINGS}
 
 # --- Tutu API ---
-# Initialize adapter once
-ADAPTER_INSTANCE = PromptTemplateAdapter()
+# The template catalog is shared with the node and loaded lazily;
+# warm it up in the background so ComfyUI startup isn't blocked
+warm_up_template_adapter()
 USER_TEMPLATES_MANAGER = UserTemplatesManager()
 
 # Base directory for this extension
 EXTENSION_DIR = Path(__file__).parent
 
+# Bundled example images of the built-in templates (served by /tutu/images)
+IMAGES_DIR = (EXTENSION_DIR / "gpt4o-image-prompts-master" / "gpt4o-image-prompts-master" / "images").resolve()
+
+# The bundled images never change at runtime; clients revalidate with the ETag
+# / Last-Modified validators after a day instead of re-downloading
+IMAGE_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+
+# Resized gallery images (?w= / ?format= on /tutu/images), cached on disk
+THUMBNAIL_SERVICE = ThumbnailService(str(EXTENSION_DIR / ".cache" / "thumbnails"))
+
+# Tiles per row of a /tutu/contact-sheet sprite
+CONTACT_SHEET_COLUMNS = 10
+
+
+# Serialized (and compressed) bodies of the read-only routes, validated by ETag
+RESPONSE_CACHE = ResponseCache()
+
+
+def json_response(data, status=200):
+    """JSON response encoded with the fastest available codec"""
+    return aiohttp.web.Response(body=json_codec.dumps(data), status=status, content_type="application/json")
+
+
+async def load_template_adapter():
+    """The shared catalog; waits off the event loop while it is still being loaded"""
+    return await run_blocking(get_template_adapter)
+
+
+async def catalog_response(request, key, build):
+    """Cached, ETag-validated, compressed response for built-in catalog data"""
+    adapter = await load_template_adapter()
+    return await respond(request, RESPONSE_CACHE, key, adapter.catalog_version, build)
+
+
+@server.PromptServer.instance.routes.get("/tutu/catalog-version")
+async def get_tutu_catalog_version(request: aiohttp.web.Request):
+    """
+    Versions of the data the frontend caches in IndexedDB:
+    - catalog: built-in templates / categories (changes when the bundled data or images change)
+    - userRevision: user templates (pass it to /tutu/user-templates/changes)
+    """
+    try:
+        adapter = await load_template_adapter()
+        revision = await run_blocking(lambda: USER_TEMPLATES_MANAGER.revision)
+        return aiohttp.web.Response(
+            body=json_codec.dumps({"catalog": adapter.catalog_version, "userRevision": revision}),
+            content_type="application/json",
+            headers={"Cache-Control": "no-store"}
+        )
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/catalog-version: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/tutu/metrics")
+async def get_tutu_metrics(request: aiohttp.web.Request):
+    """
+    API node counters and per-stage latency histograms (by provider / model /
+    status or stage) in the Prometheus text exposition format
+    """
+    try:
+        return aiohttp.web.Response(
+            body=METRICS_REGISTRY.render().encode("utf-8"),
+            headers={
+                "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+                "Cache-Control": "no-store",
+            }
+        )
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/metrics: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
+
+
 @server.PromptServer.instance.routes.get("/tutu/categories")
 async def get_tutu_categories(request: aiohttp.web.Request):
     """
@@ -30,13 +113,15 @@ async def get_tutu_categories(request: aiohttp.web.Request):
     """
     try:
         lang = request.query.get("lang", "zh")
-        categories = ADAPTER_INSTANCE.get_all_categories(lang)
-        return aiohttp.web.json_response(categories)
+        return await catalog_response(
+            request, ("categories", lang),
+            lambda: json_codec.dumps(get_template_adapter().get_all_categories(lang))
+        )
     except Exception as e:
         import traceback
         print(f"Error in /tutu/categories: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 @server.PromptServer.instance.routes.get("/tutu/templates")
@@ -44,66 +129,202 @@ async def get_tutu_templates(request: aiohttp.web.Request):
     """
     API endpoint to get templates by category.
     ?category=<category_id>
+    
+    Without further params the full templates are returned (legacy format).
+    Summary listing (any of these params):
+    - limit: page size (default 50, max 200)
+    - cursor: nextCursor from the previous page
+    - fields: comma separated fields (default: id,title,coverImage,tags)
+    Returns {"items": [...], "nextCursor": ..., "total": n}
     """
     category_id = request.query.get("category", None)
     
     if not category_id:
-        return aiohttp.web.json_response(
+        return json_response(
             {"error": "Category ID is required"}, status=400
         )
     
     try:
+        query = request.query
+        if "limit" in query or "cursor" in query or "fields" in query:
+            try:
+                limit = min(200, max(1, int(query.get("limit", 50))))
+                cursor = int(query["cursor"]) if query.get("cursor") else None
+            except ValueError:
+                return json_response({"error": "limit and cursor must be integers"}, status=400)
+            fields = tuple(f.strip() for f in query["fields"].split(",")) if query.get("fields") else None
+            return await catalog_response(
+                request, ("summaries", category_id, cursor, limit, fields),
+                lambda: json_codec.dumps(get_template_adapter().get_category_summaries(category_id, cursor, limit, fields))
+            )
+        
         # The frontend doesn't need language-specific templates from this endpoint,
         # it gets both and switches locally.
-        templates = ADAPTER_INSTANCE.get_templates_by_category(category_id)
-        return aiohttp.web.json_response(templates)
+        # Served from the per-category serialized cache
+        return await catalog_response(
+            request, ("templates", category_id),
+            lambda: get_template_adapter().get_category_payload(category_id)
+        )
     except Exception as e:
         # Adding traceback for better debugging
         import traceback
         print(f"Error in /tutu/templates: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response(
+        return json_response(
             {"error": str(e)}, status=500
         )
 
 
+@server.PromptServer.instance.routes.get("/tutu/templates/{template_id}")
+async def get_tutu_template_detail(request: aiohttp.web.Request):
+    """
+    Full detail of one template (built-in numeric id or user_* id),
+    loaded by the frontend when a template card is opened.
+    """
+    template_id = request.match_info['template_id']
+    try:
+        if template_id.startswith("user_"):
+            template = await run_blocking(USER_TEMPLATES_MANAGER.get_template_by_id, template_id)
+        else:
+            try:
+                template = (await load_template_adapter()).get_template_by_id(int(template_id))
+            except ValueError:
+                template = None
+        
+        if template is None:
+            return json_response({"error": "Template not found"}, status=404)
+        if template_id.startswith("user_"):
+            return json_response(template)
+        return await catalog_response(request, ("template", template["id"]), lambda: json_codec.dumps(template))
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/templates/{template_id}: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/tutu/search")
+async def search_tutu_templates(request: aiohttp.web.Request):
+    """
+    Full-text search over built-in and user templates, ranked by relevance.
+    Built-in templates use the in-memory BM25 index, user templates the
+    SQLite FTS5 index. Their BM25 scores come from different collections and
+    are not comparable, so the two rankings are merged by rank (reciprocal
+    rank fusion); ``score`` is the fused score.
+    Query params:
+    - q: search text (Chinese, English or mixed)
+    - offset / limit: page of results (default 0 / 20, limit <= 100)
+    - scope: 'all', 'builtin' or 'user' (default: 'all')
+    """
+    query = request.query.get("q", "").strip()
+    scope = request.query.get("scope", "all")
+    try:
+        offset = max(0, int(request.query.get("offset", 0)))
+        limit = min(100, max(1, int(request.query.get("limit", 20))))
+    except ValueError:
+        return json_response({"error": "offset and limit must be integers"}, status=400)
+    
+    def search():
+        # Each source returns its top offset+limit hits; the merged page is cut from those
+        total = 0
+        rankings = []
+        if scope in ("all", "builtin"):
+            adapter = get_template_adapter()
+            builtin_total, builtin_hits = search_indexes(query, [("builtin", adapter.search_index)], 0, offset + limit)
+            total += builtin_total
+            templates = (adapter.get_template_by_id(template_id) for _, template_id, _ in builtin_hits)
+            rankings.append(("builtin", [template for template in templates if template is not None]))
+        if scope in ("all", "user"):
+            user_total, user_hits = USER_TEMPLATES_MANAGER.search(query, 0, offset + limit)
+            total += user_total
+            rankings.append(("user", [template for template, _ in user_hits]))
+        
+        results = [
+            {**template, "kind": kind, "score": round(score, 4)}
+            for kind, template, score in fuse_rankings(rankings, offset, limit)
+        ]
+        
+        return json_codec.dumps({
+            "query": query,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": results
+        })
+    
+    try:
+        # Index building, SQLite queries and serialization all run off the event loop
+        body = await run_blocking(search)
+        return aiohttp.web.Response(body=body, content_type="application/json")
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/search: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
+
+
+IMAGE_CONTENT_TYPES = {
+    '.jpeg': 'image/jpeg',
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+
 @server.PromptServer.instance.routes.get("/tutu/images/{image_path:.*}")
 async def get_tutu_image(request: aiohttp.web.Request):
     """
     Serve image files from the gpt4o-image-prompts-master directory
     Example: /tutu/images/333.jpeg
+    
+    Optional query params for a resized variant (served from the thumbnail cache):
+    - w: target width in pixels (snapped up to a fixed size, never upscaled)
+    - format: webp, jpeg or png
+    Example: /tutu/images/333.jpeg?w=320&format=webp
+    
+    Originals are streamed with aiohttp's FileResponse (sendfile where
+    available, Range requests, ETag / Last-Modified with 304 handling), so
+    large files never block the event loop.
     """
     try:
         image_path = request.match_info['image_path']
         
         # Construct full path to image
-        full_path = EXTENSION_DIR / "gpt4o-image-prompts-master" / "gpt4o-image-prompts-master" / "images" / image_path
+        full_path = (IMAGES_DIR / image_path).resolve()
         
-        # Security check: ensure the path is within our images directory
-        if not full_path.is_relative_to(EXTENSION_DIR):
+        # Security check: ensure the resolved path (no "..", no symlink escapes) is within our images directory
+        if not full_path.is_relative_to(IMAGES_DIR):
             return aiohttp.web.Response(status=403, text="Forbidden")
         
         # Check if file exists
-        if not full_path.exists() or not full_path.is_file():
+        if not full_path.is_file():
             return aiohttp.web.Response(status=404, text="Image not found")
         
+        if "w" in request.query or "format" in request.query:
+            try:
+                width = int(request.query["w"]) if request.query.get("w") else None
+            except ValueError:
+                return aiohttp.web.Response(status=400, text="w must be an integer")
+            fmt = request.query.get("format") or None
+            if (width is not None and width <= 0) or (fmt is not None and fmt not in THUMBNAIL_FORMATS):
+                return aiohttp.web.Response(status=400, text="Invalid thumbnail parameters")
+            
+            thumbnail = await THUMBNAIL_SERVICE.get(str(full_path), width, fmt)
+            # The ETag is the content-addressed cache key of the variant
+            headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": thumbnail.etag}
+            if etag_matches(request.headers.get("If-None-Match", ""), thumbnail.etag):
+                return aiohttp.web.Response(status=304, headers=headers)
+            return aiohttp.web.FileResponse(thumbnail.path, headers={**headers, "Content-Type": thumbnail.content_type})
+        
         # Determine content type based on file extension
-        ext = full_path.suffix.lower()
-        content_types = {
-            '.jpeg': 'image/jpeg',
-            '.jpg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp'
-        }
-        content_type = content_types.get(ext, 'application/octet-stream')
+        content_type = IMAGE_CONTENT_TYPES.get(full_path.suffix.lower(), 'application/octet-stream')
         
-        # Read and return the file
-        with open(full_path, 'rb') as f:
-            return aiohttp.web.Response(
-                body=f.read(),
-                content_type=content_type
-            )
+        # Stream the file; conditional and Range requests are handled by FileResponse
+        return aiohttp.web.FileResponse(
+            full_path,
+            headers={"Content-Type": content_type, "Cache-Control": IMAGE_CACHE_CONTROL}
+        )
     
     except Exception as e:
         import traceback
@@ -112,38 +333,212 @@ async def get_tutu_image(request: aiohttp.web.Request):
         return aiohttp.web.Response(status=500, text="Internal server error")
 
 
+@server.PromptServer.instance.routes.get("/tutu/contact-sheet")
+async def get_tutu_contact_sheet(request: aiohttp.web.Request):
+    """
+    Cover thumbnails of one page of a category, composed into a single sprite.
+    Query params:
+    - category: category/tag ID (required)
+    - cursor / limit: same page as /tutu/templates summaries (limit default 50, max 100)
+    - size: square tile size in pixels (snapped up to 64, 96, 128 or 192; default 96)
+    Returns {"sprite": url, "tileSize", "columns", "width", "height",
+             "items": [{"id", "x", "y"}], "nextCursor", "total"}
+    """
+    category_id = request.query.get("category", None)
+    if not category_id:
+        return json_response({"error": "Category ID is required"}, status=400)
+    try:
+        limit = min(100, max(1, int(request.query.get("limit", 50))))
+        cursor = int(request.query["cursor"]) if request.query.get("cursor") else None
+        size = max(1, int(request.query.get("size", 96)))
+    except ValueError:
+        return json_response({"error": "limit, cursor and size must be integers"}, status=400)
+    
+    try:
+        page = (await load_template_adapter()).get_category_summaries(category_id, cursor, limit, ("coverImage",))
+        columns = CONTACT_SHEET_COLUMNS
+        covers = [
+            str(IMAGES_DIR / item["coverImage"].split("/")[-1]) if item.get("coverImage") else None
+            for item in page["items"]
+        ]
+        sheet = await THUMBNAIL_SERVICE.contact_sheet(covers, size, columns)
+        tile = sheet.width // columns
+        
+        def build():
+            return json_codec.dumps({
+                "sprite": f"/tutu/contact-sheet/{sheet.key}.webp",
+                "tileSize": tile,
+                "columns": columns,
+                "width": sheet.width,
+                "height": sheet.height,
+                "items": [
+                    {"id": item["id"], "x": index % columns * tile, "y": index // columns * tile}
+                    for index, item in enumerate(page["items"])
+                ],
+                "nextCursor": page["nextCursor"],
+                "total": page["total"]
+            })
+        
+        # Keyed by the sheet too: a new sprite (changed covers) means a new body
+        return await catalog_response(request, ("contact-sheet", category_id, cursor, limit, tile, sheet.key), build)
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/contact-sheet: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/tutu/contact-sheet/{sheet_key}.webp")
+async def get_tutu_contact_sheet_sprite(request: aiohttp.web.Request):
+    """Sprite image of a contact sheet; the URL is content-addressed, so it never changes"""
+    path = THUMBNAIL_SERVICE.contact_sheet_path(request.match_info["sheet_key"])
+    if path is None:
+        return aiohttp.web.Response(status=404, text="Contact sheet not found")
+    return aiohttp.web.FileResponse(
+        path,
+        headers={"Content-Type": "image/webp", "Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
 # ===== User Templates API =====
 
 @server.PromptServer.instance.routes.get("/tutu/user-templates")
 async def get_user_templates(request: aiohttp.web.Request):
     """Get all user-created templates"""
     try:
-        templates = USER_TEMPLATES_MANAGER.get_all_templates()
-        return aiohttp.web.json_response(templates)
+        revision = await run_blocking(lambda: USER_TEMPLATES_MANAGER.revision)
+        return await respond(
+            request, RESPONSE_CACHE, ("user-templates",), revision,
+            lambda: json_codec.dumps(USER_TEMPLATES_MANAGER.get_all_templates()),
+            cache_control="private, no-cache"
+        )
     except Exception as e:
         import traceback
         print(f"Error in /tutu/user-templates: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
+
+
+@server.PromptServer.instance.routes.get("/tutu/user-templates/changes")
+async def get_user_template_changes(request: aiohttp.web.Request):
+    """
+    Delta of the user templates since a revision the client already has.
+    ?since=<userRevision> (0 or missing: everything)
+    Returns {"revision", "full", "templates": [...changed or new], "deleted": [ids]};
+    with "full": true, "templates" replaces the client's copy entirely.
+    """
+    try:
+        since = int(request.query.get("since", 0))
+    except ValueError:
+        return json_response({"error": "since must be an integer"}, status=400)
+    try:
+        changes = await run_blocking(USER_TEMPLATES_MANAGER.changes_since, since)
+        return aiohttp.web.Response(
+            body=await run_blocking(json_codec.dumps, changes),
+            content_type="application/json",
+            headers={"Cache-Control": "no-store"}
+        )
+    except Exception as e:
+        import traceback
+        print(f"Error in /tutu/user-templates/changes: {e}")
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
 
 
 @server.PromptServer.instance.routes.post("/tutu/user-templates")
 async def create_user_template(request: aiohttp.web.Request):
     """Create a new user template"""
     try:
-        data = await request.json()
-        result = USER_TEMPLATES_MANAGER.create_template(data)
+        data = await request.json(loads=json_codec.loads)
+        result = await run_blocking(USER_TEMPLATES_MANAGER.create_template, data)
         
         if result.get("success"):
-            return aiohttp.web.json_response(result, status=201)
+            return json_response(result, status=201)
         else:
-            return aiohttp.web.json_response(result, status=400)
+            return json_response(result, status=400)
     
     except Exception as e:
         import traceback
         print(f"Error creating user template: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
+
+
+# Templates per database read while streaming an export
+EXPORT_PAGE_SIZE = 1000
+
+
+@server.PromptServer.instance.routes.get("/tutu/user-templates/export")
+async def export_user_templates(request: aiohttp.web.Request):
+    """
+    Stream all user templates as NDJSON (one template per line), for
+    backups and migrations; the output can be sent to the import route as is.
+    """
+    response = aiohttp.web.StreamResponse(headers={
+        "Content-Type": "application/x-ndjson; charset=utf-8",
+        "Content-Disposition": 'attachment; filename="user_templates.ndjson"',
+        "Cache-Control": "no-store"
+    })
+    await response.prepare(request)
+    after = 0
+    while True:
+        after, chunk = await run_blocking(USER_TEMPLATES_MANAGER.export_page, after, EXPORT_PAGE_SIZE)
+        if not chunk:
+            break
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+@server.PromptServer.instance.routes.post("/tutu/user-templates/import")
+async def import_user_templates(request: aiohttp.web.Request):
+    """
+    Bulk import user templates from an NDJSON request body.
+    Query params:
+    - mode: 'replace' (existing ids are overwritten, default) or 'skip'
+    
+    Lines are validated one by one and written in batched transactions while
+    the body is still uploading. The response is NDJSON too:
+    {"event": "progress", "read", "imported", "skipped", "invalid"} per batch,
+    then {"event": "done", ..., "errors": [{"line", "error"}]}
+    (or {"event": "error", "error"} if the import failed).
+    """
+    mode = request.query.get("mode", "replace")
+    if mode not in ("replace", "skip"):
+        return json_response({"error": "mode must be 'replace' or 'skip'"}, status=400)
+    
+    response = aiohttp.web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+    await response.prepare(request)
+    
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    pipe = LinePipe()
+    
+    def report(stats):
+        loop.call_soon_threadsafe(events.put_nowait, {"event": "progress", **stats})
+    
+    feeder = asyncio.ensure_future(pipe.feed(request.content.iter_chunked(64 * 1024)))
+    # Own thread: an import can run for minutes and must not hold an IO pool worker
+    job = asyncio.ensure_future(run_in_thread(
+        USER_TEMPLATES_MANAGER.import_ndjson, pipe.lines(), replace=(mode == "replace"), progress=report
+    ))
+    job.add_done_callback(lambda _: events.put_nowait(None))
+    
+    try:
+        while (event := await events.get()) is not None:
+            await response.write(json_codec.dumps(event) + b"\n")
+        result = {"event": "done", **job.result()}
+    except Exception as e:
+        import traceback
+        print(f"Error importing user templates: {e}")
+        traceback.print_exc()
+        result = {"event": "error", "error": str(e)}
+    finally:
+        feeder.cancel()
+    
+    await response.write(json_codec.dumps(result) + b"\n")
+    await response.write_eof()
+    return response
 
 
 @server.PromptServer.instance.routes.put("/tutu/user-templates/{template_id}")
@@ -151,19 +546,19 @@ async def update_user_template(request: aiohttp.web.Request):
     """Update a user template"""
     try:
         template_id = request.match_info['template_id']
-        data = await request.json()
-        result = USER_TEMPLATES_MANAGER.update_template(template_id, data)
+        data = await request.json(loads=json_codec.loads)
+        result = await run_blocking(USER_TEMPLATES_MANAGER.update_template, template_id, data)
         
         if result.get("success"):
-            return aiohttp.web.json_response(result)
+            return json_response(result)
         else:
-            return aiohttp.web.json_response(result, status=404 if "not found" in result.get("error", "") else 400)
+            return json_response(result, status=404 if "not found" in result.get("error", "") else 400)
     
     except Exception as e:
         import traceback
         print(f"Error updating user template: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 @server.PromptServer.instance.routes.delete("/tutu/user-templates/{template_id}")
@@ -171,18 +566,18 @@ async def delete_user_template(request: aiohttp.web.Request):
     """Delete a user template"""
     try:
         template_id = request.match_info['template_id']
-        result = USER_TEMPLATES_MANAGER.delete_template(template_id)
+        result = await run_blocking(USER_TEMPLATES_MANAGER.delete_template, template_id)
         
         if result.get("success"):
-            return aiohttp.web.json_response(result)
+            return json_response(result)
         else:
-            return aiohttp.web.json_response(result, status=404 if "not found" in result.get("error", "") else 400)
+            return json_response(result, status=404 if "not found" in result.get("error", "") else 400)
     
     except Exception as e:
         import traceback
         print(f"Error deleting user template: {e}")
         traceback.print_exc()
-        return aiohttp.web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 # AI nodes only - removed AiHelper and UI components
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
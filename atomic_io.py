@@ -0,0 +1,81 @@
+"""
+Atomic IO
+Crash-safe file replacement for the JSON files this extension writes.
+
+Data is written to a temporary file in the same directory, flushed to
+disk and then renamed over the target with ``os.replace``, so readers see
+either the old or the new content, never a half-written file.
+``file_lock`` serializes read-modify-write cycles across processes.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Atomically replace ``path`` with ``data``"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, obj: Any, **dump_kwargs):
+    """Atomically write ``obj`` as JSON; ``dump_kwargs`` go to ``json.dumps``"""
+    atomic_write_bytes(path, json.dumps(obj, **dump_kwargs).encode("utf-8"))
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive cross-process lock on ``<path>.lock`` (blocking).
+
+    Uses ``fcntl.flock`` on POSIX and ``msvcrt.locking`` on Windows; if
+    neither is available the block runs unlocked.
+    """
+    lock_path = f"{path}.lock"
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10 s, keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
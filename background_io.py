@@ -0,0 +1,178 @@
+"""
+Background IO
+Keeps blocking file, database and CPU-heavy work of the /tutu routes off
+ComfyUI's PromptServer event loop (which also drives the websocket
+progress updates of every client).
+
+``run_blocking`` runs a call on a small bounded thread pool;
+``run_in_thread`` gives a long-running job (e.g. a bulk import) its own
+thread so it cannot tie up that pool.
+``GroupCommitWriter`` funnels write operations through one writer thread
+that batches whatever is queued within a short window into a single
+transaction, so a burst of saves costs one flush instead of one per save.
+``LinePipe`` hands a streamed request body to a blocking consumer thread
+line by line, with backpressure.
+"""
+
+import asyncio
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterable, Callable, Iterator, List, Sequence, Tuple
+
+try:
+    from .tutu_logging import get_logger
+except ImportError:  # imported by modules executed as scripts
+    from tutu_logging import get_logger
+
+logger = get_logger("io")
+
+# Bounded: a slow disk queues work here instead of spawning threads without limit
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 2) + 2), thread_name_prefix="tutu-io")
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run ``func(*args, **kwargs)`` on ``IO_EXECUTOR`` and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(IO_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """Run ``func(*args, **kwargs)`` on a dedicated thread and await its result"""
+    future: Future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="tutu-job", daemon=True).start()
+    return await asyncio.wrap_future(future)
+
+
+class GroupCommitWriter:
+    """
+    Single background writer that executes queued operations in batches.
+
+    ``run_batch`` receives the operations of one batch and must return one
+    ``(ok, value)`` pair per operation (value is the result or the raised
+    exception); if it raises, every operation of the batch fails with that
+    error. A batch closes after ``linger`` seconds or ``max_batch`` items.
+    """
+
+    def __init__(self, run_batch: Callable[[Sequence[Callable]], List[Tuple[bool, Any]]],
+                 linger: float = 0.005, max_batch: int = 256, name: str = "tutu-writer"):
+        self._run_batch = run_batch
+        self.linger = linger
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[Callable, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: Callable) -> Future:
+        """Queue ``operation``; the returned future resolves after its batch is committed"""
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def _collect(self) -> List[Tuple[Callable, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            operations = [operation for operation, _ in batch]
+            try:
+                results = self._run_batch(operations)
+            except BaseException as e:
+                logger.error("write batch of %d failed: %s", len(batch), e)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            if len(batch) > 1:
+                logger.debug("committed %d writes in one batch", len(batch))
+            for (_, future), (ok, value) in zip(batch, results):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+class LinePipe:
+    """
+    Bounded hand-off of a streamed body from the event loop to one blocking
+    consumer: ``feed`` runs on the loop, ``lines`` on the worker thread.
+
+    If the stream fails (e.g. the client disconnects) ``lines`` raises that
+    error instead of ending, so a truncated upload is never taken as complete.
+
+    Backpressure is an asyncio semaphore the consumer releases per chunk it
+    takes, so the feeding side never needs a worker thread: a consumer
+    waiting on the pool's threads could otherwise starve its own feeder.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        self.max_chunks = max_chunks
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = threading.Event()
+        self._loop = None
+        self._credits = None
+
+    def _release(self):
+        """Return one chunk credit to the feeder (called on the consumer thread)"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._credits.release)
+        except RuntimeError:  # loop already closed, nobody is feeding
+            pass
+
+    async def feed(self, chunks: AsyncIterable[bytes]):
+        self._loop = asyncio.get_running_loop()
+        self._credits = asyncio.Semaphore(self.max_chunks)
+        end: Any = None
+        try:
+            async for chunk in chunks:
+                await self._credits.acquire()
+                if self._closed.is_set():
+                    break
+                self._queue.put(chunk)
+        except BaseException as e:
+            end = e
+            raise
+        finally:
+            self._queue.put(end)
+
+    def lines(self) -> Iterator[bytes]:
+        """Complete lines of the fed stream, without the newline (blocking)"""
+        pending = b""
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise ConnectionError(f"request body stream failed: {chunk!r}")
+                self._release()
+                *complete, pending = (pending + chunk).split(b"\n")
+                yield from complete
+            if pending:
+                yield pending
+        finally:
+            self._closed.set()
+            # Wake a feeder waiting for a credit so it sees the pipe is closed
+            self._release()
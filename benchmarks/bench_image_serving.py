@@ -0,0 +1,189 @@
+"""
+Benchmark: legacy /tutu/images handler vs streaming FileResponse.
+
+Starts a local aiohttp server with both handlers on its own thread/loop,
+downloads the largest bundled gallery images concurrently from the main
+loop and meanwhile measures
+
+- event-loop stalls: how late a 5 ms ticker inside the server wakes up
+- latency of a tiny /ping route served by the same loop
+
+Also checks conditional GET (304) and Range support of the new handler.
+
+    python benchmarks/bench_image_serving.py [--clients 16] [--files 24]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+import aiohttp
+import aiohttp.web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(ROOT, "gpt4o-image-prompts-master", "gpt4o-image-prompts-master", "images")
+
+
+async def legacy_image(request):
+    """The handler previously in __init__.py: whole file read on the loop"""
+    full_path = os.path.join(IMAGES_DIR, request.match_info["name"])
+    with open(full_path, "rb") as f:
+        return aiohttp.web.Response(body=f.read(), content_type="image/png")
+
+
+async def streaming_image(request):
+    full_path = os.path.join(IMAGES_DIR, request.match_info["name"])
+    return aiohttp.web.FileResponse(full_path, headers={"Cache-Control": "public, max-age=86400"})
+
+
+async def ping(request):
+    return aiohttp.web.Response(text="ok")
+
+
+class LoopMonitor:
+    """Records how late a periodic callback fires (loop stall indicator)"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.delays = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.delays.append(loop.time() - start - self.interval)
+
+    def start(self, loop):
+        self.delays = []
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def stop(self):
+        self._task.cancel()
+
+
+async def run_round(session, base, route, names, clients):
+    queue = asyncio.Queue()
+    for name in names:
+        queue.put_nowait(name)
+    received = 0
+
+    async def download():
+        nonlocal received
+        while not queue.empty():
+            name = queue.get_nowait()
+            async with session.get(f"{base}/{route}/{name}") as response:
+                async for chunk in response.content.iter_chunked(256 * 1024):
+                    received += len(chunk)
+
+    ping_latencies = []
+    done = asyncio.Event()
+
+    async def pinger():
+        while not done.is_set():
+            start = time.perf_counter()
+            async with session.get(f"{base}/ping") as response:
+                await response.read()
+            ping_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    ping_task = asyncio.ensure_future(pinger())
+    start = time.perf_counter()
+    await asyncio.gather(*(download() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ping_task
+    return elapsed, received, ping_latencies
+
+
+async def check_conditional(session, base, name):
+    async with session.get(f"{base}/new/{name}") as response:
+        await response.read()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    headers = {"If-None-Match": etag} if etag else {"If-Modified-Since": last_modified}
+    async with session.get(f"{base}/new/{name}", headers=headers) as response:
+        not_modified = response.status
+    async with session.get(f"{base}/new/{name}", headers={"Range": "bytes=0-1023"}) as response:
+        partial = (response.status, len(await response.read()))
+    return not_modified, partial
+
+
+def describe(label, elapsed, received, pings, delays):
+    stall = max(delays) * 1000 if delays else 0.0
+    p50 = statistics.median(pings) * 1000 if pings else float("nan")
+    p_max = max(pings) * 1000 if pings else float("nan")
+    print(f"{label:<16} {received / elapsed / 1e6:8.1f} MB/s   "
+          f"max loop stall {stall:7.1f} ms   /ping p50 {p50:6.1f} ms  max {p_max:7.1f} ms")
+
+
+def start_server():
+    """Run the test app on a separate thread (like ComfyUI's server loop)"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def setup():
+        app = aiohttp.web.Application()
+        app.router.add_get("/legacy/{name}", legacy_image)
+        app.router.add_get("/new/{name}", streaming_image)
+        app.router.add_get("/ping", ping)
+        state["runner"] = runner = aiohttp.web.AppRunner(app)
+        await runner.setup()
+        site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state["port"] = site._server.sockets[0].getsockname()[1]
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(setup())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop, state
+
+
+async def main_async(args):
+    files = sorted(
+        (name for name in os.listdir(IMAGES_DIR) if os.path.isfile(os.path.join(IMAGES_DIR, name))),
+        key=lambda name: os.path.getsize(os.path.join(IMAGES_DIR, name)),
+        reverse=True,
+    )[:args.files]
+    total_mb = sum(os.path.getsize(os.path.join(IMAGES_DIR, name)) for name in files) / 1e6
+
+    server_loop, state = start_server()
+    base = f"http://127.0.0.1:{state['port']}"
+
+    print(f"{len(files)} largest images ({total_mb:.0f} MB), {args.clients} concurrent clients")
+    monitor = LoopMonitor()
+    connector = aiohttp.TCPConnector(limit=args.clients + 2)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for label, route in (("legacy read()", "legacy"), ("FileResponse", "new")):
+                monitor.start(server_loop)
+                elapsed, received, pings = await run_round(session, base, route, files, args.clients)
+                monitor.stop()
+                describe(label, elapsed, received, pings, monitor.delays)
+
+            not_modified, partial = await check_conditional(session, base, files[0])
+            print(f"conditional GET status: {not_modified}   Range 0-1023: status {partial[0]}, {partial[1]} bytes")
+    finally:
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), server_loop).result()
+        server_loop.call_soon_threadsafe(server_loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--files", type=int, default=24)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: stdlib json vs json_codec on provider-shaped payloads.
+
+Builds Gemini-style request bodies with 1 / 5 / 14 reference images
+(random bytes, base64 encoded, ~4K PNG sized) and a response with one
+inline image, then times encode + decode per request.
+
+    python benchmarks/bench_json_codec.py [--image-mb 6] [--repeat 5]
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_codec  # noqa: E402
+
+
+def make_image_b64(size_bytes):
+    return base64.b64encode(os.urandom(size_bytes)).decode("ascii")
+
+
+def make_request(image_b64, count):
+    parts = [{"text": "将图1中的人物放到图2的场景中，保持光照一致。"}]
+    for _ in range(count):
+        parts.append({"inline_data": {"mime_type": "image/png", "data": image_b64}})
+    return {
+        "contents": [{"role": "user", "parts": parts}],
+        "generationConfig": {
+            "responseModalities": ["TEXT", "IMAGE"],
+            "imageConfig": {"aspectRatio": "16:9", "imageSize": "4K"},
+        },
+    }
+
+
+def make_response(image_b64):
+    return {
+        "candidates": [{
+            "content": {"parts": [
+                {"text": "好的，这是生成的图片。"},
+                {"inlineData": {"mimeType": "image/png", "data": image_b64}},
+            ]},
+            "finishReason": "STOP",
+        }],
+        "usageMetadata": {"promptTokenCount": 1290, "candidatesTokenCount": 2000},
+    }
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def stdlib_dumps(obj):
+    # What requests does for ``json=payload``
+    return json.dumps(obj, allow_nan=False).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-mb", type=float, default=6.0, help="decoded size of each image in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    image_b64 = make_image_b64(int(args.image_mb * 1024 * 1024))
+    response_body = json.dumps(make_response(image_b64)).encode("utf-8")
+
+    decode_std = best_of(lambda: json.loads(response_body), args.repeat)
+    decode_fast = best_of(lambda: json_codec.loads(response_body), args.repeat)
+
+    print(f"backend: {json_codec.BACKEND}  image: {args.image_mb:.1f} MB  repeat: {args.repeat}")
+    print(f"{'images':>6} {'body MB':>8} {'stdlib ms':>10} {'codec ms':>9} {'speedup':>8}")
+    for count in (1, 5, 14):
+        payload = make_request(image_b64, count)
+        body_mb = len(json_codec.dumps(payload)) / (1024 * 1024)
+        std = best_of(lambda: stdlib_dumps(payload), args.repeat) + decode_std
+        fast = best_of(lambda: json_codec.dumps(payload), args.repeat) + decode_fast
+        print(f"{count:>6} {body_mb:>8.1f} {std * 1000:>10.1f} {fast * 1000:>9.1f} {std / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark: TutuNanoBananaPro / TutuGeminiAPI against local mock providers.
+
+Starts benchmarks/mock_providers.py in a subprocess (so its canned images
+stay out of the measured RSS), points the nodes at it by patching their
+HTTP sessions and config in this process only (see ``import_nodes``) and
+runs every node / provider with 0, 1, 5 and 14 reference images
+(TutuGeminiAPI has five inputs, so it skips 14) at the requested output
+sizes; chat completions have no size and always return ``--chat-size``.
+
+Per case it reports the median of each stage the nodes time (see
+metrics.py), wall time, throughput, bytes on the wire and peak RSS, and
+writes every sample as JSON. ``--compare`` prints the change against an
+earlier result file, so runs can be tracked over time.
+
+Needs ComfyUI's environment (torch, comfy, folder_paths, cv2):
+
+    python benchmarks/bench_provider_nodes.py --comfyui /path/to/ComfyUI \\
+        [--refs 0 1 5 14] [--sizes 1K 2K 4K] [--repeat 3] [--concurrency 1] \\
+        [--latency 0] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import threading
+import types
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(ROOT, "benchmarks", "mock_providers.py")
+
+# The repository is imported under this name without running its __init__.py,
+# which registers routes on ComfyUI's PromptServer
+PACKAGE = "tutu_banana_bench"
+
+API_KEY = "mock-key-0123456789"
+PROMPT = "将图1中的人物放到图2的场景中，保持光照一致，电影感构图。"
+MB = 1024 * 1024
+
+# name -> (node class, api_provider choice, number of image inputs, honours the size)
+NODES = {
+    "banana/google": ("TutuNanoBananaPro", "Google官方", 14, True),
+    "banana/t8star": ("TutuNanoBananaPro", "T8Star", 14, True),
+    "gemini/comfly": ("TutuGeminiAPI", "ai.comfly.chat", 5, False),
+    "gemini/openrouter": ("TutuGeminiAPI", "OpenRouter", 5, False),
+}
+
+
+def start_mock(args):
+    """Run the mock server in a subprocess; returns (process, base URL)"""
+    command = [
+        sys.executable, MOCK_SERVER, "--port", "0", "--latency", str(args.latency),
+        "--bandwidth-mbps", str(args.bandwidth_mbps), "--chat-size", args.chat_size, "--sizes", *args.sizes,
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError(f"mock server did not start: {line!r}")
+    return process, line.split("listening on ", 1)[1].strip()
+
+
+def mock_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        return json.loads(response.read())
+
+
+def write_config(log_level):
+    """Temporary Tutuapi.json, so the run neither reads nor writes the real one"""
+    config = {"log_level": log_level}
+    fd, path = tempfile.mkstemp(prefix="tutu-bench-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+
+# (timer, status) of the last node run on each thread, see record_last_call
+_last_call = threading.local()
+
+
+def redirect_sessions(make_session, base_url):
+    """Wrap a session factory so every request goes to ``base_url``, keeping the path"""
+    def redirected_session():
+        session = make_session()
+        send = session.request
+
+        def request(method, url, *args, **kwargs):
+            parts = urlsplit(url)
+            target = base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+            return send(method, target, *args, **kwargs)
+
+        session.request = request
+        return session
+    return redirected_session
+
+
+def record_last_call(record_api_call):
+    """Wrap metrics.record_api_call to also keep the run's timer and status for run_once"""
+    def record(timer, provider, model, status):
+        _last_call.value = (timer, status)
+        return record_api_call(timer, provider, model, status)
+    return record
+
+
+def import_nodes(comfyui, base_url, config_path):
+    """
+    Import the node modules with the benchmark hooks patched in: the config
+    service reads ``config_path`` and the nodes' HTTP sessions talk to the
+    mock server. Nothing of this is visible outside this process.
+    """
+    if comfyui:
+        sys.path.insert(0, comfyui)
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
+    config_service = importlib.import_module(f"{PACKAGE}.config_service")
+    config_service.CONFIG_SERVICE = config_service.ConfigService(config_path)
+    banana = importlib.import_module(f"{PACKAGE}.TutuNanoBananaPro")
+    gemini = importlib.import_module(f"{PACKAGE}.Tutu")
+    for module in (banana, gemini):
+        module.timed_session = redirect_sessions(module.timed_session, base_url)
+        module.record_api_call = record_last_call(module.record_api_call)
+    memory = importlib.import_module(f"{PACKAGE}.memory_governor")
+    return {"TutuNanoBananaPro": banana.TutuNanoBananaPro, "TutuGeminiAPI": gemini.TutuGeminiAPI}, memory
+
+
+def make_reference(side):
+    """Smooth image with mild noise (encodes like a photo, not like white noise)"""
+    import torch
+    generator = torch.Generator().manual_seed(side)
+    ramp = torch.linspace(0, 1, side)
+    base = torch.stack([ramp[None, :].expand(side, side), ramp[:, None].expand(side, side),
+                        (ramp[None, :] + ramp[:, None]) / 2], dim=-1)
+    noise = torch.randn(side, side, 3, generator=generator) * 0.05
+    return (base + noise).clamp(0, 1).unsqueeze(0)
+
+
+def make_call(node, node_name, provider, size, refs, reference, seed):
+    images = {f"input_image_{port}": reference for port in range(1, refs + 1)}
+    if node_name == "TutuNanoBananaPro":
+        return lambda: node.generate(provider, PROMPT, "1:1", size, API_KEY, API_KEY, seed, **images)
+    return lambda: node.process(PROMPT, provider, seed, comfly_api_key=API_KEY, openrouter_api_key=API_KEY, **images)
+
+
+def run_once(call, memory):
+    tracker = memory.PeakMemoryTracker(interval=0.01).start()
+    start = time.perf_counter()
+    image, _ = call()
+    wall = time.perf_counter() - start
+    tracker.stop()
+    timer, status = _last_call.value
+    return {
+        "wall_s": wall,
+        "status": status,
+        "stages_s": dict(timer.stages),
+        "peak_rss_mb": tracker.peak / MB,
+        "rss_delta_mb": tracker.delta / MB if tracker.delta is not None else None,
+        "output_shape": list(image.shape),
+    }
+
+
+def median_stages(samples):
+    names = []
+    for sample in samples:
+        names.extend(name for name in sample["stages_s"] if name not in names)
+    return {name: statistics.median(sample["stages_s"].get(name, 0.0) for sample in samples) for name in names}
+
+
+def run_case(args, base_url, call, memory):
+    before = mock_stats(base_url)
+    runs = args.repeat * args.concurrency
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = list(pool.map(lambda _: run_once(call, memory), range(runs)))
+    elapsed = time.perf_counter() - start
+    after = mock_stats(base_url)
+
+    walls = sorted(sample["wall_s"] for sample in samples)
+    statuses = {}
+    for sample in samples:
+        statuses[sample["status"]] = statuses.get(sample["status"], 0) + 1
+    return {
+        "runs": runs,
+        "status": statuses,
+        "wall_s": {"median": statistics.median(walls), "min": walls[0], "max": walls[-1]},
+        "stages_s": median_stages(samples),
+        "throughput_rps": runs / elapsed,
+        "request_mb": (after["bytes_in"] - before["bytes_in"]) / runs / MB,
+        "response_mb": (after["bytes_out"] - before["bytes_out"]) / runs / MB,
+        "peak_rss_mb": max(sample["peak_rss_mb"] for sample in samples),
+        "rss_delta_mb": max((sample["rss_delta_mb"] for sample in samples if sample["rss_delta_mb"] is not None),
+                            default=None),
+        "samples": samples,
+    }
+
+
+def format_delta(mb):
+    """RSS delta for display; None without psutil"""
+    return "n/a" if mb is None else f"+{mb:.1f} MB"
+
+
+def describe(case):
+    stages = " ".join(f"{name} {seconds:.2f}" for name, seconds in case["stages_s"].items())
+    ok = case["status"].get("ok", 0)
+    print(f"{case['name']:<34} {ok}/{case['runs']} ok  wall p50 {case['wall_s']['median']:6.2f}s  "
+          f"{case['throughput_rps']:5.2f} req/s  up {case['request_mb']:6.1f} MB  down {case['response_mb']:6.1f} MB  "
+          f"peak {format_delta(case['rss_delta_mb']):>10}  [{stages}]")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {case["name"]: case for case in json.load(f)["cases"]}
+    print(f"\nchange against {baseline_path} ({'wall p50':>8} / peak RSS delta):")
+    for case in results["cases"]:
+        old = baseline.get(case["name"])
+        if old is None:
+            continue
+        wall_old, wall_new = old["wall_s"]["median"], case["wall_s"]["median"]
+        change = (wall_new / wall_old - 1) * 100 if wall_old else float("nan")
+        print(f"{case['name']:<34} {wall_old:6.2f}s -> {wall_new:6.2f}s ({change:+6.1f}%)   "
+              f"{format_delta(old['rss_delta_mb'])} -> {format_delta(case['rss_delta_mb'])}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comfyui", help="ComfyUI checkout to import comfy / folder_paths from")
+    parser.add_argument("--nodes", nargs="+", choices=sorted(NODES), default=list(NODES))
+    parser.add_argument("--refs", nargs="+", type=int, default=[0, 1, 5, 14])
+    parser.add_argument("--sizes", nargs="+", choices=["1K", "2K", "4K"], default=["1K", "2K", "4K"])
+    parser.add_argument("--chat-size", choices=["1K", "2K", "4K"], default="1K")
+    parser.add_argument("--ref-size", type=int, default=1024, help="side of the reference images in pixels")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="node runs in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock generation time before the response headers")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="mock response bandwidth (0 = unthrottled)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    process, base_url = start_mock(args)
+    config_path = write_config(args.log_level)
+    try:
+        node_classes, memory = import_nodes(args.comfyui, base_url, config_path)
+        import torch
+        reference = make_reference(args.ref_size)
+
+        cases = []
+        for name in args.nodes:
+            node_name, provider, inputs, sized = NODES[name]
+            node = node_classes[node_name]()
+            # Untimed warm-up: imports, first connection, allocator growth
+            make_call(node, node_name, provider, args.sizes[0], 0, reference, 1)()
+            for size in (args.sizes if sized else [args.chat_size]):
+                for refs in args.refs:
+                    if refs > inputs:
+                        continue
+                    call = make_call(node, node_name, provider, size, refs, reference, seed=refs + 1)
+                    case = {"name": f"{name} {size} refs={refs}", "node": node_name, "provider": provider,
+                            "size": size, "refs": refs}
+                    case.update(run_case(args, base_url, call, memory))
+                    describe(case)
+                    cases.append(case)
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "platform": platform.platform(),
+                "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            },
+            "cases": cases,
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"\nresults written to {args.output}")
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        process.terminate()
+        process.wait()
+        os.remove(config_path)
+
+
+if __name__ == "__main__":
+    main()
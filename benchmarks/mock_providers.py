@@ -0,0 +1,194 @@
+"""
+Local stand-ins for the image generation APIs the nodes call.
+
+Serves canned 1K / 2K / 4K images in the response shapes of
+
+- Google ``POST /v1beta/models/{model}:generateContent`` (inlineData)
+- T8Star ``POST /v1/images/generations`` (url or b64_json, as requested)
+- OpenAI-style ``POST /v1/chat/completions`` (comfly: markdown data URL in
+  the content) and ``POST /api/v1/chat/completions`` (OpenRouter:
+  ``message.images``)
+
+after a configurable delay before the response headers (the provider's
+generation time), optionally throttling the body to a given bandwidth.
+Google and T8Star answer in the requested ``imageSize``; chat completions
+carry no size and get ``--chat-size``. ``GET /stats`` returns request and
+byte counters.
+
+The paths match the real endpoints, so a client only has to swap the
+scheme and host (bench_provider_nodes.py does this by wrapping the nodes'
+HTTP sessions).
+
+    python benchmarks/mock_providers.py [--port 8189] [--latency 2.0] [--bandwidth-mbps 0]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import re
+import time
+from io import BytesIO
+
+import aiohttp.web
+import numpy as np
+from PIL import Image
+
+SIZES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+CHUNK_SIZE = 256 * 1024
+
+# Found with a bytes search: parsing a multi-MB request body would only measure the mock
+_IMAGE_SIZE_RE = re.compile(rb'"(?:imageSize|image_size)"\s*:\s*"(\dK)"')
+_RESPONSE_FORMAT_RE = re.compile(rb'"response_format"\s*:\s*"(\w+)"')
+
+
+def make_png(size: str) -> bytes:
+    """Deterministic photo-sized PNG: gradients plus noise, so it compresses like a real render"""
+    side = SIZES[size]
+    rng = np.random.default_rng(side)
+    ramp = np.linspace(0, 255, side, dtype=np.float32)
+    noise = rng.normal(0, 12, (side, side)).astype(np.float32)
+    channels = [ramp[None, :] + noise, ramp[:, None] + noise, (ramp[None, :] + ramp[:, None]) / 2 + noise]
+    pixels = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+    buffered = BytesIO()
+    Image.fromarray(pixels).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class MockProviders:
+    """aiohttp app with the canned images prepared up front"""
+
+    def __init__(self, sizes, latency=0.0, bandwidth_mbps=0.0, chat_size="1K"):
+        self.latency = latency
+        self.bandwidth = bandwidth_mbps * 1e6 / 8
+        self.chat_size = chat_size
+        self.images = {}
+        self.images_b64 = {}
+        for size in sorted(set(sizes) | {chat_size}, key=SIZES.get):
+            png = make_png(size)
+            self.images[size] = png
+            self.images_b64[size] = base64.b64encode(png)
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def app(self) -> aiohttp.web.Application:
+        app = aiohttp.web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/v1beta/models/{model_action}", self.google)
+        app.router.add_post("/v1/images/generations", self.t8star)
+        app.router.add_post("/v1/chat/completions", self.comfly)
+        app.router.add_post("/api/v1/chat/completions", self.openrouter)
+        app.router.add_get("/files/{size}.png", self.file)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    def _size(self, body: bytes) -> str:
+        match = _IMAGE_SIZE_RE.search(body)
+        size = match.group(1).decode() if match else self.chat_size
+        return size if size in self.images else self.chat_size
+
+    async def _receive(self, request) -> bytes:
+        body = await request.read()
+        self.stats["requests"] += 1
+        self.stats["bytes_in"] += len(body)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return body
+
+    async def _send(self, request, parts, content_type="application/json"):
+        """Stream ``parts`` (bytes) as one body, throttled to the configured bandwidth"""
+        response = aiohttp.web.StreamResponse(headers={"Content-Type": content_type})
+        response.content_length = sum(len(part) for part in parts)
+        await response.prepare(request)
+        start = time.perf_counter()
+        sent = 0
+        for part in parts:
+            for offset in range(0, len(part), CHUNK_SIZE):
+                chunk = part[offset:offset + CHUNK_SIZE]
+                await response.write(chunk)
+                sent += len(chunk)
+                if self.bandwidth:
+                    ahead = sent / self.bandwidth - (time.perf_counter() - start)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+        await response.write_eof()
+        self.stats["bytes_out"] += sent
+        return response
+
+    async def google(self, request):
+        if not request.match_info["model_action"].endswith(":generateContent"):
+            raise aiohttp.web.HTTPNotFound()
+        size = self._size(await self._receive(request))
+        head = ('{"candidates": [{"content": {"role": "model", "parts": [{"text": "这是生成的图片。"}, '
+                '{"inlineData": {"mimeType": "image/png", "data": "').encode()
+        tail = b'"}}]}, "finishReason": "STOP"}], "usageMetadata": {"promptTokenCount": 1290}}'
+        return await self._send(request, [head, self.images_b64[size], tail])
+
+    async def t8star(self, request):
+        body = await self._receive(request)
+        size = self._size(body)
+        match = _RESPONSE_FORMAT_RE.search(body)
+        if match and match.group(1) == b"b64_json":
+            parts = [b'{"created": %d, "data": [{"b64_json": "' % time.time(), self.images_b64[size], b'"}]}']
+        else:
+            url = f"{request.url.origin()}/files/{size}.png"
+            parts = [json.dumps({"created": int(time.time()), "data": [{"url": url}]}).encode()]
+        return await self._send(request, parts)
+
+    def _chat_body(self, message_head: bytes, message_tail: bytes, model: str):
+        head = b'{"id": "chatcmpl-mock", "object": "chat.completion", "model": %s, "choices": [{"index": 0, "message": ' % (
+            json.dumps(model).encode())
+        tail = b', "finish_reason": "stop"}]}'
+        return [head + message_head, self.images_b64[self.chat_size], message_tail + tail]
+
+    async def comfly(self, request):
+        await self._receive(request)
+        return await self._send(request, self._chat_body(
+            b'{"role": "assistant", "content": "![image](data:image/png;base64,', b')"}', "gemini-2.5-flash-image-preview"))
+
+    async def openrouter(self, request):
+        await self._receive(request)
+        return await self._send(request, self._chat_body(
+            b'{"role": "assistant", "content": "", "images": [{"type": "image_url", "image_url": {"url": "data:image/png;base64,',
+            b'"}}]}', "google/gemini-2.5-flash-image-preview"))
+
+    async def file(self, request):
+        size = request.match_info["size"]
+        if size not in self.images:
+            raise aiohttp.web.HTTPNotFound()
+        return await self._send(request, [self.images[size]], content_type="image/png")
+
+    async def get_stats(self, request):
+        return aiohttp.web.json_response(self.stats)
+
+
+async def serve(args):
+    mock = MockProviders(args.sizes, args.latency, args.bandwidth_mbps, args.chat_size)
+    runner = aiohttp.web.AppRunner(mock.app())
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, args.host, args.port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    # bench_provider_nodes.py waits for this line
+    print(f"listening on http://{args.host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8189, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the response headers")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="response body limit (0 = unthrottled)")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=sorted(SIZES))
+    parser.add_argument("--chat-size", choices=sorted(SIZES), default="1K", help="image size of chat completions")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Config Service
+Single cached accessor for Tutuapi.json shared by all nodes.
+
+The parsed config is kept in memory and revalidated by mtime/size, so
+node construction and every run no longer re-read the file. Updates are
+merged into a fresh read of the file under a cross-process lock and are
+written (atomically) only if a value actually changes, so several
+ComfyUI workers sharing the directory cannot clobber each other.
+"""
+
+import copy
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .atomic_io import atomic_write_json, file_lock
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Tutuapi.json')
+
+
+class ConfigService:
+    """Cached, lock-protected view of one JSON config file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._config: Optional[Dict[str, Any]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> Dict[str, Any]:
+        """Parse the file, refreshing the cache (missing or invalid file -> {})"""
+        signature = self._stat()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            if not isinstance(config, dict):
+                config = {}
+        except (OSError, ValueError):
+            config = {}
+        self._config = config
+        self._signature = signature
+        return config
+
+    def _current(self) -> Dict[str, Any]:
+        if self._config is None or self._stat() != self._signature:
+            return self._read()
+        return self._config
+
+    def get(self) -> Dict[str, Any]:
+        """Return a copy of the current config"""
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def _write(self, config: Dict[str, Any]):
+        atomic_write_json(self.path, config, indent=4)
+        self._config = config
+        self._signature = self._stat()
+
+    def update(self, values: Dict[str, Any]) -> bool:
+        """
+        Merge ``values`` into the config file.
+
+        Returns True if the file was rewritten, False if nothing changed.
+        """
+        with self._lock:
+            current = self._current()
+            if all(key in current and current[key] == value for key, value in values.items()):
+                return False
+            with file_lock(self.path):
+                # Another worker may have written since our cached read
+                config = copy.deepcopy(self._read())
+                if all(key in config and config[key] == value for key, value in values.items()):
+                    return False
+                config.update(copy.deepcopy(values))
+                self._write(config)
+                return True
+
+    def save(self, config: Dict[str, Any]) -> bool:
+        """Replace the whole config; no-op if it is unchanged"""
+        with self._lock:
+            if self._current() == config:
+                return False
+            with file_lock(self.path):
+                self._write(copy.deepcopy(config))
+                return True
+
+
+CONFIG_SERVICE = ConfigService(CONFIG_FILE)
+
+
+def get_config() -> Dict[str, Any]:
+    """获取配置（内存缓存，文件修改后自动重新加载）"""
+    return CONFIG_SERVICE.get()
+
+
+def save_config(config: Dict[str, Any]) -> bool:
+    """保存完整配置（仅在内容变化时写入）"""
+    return CONFIG_SERVICE.save(config)
+
+
+def update_config(values: Dict[str, Any]) -> bool:
+    """合并更新部分配置项（仅在值变化时写入），返回是否写入了文件"""
+    return CONFIG_SERVICE.update(values)
@@ -0,0 +1,177 @@
+"""
+HTTP Cache
+ETag validation and response compression for the /tutu JSON routes.
+
+Response bodies are kept in a small LRU keyed by route parameters and
+tagged with a version (the template catalog version, or the user template
+revision), so they are serialized once per version. Each body carries a
+strong ETag; ``If-None-Match`` hits get a 304. gzip (and brotli, if the
+optional ``brotli`` package is installed) variants are compressed on first
+use and kept with the body, so static catalog data is compressed once.
+``respond`` does serialization and compression on the background IO pool,
+so only cache hits are answered directly on the event loop.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import aiohttp.web
+
+from .background_io import run_blocking
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Server preference when the client accepts several encodings equally
+_PREFERRED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class CachedBody:
+    """A response body with its ETag and lazily computed compressed variants"""
+
+    __slots__ = ("body", "etag", "_encoded")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+        self._encoded: Dict[str, bytes] = {}
+
+    def has_encoding(self, encoding: Optional[str]) -> bool:
+        return encoding is None or encoding in self._encoded
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = _compress(self.body, encoding)
+        return data
+
+
+class ResponseCache:
+    """
+    LRU of ``key -> (version, CachedBody)``; an entry is rebuilt when its
+    version changes. Thread-safe; bodies are built outside the lock.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[Any, CachedBody]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable, version: Any) -> Optional[CachedBody]:
+        """Cached body for ``key`` at ``version``, or None (never builds)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get(self, key: Hashable, version: Any, build: Callable[[], bytes]) -> CachedBody:
+        cached = self.peek(key, version)
+        if cached is not None:
+            return cached
+        cached = CachedBody(build())
+        with self._lock:
+            self._entries[key] = (version, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header (None = identity)"""
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in _PREFERRED_ENCODINGS:
+        q = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of ``If-None-Match`` against ``etag``, as required for GET"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def _response_encoding(request: aiohttp.web.Request, cached: CachedBody) -> Optional[str]:
+    if len(cached.body) < MIN_COMPRESS_SIZE:
+        return None
+    return negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+
+
+def cached_response(request: aiohttp.web.Request, cached: CachedBody, content_type: str = "application/json",
+                    cache_control: str = "no-cache") -> aiohttp.web.Response:
+    """
+    Build the response for ``cached``: 304 if the client's copy is current,
+    otherwise the body in the best encoding the client accepts.
+    """
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("If-None-Match", ""), cached.etag):
+        return aiohttp.web.Response(status=304, headers=headers)
+
+    encoding = _response_encoding(request, cached)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return aiohttp.web.Response(body=cached.encoded(encoding), headers=headers, content_type=content_type)
+
+
+async def respond(request: aiohttp.web.Request, cache: ResponseCache, key: Hashable, version: Any,
+                  build: Callable[[], bytes], cache_control: str = "no-cache") -> aiohttp.web.Response:
+    """
+    ``cached_response`` for a ``cache`` entry; building the body and
+    compressing it run on the background IO pool when needed
+    """
+    cached = cache.peek(key, version)
+    if cached is None:
+        cached = await run_blocking(cache.get, key, version, build)
+    if not etag_matches(request.headers.get("If-None-Match", ""), cached.etag):
+        encoding = _response_encoding(request, cached)
+        if not cached.has_encoding(encoding):
+            await run_blocking(cached.encoded, encoding)
+    return cached_response(request, cached, cache_control=cache_control)
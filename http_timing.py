@@ -0,0 +1,70 @@
+"""
+HTTP Timing
+``requests`` sessions whose connections report their connect (TCP, proxy
+CONNECT and TLS handshake) and upload (request line, headers and body)
+time as stages of the active ``metrics.StageTimer``.
+
+Whatever a request spends beyond those two inside ``session.post`` is the
+wait for the response headers, i.e. the provider's time to first byte.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import ProxyManager
+
+from .metrics import stage
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        with stage("connect"):
+            return super().connect()
+
+    def request(self, *args, **kwargs):
+        with stage("upload"):
+            return super().request(*args, **kwargs)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+_POOL_CLASSES = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools (direct and via HTTP proxies) use the timed connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        # SOCKS managers bring their own connection classes; those stay untimed
+        if isinstance(manager, ProxyManager):
+            manager.pool_classes_by_scheme = _POOL_CLASSES
+        return manager
+
+
+def timed_session() -> requests.Session:
+    """New session with ``TimedHTTPAdapter`` mounted for http and https"""
+    session = requests.Session()
+    adapter = TimedHTTPAdapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
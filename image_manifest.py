@@ -0,0 +1,157 @@
+"""
+Image Manifest
+Metadata for the bundled gallery images, so the template browser can
+reserve layout space, pick a thumbnail size and paint a placeholder
+before any image is downloaded.
+
+For every file in the images directory the manifest records width,
+height, byte size, format, a content hash and the dominant colour. It is
+stored as JSON in ``.cache/`` and refreshed incrementally: only files whose
+size or mtime changed are decoded again.
+
+Build it offline with ``python image_manifest.py``; the extension also
+refreshes it on its background warm-up thread.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    from .atomic_io import atomic_write_json
+except ImportError:  # executed as a script (see __main__ below)
+    from atomic_io import atomic_write_json
+
+# Bump when the recorded fields change so every entry is recomputed
+MANIFEST_VERSION = 1
+
+# Only these files are probed
+IMAGE_EXTENSIONS = frozenset((".jpeg", ".jpg", ".png", ".gif", ".webp"))
+
+# Public fields of an entry (the rest is bookkeeping for incremental refresh)
+META_FIELDS = ("width", "height", "bytes", "format", "hash", "color")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def probe_image(path: str) -> Dict[str, Any]:
+    """Dimensions, format and dominant colour of one image"""
+    # Pillow is only needed when (re)building, not for reading the manifest
+    from PIL import Image
+
+    with Image.open(path) as img:
+        width, height = img.size
+        fmt = (img.format or "").lower()
+        # JPEG decodes at a reduced scale here, which makes this cheap
+        img.draft("RGB", (64, 64))
+        small = img.convert("RGB")
+        small.thumbnail((64, 64))
+
+    # Most common colour of a 8-colour median-cut palette
+    palette_img = small.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    palette = palette_img.getpalette()
+    _, index = max(palette_img.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return {"width": width, "height": height, "format": fmt, "color": f"#{r:02x}{g:02x}{b:02x}"}
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read a manifest file (missing, stale-version or invalid -> {})"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    images = data.get("images")
+    return images if isinstance(images, dict) else {}
+
+
+def manifest_digest(images: Dict[str, Dict[str, Any]]) -> str:
+    """Short digest of the manifest content (changes when any image changes)"""
+    digest = hashlib.sha256()
+    for name in sorted(images):
+        digest.update(f"{name}:{images[name].get('hash')}\n".encode("utf-8"))
+    return digest.hexdigest()[:8]
+
+
+class ImageManifest:
+    """Incrementally maintained manifest for one images directory"""
+
+    def __init__(self, images_dir: str, manifest_path: str):
+        self.images_dir = images_dir
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self.images: Dict[str, Dict[str, Any]] = load_manifest(manifest_path)
+
+    def refresh(self) -> bool:
+        """
+        Re-probe new or changed files and drop deleted ones.
+
+        Returns True if the manifest changed (and was written).
+        """
+        with self._lock:
+            try:
+                names = [
+                    entry.name for entry in os.scandir(self.images_dir)
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                ]
+            except FileNotFoundError:
+                names = []
+
+            images = {}
+            changed = False
+            for name in names:
+                path = os.path.join(self.images_dir, name)
+                st = os.stat(path)
+                entry = self.images.get(name)
+                if entry is not None and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("bytes") == st.st_size:
+                    images[name] = entry
+                    continue
+                try:
+                    entry = probe_image(path)
+                except Exception as e:
+                    print(f"[ImageManifest] Skipping unreadable image {name}: {e}")
+                    continue
+                entry.update(bytes=st.st_size, hash=_file_sha256(path)[:16], mtime_ns=st.st_mtime_ns)
+                images[name] = entry
+                changed = True
+
+            if changed or len(images) != len(self.images):
+                self.images = images
+                os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+                atomic_write_json(
+                    self.manifest_path, {"version": MANIFEST_VERSION, "images": images},
+                    ensure_ascii=False, separators=(",", ":")
+                )
+                return True
+            return False
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Public metadata of one image file (by file name)"""
+        entry = self.images.get(name)
+        if entry is None:
+            return None
+        return {field: entry.get(field) for field in META_FIELDS}
+
+
+if __name__ == "__main__":
+    import time
+
+    base_dir = os.path.dirname(os.path.realpath(__file__))
+    manifest = ImageManifest(
+        os.path.join(base_dir, "gpt4o-image-prompts-master", "gpt4o-image-prompts-master", "images"),
+        os.path.join(base_dir, ".cache", "image_manifest.json"),
+    )
+    start = time.perf_counter()
+    changed = manifest.refresh()
+    print(f"{len(manifest.images)} images, {'updated' if changed else 'unchanged'} in {time.perf_counter() - start:.1f}s")
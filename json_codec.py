@@ -0,0 +1,75 @@
+"""
+JSON Codec
+Fast JSON encoding/decoding with graceful fallback.
+
+Provider payloads and responses are dominated by multi-MB base64 strings,
+where the stdlib ``json`` module is slow. The fastest installed backend is
+used (orjson > ujson > json); all of them produce compact UTF-8 output.
+
+    from .json_codec import dumps, loads
+
+    session.post(url, data=dumps(payload), headers=...)
+    result = loads(response.content)
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # optional speed-up
+    ujson = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif ujson is not None:
+    BACKEND = "ujson"
+else:
+    BACKEND = "json"
+
+# Exceptions raised by ``loads`` for malformed input, whatever the backend
+DecodeError = (ValueError,)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize ``obj`` to compact UTF-8 JSON bytes (ready for a request body)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Non-str keys, ints beyond 64 bit, ... - let the stdlib decide
+            return _stdlib_dumps(obj)
+    if ujson is not None:
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+        except (TypeError, OverflowError):
+            return _stdlib_dumps(obj)
+    return _stdlib_dumps(obj)
+
+
+def dumps_str(obj: Any) -> str:
+    """Serialize ``obj`` to a JSON ``str`` (drop-in for ``json.dumps`` callers)"""
+    return dumps(obj).decode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return ujson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
@@ -0,0 +1,189 @@
+"""
+Memory Governor
+Bounds how many large image encodes/decodes run at once and measures
+per-request peak memory for the API nodes.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, fall back to the resource module
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MB = 1024 * 1024
+
+
+def current_rss() -> int:
+    """Return the current resident set size of this process in bytes (0 if unknown, i.e. without psutil)"""
+    if psutil is not None:
+        try:
+            return psutil.Process(os.getpid()).memory_info().rss
+        except Exception:
+            return 0
+    return 0
+
+
+def lifetime_peak_rss() -> int:
+    """Return the highest RSS this process has ever had in bytes (0 if unknown)"""
+    if resource is not None:
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return 0
+
+
+class MemoryGovernor:
+    """
+    Process-wide limiter for memory-hungry image work.
+
+    A job must reserve an estimated byte size before it starts. Jobs wait
+    while either the concurrency limit or the byte budget is exhausted, so
+    14 connected 4K references (or several queued workers) are processed
+    a few at a time instead of all at once. A single job larger than the
+    whole budget is still admitted once nothing else is running.
+    """
+
+    def __init__(self, max_concurrent: int = 2, budget_bytes: int = 1024 * MB):
+        self._cond = threading.Condition()
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.budget_bytes = max(1, int(budget_bytes))
+        self._active = 0
+        self._reserved = 0
+
+    def configure(self, max_concurrent: Optional[int] = None, budget_mb: Optional[float] = None):
+        """Update limits; waiting jobs are re-evaluated immediately"""
+        with self._cond:
+            if max_concurrent is not None:
+                self.max_concurrent = max(1, int(max_concurrent))
+            if budget_mb is not None:
+                self.budget_bytes = max(1, int(float(budget_mb) * MB))
+            self._cond.notify_all()
+
+    def configure_from(self, config: dict):
+        """Apply limits from a Tutuapi.json style dict"""
+        self.configure(
+            max_concurrent=config.get("max_concurrent_image_jobs"),
+            budget_mb=config.get("image_memory_budget_mb"),
+        )
+
+    def _can_admit(self, nbytes: int) -> bool:
+        if self._active == 0:
+            return True
+        return (self._active < self.max_concurrent
+                and self._reserved + nbytes <= self.budget_bytes)
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """Block until ``nbytes`` can be reserved, release on exit"""
+        nbytes = max(0, int(nbytes))
+        with self._cond:
+            while not self._can_admit(nbytes):
+                self._cond.wait()
+            self._active += 1
+            self._reserved += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._reserved -= nbytes
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self._active,
+                "reserved_bytes": self._reserved,
+                "max_concurrent": self.max_concurrent,
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+class PeakMemoryTracker:
+    """
+    Sample process RSS on a background thread while a request runs.
+
+    RSS is process-wide, so concurrent requests in the same worker are
+    included in each other's peak; the reported delta is still the right
+    signal for spotting a single request that balloons memory.
+
+    Without psutil only the process's lifetime peak (``ru_maxrss``) is
+    available: ``peak`` is then that value and ``delta`` is None.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def per_request(self) -> bool:
+        """Whether the current RSS can be sampled (psutil installed)"""
+        return psutil is not None
+
+    def _sample(self):
+        rss = current_rss() if self.per_request else lifetime_peak_rss()
+        if rss > self.peak:
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        if not self.per_request:
+            self._sample()
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tutu-peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sample()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def checkpoint(self):
+        """Take an extra sample right now (e.g. just before freeing a large buffer)"""
+        self._sample()
+
+    @property
+    def delta(self) -> Optional[int]:
+        """Peak minus the RSS at start, or None without psutil"""
+        if not self.per_request:
+            return None
+        return max(0, self.peak - self.baseline)
+
+    def summary(self) -> str:
+        if not self.peak:
+            return "未知"
+        if not self.per_request:
+            return f"{self.peak / MB:.1f} MB (进程历史峰值，安装 psutil 可统计请求增量)"
+        return f"{self.peak / MB:.1f} MB (请求增量 +{self.delta / MB:.1f} MB)"
+
+
+# Shared by every node in this process
+MEMORY_GOVERNOR = MemoryGovernor()
@@ -0,0 +1,238 @@
+"""
+Metrics
+Per-stage latency of the API nodes and in-process counters / histograms,
+served in the Prometheus text format by ``/tutu/metrics``.
+
+A ``StageTimer`` is activated for the duration of one node run; code on
+the same thread reports into it with ``stage(name)`` / ``timed_iter``
+without the timer being passed around (no-ops when nothing is active).
+Stage times are exclusive: time spent in a nested stage is only counted
+for the inner one, so the stages of a run add up to its wall time.
+"""
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Display order of the known stages (unknown ones are listed after them)
+STAGE_ORDER = (
+    "tensor2pil", "encode", "base64", "serialize", "connect", "upload", "ttfb",
+    "receive", "parse", "download", "decode", "tensor",
+)
+
+# Seconds; API calls range from milliseconds (encode of a thumbnail) to minutes (4K generation)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_local = threading.local()
+_DONE = object()
+
+
+class StageTimer:
+    """Exclusive wall time per stage of one run"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._children: List[float] = []  # time spent in nested stages, per open stage
+        self._previous: Optional["StageTimer"] = None
+
+    def activate(self) -> "StageTimer":
+        """Make this the timer ``stage()`` reports to on the current thread"""
+        self._previous = getattr(_local, "timer", None)
+        _local.timer = self
+        return self
+
+    def deactivate(self):
+        _local.timer = self._previous
+        self._previous = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(name, elapsed - self._children.pop())
+            if self._children:
+                self._children[-1] += elapsed
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from ``iterable``, counting the time spent waiting for items as ``name``"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    @property
+    def total(self) -> float:
+        """Wall time since the timer was created"""
+        return time.perf_counter() - self._started
+
+    def ordered(self) -> List[Tuple[str, float]]:
+        known = [(name, self.stages[name]) for name in STAGE_ORDER if name in self.stages]
+        return known + [(name, seconds) for name, seconds in self.stages.items() if name not in STAGE_ORDER]
+
+    def summary(self) -> str:
+        """One line for the node's response text, e.g. ``encode 0.82s · ttfb 21.40s``"""
+        if not self.stages:
+            return "无"
+        return " · ".join(f"{name} {seconds:.2f}s" for name, seconds in self.ordered())
+
+
+def active_timer() -> Optional[StageTimer]:
+    return getattr(_local, "timer", None)
+
+
+def stage(name: str):
+    """Time a block as ``name`` on the active timer of this thread (no-op without one)"""
+    timer = active_timer()
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def timed_iter(name: str, iterable: Iterable) -> Iterable:
+    """``StageTimer.iterate`` on the active timer (the plain iterable without one)"""
+    timer = active_timer()
+    return timer.iterate(name, iterable) if timer is not None else iterable
+
+
+# ----------------------------------------------------------------------
+# Prometheus-style registry
+# ----------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{%s}" % ",".join(parts) if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [count per bucket..., sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, list(series)) for labels, series in self._values.items())
+        lines = []
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+API_REQUESTS = REGISTRY.register(Counter(
+    "tutu_api_requests_total", "API node runs by provider, model and outcome",
+    ("provider", "model", "status"),
+))
+API_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "tutu_api_request_seconds", "Wall time of API node runs",
+    ("provider", "model", "status"),
+))
+API_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "tutu_api_stage_seconds", "Exclusive time per stage of API node runs",
+    ("provider", "model", "stage"),
+))
+
+
+def record_api_call(timer: StageTimer, provider: str, model: str, status: str):
+    """Add one finished run (all its stages) to the API metrics"""
+    API_REQUESTS.inc(provider, model, status)
+    API_REQUEST_SECONDS.observe(timer.total, provider, model, status)
+    for name, seconds in timer.stages.items():
+        API_STAGE_SECONDS.observe(seconds, provider, model, name)
@@ -0,0 +1,188 @@
+"""
+Preset Store
+In-memory preset library backed by presets.json.
+
+Presets are parsed once and indexed by id and name per category. Every
+access revalidates the file's mtime/size, so edits made by hand (or by
+another process) are picked up, while unchanged files are never re-parsed.
+Writes go through ``atomic_write_json`` under a lock.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .atomic_io import atomic_write_json
+from .tutu_logging import get_logger
+
+logger = get_logger("presets")
+
+
+def _default_presets() -> Dict[str, List[dict]]:
+    return {"gemini": []}
+
+
+class PresetStore:
+    """
+    Thread-safe preset library for one presets.json file.
+
+    Returned presets are copies; modify them through ``update`` / ``add``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._presets: Optional[Dict[str, List[dict]]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._by_id: Dict[str, Dict[str, dict]] = {}
+        self._by_name: Dict[str, Dict[str, dict]] = {}
+
+    # ------------------------------------------------------------------
+    # Loading / persistence
+    # ------------------------------------------------------------------
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _ensure_loaded(self) -> Dict[str, List[dict]]:
+        """Return the current presets, reloading only if the file changed"""
+        signature = self._stat()
+        if self._presets is not None and signature == self._signature:
+            return self._presets
+
+        if signature is None:
+            # 如果文件不存在，创建默认结构
+            self._presets = _default_presets()
+            self._reindex()
+            self._save()
+            return self._presets
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                presets = json.load(f)
+            if not isinstance(presets, dict):
+                raise ValueError("presets.json must contain an object")
+        except ValueError:
+            logger.warning("预设文件格式错误，使用默认配置")
+            presets = _default_presets()
+        self._presets = presets
+        self._signature = signature
+        self._reindex()
+        return self._presets
+
+    def _reindex(self, category: Optional[str] = None):
+        categories = [category] if category is not None else list(self._presets)
+        if category is None:
+            self._by_id.clear()
+            self._by_name.clear()
+        for cat in categories:
+            by_id, by_name = {}, {}
+            for preset in self._presets.get(cat) or []:
+                # Keep the first preset when names/ids are duplicated (same as a linear scan)
+                by_id.setdefault(preset.get("id"), preset)
+                by_name.setdefault(preset.get("name"), preset)
+            self._by_id[cat] = by_id
+            self._by_name[cat] = by_name
+
+    def _save(self):
+        atomic_write_json(self.path, self._presets, indent=2, ensure_ascii=False)
+        self._signature = self._stat()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def all(self) -> Dict[str, List[dict]]:
+        """Deep copy of every category"""
+        with self._lock:
+            return copy.deepcopy(self._ensure_loaded())
+
+    def names(self, category: str) -> List[str]:
+        with self._lock:
+            return [p["name"] for p in self._ensure_loaded().get(category, [])]
+
+    def get_by_id(self, category: str, preset_id: str) -> Optional[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            preset = self._by_id.get(category, {}).get(preset_id)
+            return copy.deepcopy(preset) if preset is not None else None
+
+    def get_by_name(self, category: str, name: str) -> Optional[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            preset = self._by_name.get(category, {}).get(name)
+            return copy.deepcopy(preset) if preset is not None else None
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, category: str, name: str, config: Dict[str, Any], description: str = "") -> str:
+        """Add a preset and return its id; duplicate names get a timestamp suffix"""
+        if not name.strip():
+            raise ValueError("预设名称不能为空")
+
+        with self._lock:
+            presets = self._ensure_loaded()
+            if name in self._by_name.get(category, {}):
+                timestamp = time.strftime("%Y%m%d_%H%M%S")
+                name = f"{name}_{timestamp}"
+
+            preset = {
+                "id": str(uuid.uuid4()),
+                "name": name,
+                "description": description,
+                "config": copy.deepcopy(config),
+                "created_time": time.time(),
+                "created_date": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            presets.setdefault(category, []).append(preset)
+            self._by_id.setdefault(category, {}).setdefault(preset["id"], preset)
+            self._by_name.setdefault(category, {}).setdefault(name, preset)
+            self._save()
+            return preset["id"]
+
+    def delete(self, category: str, preset_id: str) -> bool:
+        with self._lock:
+            presets = self._ensure_loaded()
+            if preset_id not in self._by_id.get(category, {}):
+                return False
+            presets[category] = [p for p in presets[category] if p.get("id") != preset_id]
+            self._reindex(category)
+            self._save()
+            return True
+
+    def update(self, category: str, preset_id: str, new_config: Optional[Dict[str, Any]] = None,
+               new_name: Optional[str] = None, new_description: Optional[str] = None) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            preset = self._by_id.get(category, {}).get(preset_id)
+            if preset is None:
+                return False
+            if new_config is not None:
+                preset["config"] = copy.deepcopy(new_config)
+            if new_name is not None:
+                preset["name"] = new_name
+            if new_description is not None:
+                preset["description"] = new_description
+            preset["updated_time"] = time.time()
+            preset["updated_date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            if new_name is not None:
+                self._reindex(category)
+            self._save()
+            return True
+
+    def replace_all(self, presets: Dict[str, List[dict]]):
+        """Replace the whole library (used by ``save_all_presets``)"""
+        with self._lock:
+            self._presets = copy.deepcopy(presets)
+            self._reindex()
+            self._save()
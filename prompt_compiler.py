@@ -0,0 +1,75 @@
+"""
+Prompt Compiler
+Rewrites image references in a prompt from node port numbers to the
+position of the image in the API request.
+
+When only some of the 14 input ports are connected, "图3" written by the
+user (port 3) may be the 2nd image actually sent. All supported reference
+forms are matched by one precompiled regex and rewritten in a single pass
+through a port -> position lookup table, so a replacement can never be
+rewritten again and the prompt is scanned once regardless of how many
+ports are connected.
+
+Supported forms: 图N, 图片N, 第N张图, 第N个图, image N / image #N / img N /
+picture N (any case).
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+
+# Every alternative ends with the port number, so only the trailing digits
+# of a match are ever replaced. The leading character class lets the regex
+# engine skip ahead to candidate characters instead of trying every
+# alternative at every position; each branch then checks with a lookbehind
+# which character it started on.
+_REFERENCE_RE = re.compile(
+    r"[第图IiPp](?:"
+    r"(?<=第)(?P<zh_ordinal>\d+)(?=[张个]图)"                  # 第N张图 / 第N个图
+    r"|(?<=图)片?(?P<zh>\d+)(?!\d)"                           # 图N / 图片N
+    r"|(?<=[Ii])(?<![A-Za-z].)[Mm](?:[Aa][Gg][Ee]|[Gg])\s?#?(?P<en>\d+)(?!\d)"   # image N / img N
+    r"|(?<=[Pp])(?<![A-Za-z].)[Ii][Cc][Tt][Uu][Rr][Ee]\s?#?(?P<en_picture>\d+)(?!\d)"  # picture N
+    r")"
+)
+
+
+def build_port_mapping(input_images: Iterable[Optional[object]]) -> Dict[int, int]:
+    """
+    Map 1-based port numbers of connected images to their 1-based position
+    in the request, e.g. ports (None, img, None, img) -> {2: 1, 4: 2}.
+    """
+    mapping = {}
+    position = 0
+    for port, image in enumerate(input_images, 1):
+        if image is not None:
+            position += 1
+            mapping[port] = position
+    return mapping
+
+
+@lru_cache(maxsize=256)
+def _rewrite(prompt: str, mapping: Tuple[Tuple[int, int], ...]) -> str:
+    table = {str(port): str(position) for port, position in mapping if port != position}
+
+    def replace(match):
+        text = match.group(0)
+        number = match.group(match.lastgroup)
+        replacement = table.get(number)
+        if replacement is None:
+            return text
+        return text[:len(text) - len(number)] + replacement
+
+    return _REFERENCE_RE.sub(replace, prompt)
+
+
+def rewrite_image_refs(prompt: str, mapping: Dict[int, int]) -> str:
+    """
+    Rewrite port-number image references in ``prompt`` to request positions.
+
+    Results are memoized on (prompt, mapping); references to ports that are
+    not in ``mapping`` are left untouched.
+    """
+    if not prompt or all(port == position for port, position in mapping.items()):
+        return prompt
+    return _rewrite(prompt, tuple(sorted(mapping.items())))
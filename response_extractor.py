@@ -0,0 +1,243 @@
+"""
+Response Extractor
+Single-pass extraction of generated images from chat-completion responses
+(OpenRouter / comfly / other OpenAI-compatible providers).
+
+The response object is walked once; data URLs are located with plain
+``str.find`` so multi-MB base64 payloads are never scanned by a regex.
+Regexes only run on the short non-image text left over.
+"""
+
+import json
+import re
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+
+
+DATA_URL_PREFIX = "data:image/"
+
+# Characters that terminate an inline data URL in free text / markdown
+_DATA_URL_TERMINATORS = (")", "]", " ", "\n", "\r", "\t", '"', "'", "<", ">")
+
+_MARKDOWN_IMAGE_RE = re.compile(r'!\[[^\]]*\]\((https?://[^)\s]+)\)')
+_HTTP_IMAGE_RE = re.compile(r'https?://[^\s<>"()]+\.(?:jpg|jpeg|png|gif|webp|bmp)(?:\?[^\s<>"()]*)?', re.IGNORECASE)
+
+# Keys that may directly hold an image reference in loosely structured JSON
+_IMAGE_VALUE_KEYS = ("image", "image_url", "url", "data", "generated_image", "b64_json")
+
+_PLACEHOLDER = "[image]"
+
+
+class ImageRef(NamedTuple):
+    """A single image reference found in a response"""
+    url: str            # data URL or http(s) URL
+    source: str         # where it was found, e.g. "message.images", "content.image_url", "markdown"
+
+    @property
+    def is_data_url(self) -> bool:
+        return self.url.startswith("data:")
+
+
+class ExtractedResponse(NamedTuple):
+    """Result of walking a response: image references plus the remaining text"""
+    images: List[ImageRef]
+    text: str
+
+
+def _data_url_end(text: str, start: int) -> int:
+    """Return the index just past the data URL starting at ``start``"""
+    end = len(text)
+    for terminator in _DATA_URL_TERMINATORS:
+        pos = text.find(terminator, start, end)
+        if pos != -1:
+            end = pos
+    return end
+
+
+def scan_text(text: str, source: str = "content") -> Tuple[List[ImageRef], str]:
+    """
+    Find image references in free text (plain, markdown or mixed).
+
+    Data URLs are cut out with ``str.find``; the markdown / http regexes
+    then only see the residual text, which is small.
+
+    Returns:
+        (image references, residual text with data URLs replaced by a placeholder)
+    """
+    refs = []
+    if not text:
+        return refs, ""
+
+    residual_parts = []
+    pos = 0
+    while True:
+        start = text.find(DATA_URL_PREFIX, pos)
+        if start == -1:
+            residual_parts.append(text[pos:])
+            break
+        end = _data_url_end(text, start)
+        url = text[start:end]
+        if ";base64," in url[:64]:
+            refs.append(ImageRef(url, f"{source}.data_url"))
+            residual_parts.append(text[pos:start])
+            residual_parts.append(_PLACEHOLDER)
+        else:
+            residual_parts.append(text[pos:end])
+        pos = end
+
+    residual = "".join(residual_parts)
+
+    seen = set()
+    for match in _MARKDOWN_IMAGE_RE.finditer(residual):
+        url = match.group(1)
+        if url not in seen:
+            seen.add(url)
+            refs.append(ImageRef(url, f"{source}.markdown"))
+    for match in _HTTP_IMAGE_RE.finditer(residual):
+        url = match.group(0)
+        if url not in seen:
+            seen.add(url)
+            refs.append(ImageRef(url, f"{source}.http"))
+
+    return refs, residual
+
+
+def _ref_from_value(value: Any, source: str, mime_type: str = "image/png") -> Optional[ImageRef]:
+    """Build a reference from a single image-like value (string or dict)"""
+    if isinstance(value, str):
+        if value.startswith(DATA_URL_PREFIX) or value.startswith("http"):
+            return ImageRef(value, source)
+        return None
+    if isinstance(value, dict):
+        # {"url": ...} / {"image_url": {"url": ...}} / {"data": b64, "mime_type": ...}
+        if "image_url" in value:
+            return _ref_from_value(value["image_url"], source, mime_type)
+        if isinstance(value.get("url"), str):
+            return _ref_from_value(value["url"], source, mime_type)
+        data = value.get("data") or value.get("b64_json")
+        if isinstance(data, str) and data:
+            if data.startswith(DATA_URL_PREFIX):
+                return ImageRef(data, source)
+            mime = value.get("mime_type") or value.get("mimeType") or mime_type
+            return ImageRef(f"data:{mime};base64,{data}", source)
+    return None
+
+
+def _extract_images_field(images: Any, source: str) -> List[ImageRef]:
+    if isinstance(images, (str, dict)):
+        images = [images]
+    refs = []
+    if isinstance(images, list):
+        for item in images:
+            ref = _ref_from_value(item, source)
+            if ref is not None:
+                refs.append(ref)
+    return refs
+
+
+def _extract_content(content: Any, source: str) -> Tuple[List[ImageRef], List[str]]:
+    """Walk a message ``content`` value (string or OpenAI content-part list)"""
+    refs, texts = [], []
+    if isinstance(content, str):
+        found, residual = scan_text(content, source)
+        refs.extend(found)
+        if residual.strip():
+            texts.append(residual)
+    elif isinstance(content, list):
+        for part in content:
+            if isinstance(part, str):
+                found, residual = scan_text(part, source)
+                refs.extend(found)
+                texts.append(residual)
+            elif isinstance(part, dict):
+                part_type = part.get("type")
+                if part_type == "text" or (part_type is None and "text" in part):
+                    found, residual = scan_text(part.get("text") or "", f"{source}.text")
+                    refs.extend(found)
+                    texts.append(residual)
+                elif part_type in ("image_url", "image", "output_image") or "inline_data" in part or "inlineData" in part:
+                    inline = part.get("inline_data") or part.get("inlineData")
+                    ref = _ref_from_value(inline if inline else part, f"{source}.{part_type or 'inline_data'}")
+                    if ref is not None:
+                        refs.append(ref)
+    return refs, texts
+
+
+def extract_from_message(message: dict, source: str = "message") -> ExtractedResponse:
+    """Extract images and text from a chat ``message`` or streaming ``delta``"""
+    refs, texts = [], []
+
+    if message.get("images"):
+        refs.extend(_extract_images_field(message["images"], f"{source}.images"))
+
+    content = message.get("content")
+    if content:
+        found, content_texts = _extract_content(content, f"{source}.content")
+        refs.extend(found)
+        texts.extend(content_texts)
+
+    # Some providers put the image in a non-standard string field
+    for key, value in message.items():
+        if key in ("content", "images", "role") or not isinstance(value, str):
+            continue
+        if DATA_URL_PREFIX in value:
+            found, _ = scan_text(value, f"{source}.{key}")
+            refs.extend(found)
+
+    return ExtractedResponse(_dedupe(refs), "\n".join(t for t in texts if t))
+
+
+def extract_from_choice(choice: dict) -> ExtractedResponse:
+    """Extract images and text from a single ``choices[i]`` entry"""
+    if isinstance(choice.get("message"), dict):
+        return extract_from_message(choice["message"], "message")
+    if isinstance(choice.get("delta"), dict):
+        return extract_from_message(choice["delta"], "delta")
+    return ExtractedResponse([], "")
+
+
+def extract_from_json(obj: Any, source: str = "json") -> List[ImageRef]:
+    """Recursively collect image references from arbitrary JSON (last-resort fallback)"""
+    refs = []
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key in _IMAGE_VALUE_KEYS and isinstance(value, str):
+                    ref = _ref_from_value(value, f"{source}.{key}")
+                    if ref is not None:
+                        refs.append(ref)
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+    return _dedupe(refs)
+
+
+def extract_from_text(text: str) -> List[ImageRef]:
+    """
+    Extract image references from an already flattened response text.
+
+    Falls back to parsing the text as JSON only when nothing was found and
+    the text actually looks like a JSON document.
+    """
+    refs, residual = scan_text(text, "text")
+    if refs:
+        return _dedupe(refs)
+    stripped = residual.lstrip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return extract_from_json(json.loads(text), "text.json")
+        except ValueError:
+            pass
+    return []
+
+
+def _dedupe(refs: Iterable[ImageRef]) -> List[ImageRef]:
+    seen = set()
+    unique = []
+    for ref in refs:
+        if ref.url not in seen:
+            seen.add(ref.url)
+            unique.append(ref)
+    return unique
@@ -0,0 +1,231 @@
+"""
+Search Index
+In-process inverted index with BM25 ranking for prompt templates.
+
+Chinese text is indexed as character bigrams (plus single characters, so
+one-character queries still match); English and digits are indexed as
+lower-cased word tokens. Fields are weighted (title > tags > description >
+prompts) BM25F-style by scaling term frequencies before saturation.
+
+The built-in templates are searched with this index; user templates live
+in SQLite and are searched with FTS5 (user_templates_manager.py). The two
+rankings are merged with ``fuse_rankings``, by rank rather than by score.
+``search_indexes`` pools collection statistics when several of these
+indexes are searched together.
+"""
+
+import math
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Sequence, Tuple
+
+
+# English/digit words, or runs of CJK ideographs, kana and hangul
+_TOKEN_RE = re.compile(
+    r"[a-z0-9]+(?:['_-][a-z0-9]+)*"
+    r"|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+"
+)
+
+_STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "that", "the", "to", "with",
+))
+
+# Field name -> weight applied to its term frequencies
+DEFAULT_FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 1.5,
+    "prompt_zh": 1.0,
+    "prompt_en": 1.0,
+}
+
+
+def _is_cjk(token: str) -> bool:
+    return not ("a" <= token[0] <= "z" or "0" <= token[0] <= "9")
+
+
+def tokenize(text: str, for_query: bool = False) -> List[str]:
+    """
+    Split ``text`` into index terms.
+
+    CJK runs become overlapping bigrams; documents additionally index every
+    single character, queries only fall back to a single character when
+    the run is one character long.
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        if not _is_cjk(token):
+            if token not in _STOPWORDS:
+                terms.append(token)
+            continue
+        if len(token) == 1:
+            terms.append(token)
+            continue
+        terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+        if not for_query:
+            terms.extend(token)
+    return terms
+
+
+def template_search_fields(template: Dict[str, Any]) -> Dict[str, str]:
+    """Searchable fields of a built-in record or user template (same shape)"""
+    prompt = template.get("prompt")
+    if not isinstance(prompt, dict):
+        prompt = {"zh": prompt if isinstance(prompt, str) else ""}
+    description = template.get("description") or {}
+    if isinstance(description, dict):
+        description = " ".join(v for v in description.values() if isinstance(v, str))
+    tags = template.get("tags") or []
+    return {
+        "title": template.get("title") or "",
+        "tags": " ".join(t.replace("-", " ") for t in tags if isinstance(t, str)),
+        "description": description if isinstance(description, str) else "",
+        "prompt_zh": prompt.get("zh") or "",
+        "prompt_en": prompt.get("en") or "",
+    }
+
+
+class SearchIndex:
+    """Inverted index: term -> {doc_id: weighted term frequency}"""
+
+    def __init__(self, field_weights: Dict[str, float] = None):
+        self.field_weights = dict(field_weights or DEFAULT_FIELD_WEIGHTS)
+        self._postings: Dict[str, Dict[Hashable, float]] = {}
+        self._doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self._doc_lengths: Dict[Hashable, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._doc_lengths
+
+    def add(self, doc_id: Hashable, fields: Dict[str, str]):
+        """Index (or re-index) a document"""
+        if doc_id in self._doc_lengths:
+            self.remove(doc_id)
+
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, text in fields.items():
+            weight = self.field_weights.get(field, 1.0)
+            if not text or weight <= 0:
+                continue
+            for term in tokenize(text):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+                length += weight
+
+        for term, tf in frequencies.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._doc_terms[doc_id] = tuple(frequencies)
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: Hashable) -> bool:
+        if doc_id not in self._doc_lengths:
+            return False
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        return True
+
+    def clear(self):
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0.0
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[Hashable, float]]]:
+        """Return (total matches, [(doc_id, score), ...]) for one page"""
+        total, hits = search_indexes(query, [(None, self)], offset, limit)
+        return total, [(doc_id, score) for _, doc_id, score in hits]
+
+
+def search_indexes(query: str, indexes: Sequence[Tuple[Any, SearchIndex]], offset: int = 0, limit: int = 20,
+                   k1: float = 1.2, b: float = 0.75) -> Tuple[int, List[Tuple[Any, Hashable, float]]]:
+    """
+    BM25 search over several indexes with pooled collection statistics.
+
+    Args:
+        query: Free text query (Chinese, English or mixed)
+        indexes: ``(label, index)`` pairs; the label is returned with each hit
+        offset, limit: Page of the ranked result list to return
+
+    Returns:
+        (total number of matching documents, [(label, doc_id, score), ...])
+    """
+    terms = list(dict.fromkeys(tokenize(query, for_query=True)))
+    if not terms:
+        return 0, []
+
+    doc_count = sum(len(index) for _, index in indexes)
+    if doc_count == 0:
+        return 0, []
+    avg_length = sum(index._total_length for _, index in indexes) / doc_count or 1.0
+
+    scores: Dict[Tuple[int, Hashable], float] = {}
+    matched: Dict[Tuple[int, Hashable], int] = {}
+    for term in terms:
+        df = sum(len(index._postings.get(term, ())) for _, index in indexes)
+        if df == 0:
+            continue
+        idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+        for position, (_, index) in enumerate(indexes):
+            postings = index._postings.get(term)
+            if not postings:
+                continue
+            lengths = index._doc_lengths
+            for doc_id, tf in postings.items():
+                norm = k1 * (1.0 - b + b * lengths[doc_id] / avg_length)
+                key = (position, doc_id)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+                matched[key] = matched.get(key, 0) + 1
+
+    # Favour documents that contain more of the query terms (matters for bigrams)
+    term_count = len(terms)
+    ranked = sorted(
+        ((score * matched[key] / term_count, key) for key, score in scores.items()),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+    page = ranked[max(0, offset):max(0, offset) + max(0, limit)]
+    return len(ranked), [(indexes[position][0], doc_id, score) for score, (position, doc_id) in page]
+
+
+def fuse_rankings(rankings: Sequence[Tuple[Any, Sequence[Any]]], offset: int = 0, limit: int = 20,
+                  k: int = 60) -> List[Tuple[Any, Any, float]]:
+    """
+    Merge ranked lists from sources whose scores are not comparable
+    (reciprocal rank fusion): an item at rank r scores 1 / (k + r).
+
+    Args:
+        rankings: ``(label, items)`` pairs, each list best first; the label
+            is returned with each item and earlier sources win ties
+        offset, limit: Page of the merged list to return. Each source must
+            supply at least its top ``offset + limit`` items.
+
+    Returns:
+        [(label, item, score), ...]
+    """
+    fused = [
+        (1.0 / (k + rank), position, rank, label, item)
+        for position, (label, items) in enumerate(rankings)
+        for rank, item in enumerate(items, start=1)
+    ]
+    fused.sort(key=lambda entry: (-entry[0], entry[1], entry[2]))
+    page = fused[max(0, offset):max(0, offset) + max(0, limit)]
+    return [(label, item, score) for score, _, _, label, item in page]
+
+
+def build_index(documents: Iterable[Tuple[Hashable, Dict[str, str]]], field_weights: Dict[str, float] = None) -> SearchIndex:
+    """Convenience constructor from ``(doc_id, fields)`` pairs"""
+    index = SearchIndex(field_weights)
+    for doc_id, fields in documents:
+        index.add(doc_id, fields)
+    return index
@@ -0,0 +1,315 @@
+"""
+Streaming JSON
+Incremental reader for large JSON response bodies.
+
+The body is parsed chunk by chunk as it arrives from the socket. String
+values at selected paths (e.g. ``candidates.0.content.parts.1.inlineData.data``)
+are never materialised: their characters are handed to a sink while they
+are scanned, so a 4K image goes socket -> base64 decoder -> image decoder
+without existing as one giant Python string. Everything else is built into
+ordinary dicts/lists, which for these APIs are small.
+"""
+
+import base64
+import json
+import re
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+
+Path = Tuple[Any, ...]
+
+_STRING_SPECIAL_RE = re.compile(rb'["\\]')
+_WHITESPACE = frozenset(b" \t\r\n")
+_LITERAL_START = frozenset(b"-0123456789tfn")
+_LITERAL_END = frozenset(b",]} \t\r\n")
+_BASE64_IGNORED = b" \t\r\n"
+
+_QUOTE = ord('"')
+
+# Parser states
+_VALUE = 0          # expecting a value
+_VALUE_OR_END = 1   # just after '['
+_KEY_OR_END = 2     # just after '{'
+_KEY = 3            # after ',' inside an object
+_COLON = 4
+_AFTER_VALUE = 5    # expecting ',' or a closing bracket
+_STRING = 6
+_LITERAL = 7        # number / true / false / null
+_END = 8
+
+
+class StringSink:
+    """Receives the unescaped UTF-8 bytes of one streamed string value"""
+
+    def write(self, data: bytes):
+        raise NotImplementedError
+
+    def close(self) -> Any:
+        """Called at the closing quote; the return value is stored in the document"""
+        raise NotImplementedError
+
+
+class Base64Decoder:
+    """Incremental base64 decoder forwarding decoded bytes to ``write``"""
+
+    def __init__(self, write: Callable[[bytes], Any]):
+        self._write = write
+        self._pending = b""
+        self.decoded_bytes = 0
+
+    def feed(self, data: bytes):
+        data = data.translate(None, _BASE64_IGNORED)
+        if self._pending:
+            data = self._pending + data
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            decoded = base64.b64decode(data[:usable])
+            self.decoded_bytes += len(decoded)
+            self._write(decoded)
+
+    def flush(self):
+        if self._pending:
+            pending = self._pending + b"=" * (-len(self._pending) % 4)
+            self._pending = b""
+            decoded = base64.b64decode(pending)
+            self.decoded_bytes += len(decoded)
+            self._write(decoded)
+
+
+class StreamingJSONParser:
+    """
+    Push parser: ``feed()`` raw body chunks, then ``close()`` for the document.
+
+    ``sink_factory(path)`` is called for every string value; returning a
+    ``StringSink`` streams that value into the sink instead of buffering it.
+    ``path`` is the tuple of object keys / array indices leading to the value.
+    """
+
+    def __init__(self, sink_factory: Optional[Callable[[Path], Optional[StringSink]]] = None):
+        self._sink_factory = sink_factory
+        self._state = _VALUE
+        self._stack: List[list] = []     # [container, key] frames
+        self._root = None
+        self._offset = 0
+        self._carry = b""                # incomplete escape sequence from the previous chunk
+
+        # Current string
+        self._is_key = False
+        self._sink: Optional[StringSink] = None
+        self._parts: List[bytes] = []
+        self._has_escape = False
+
+        self._literal: List[bytes] = []
+
+    # ------------------------------------------------------------------
+    # Document building
+    # ------------------------------------------------------------------
+
+    def _path(self) -> Path:
+        # Nested containers are already appended to their parent list, the
+        # string being started (top frame) is not
+        last = len(self._stack) - 1
+        return tuple(
+            frame[1] if isinstance(frame[0], dict) else len(frame[0]) - (depth < last)
+            for depth, frame in enumerate(self._stack)
+        )
+
+    def _emit(self, value: Any):
+        if not self._stack:
+            self._root = value
+            self._state = _END
+            return
+        container, key = self._stack[-1]
+        if isinstance(container, dict):
+            container[key] = value
+        else:
+            container.append(value)
+        self._state = _AFTER_VALUE
+
+    def _open(self, container):
+        self._emit(container)
+        self._stack.append([container, None])
+        self._state = _KEY_OR_END if isinstance(container, dict) else _VALUE_OR_END
+
+    def _close_container(self, closing: int, offset: int):
+        expected = ord("}") if isinstance(self._stack[-1][0], dict) else ord("]")
+        if closing != expected:
+            raise ValueError(f"Unexpected {chr(closing)!r} at byte {offset}")
+        self._stack.pop()
+        self._state = _AFTER_VALUE if self._stack else _END
+
+    # ------------------------------------------------------------------
+    # Strings
+    # ------------------------------------------------------------------
+
+    def _start_string(self, is_key: bool):
+        self._is_key = is_key
+        self._sink = None
+        self._parts = []
+        self._has_escape = False
+        if not is_key and self._sink_factory is not None:
+            self._sink = self._sink_factory(self._path())
+        self._state = _STRING
+
+    def _string_write(self, data: bytes):
+        if self._sink is not None:
+            self._sink.write(data)
+        else:
+            self._parts.append(data)
+
+    def _string_escape(self, sequence: bytes):
+        if self._sink is not None:
+            try:
+                self._sink.write(json.loads(b'"' + sequence + b'"').encode("utf-8"))
+            except (ValueError, UnicodeEncodeError):
+                pass  # lone surrogate; never occurs in base64 payloads
+        else:
+            self._parts.append(sequence)
+            self._has_escape = True
+
+    def _end_string(self):
+        if self._sink is not None:
+            value = self._sink.close()
+            self._sink = None
+        else:
+            raw = b"".join(self._parts)
+            self._parts = []
+            value = json.loads(b'"' + raw + b'"') if self._has_escape else raw.decode("utf-8")
+
+        if self._is_key:
+            self._stack[-1][1] = value
+            self._state = _COLON
+        else:
+            self._emit(value)
+
+    def _finish_literal(self):
+        text = b"".join(self._literal)
+        self._literal = []
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise ValueError(f"Invalid literal {text[:20]!r} at byte {self._offset}")
+        self._emit(value)
+
+    # ------------------------------------------------------------------
+    # Feeding
+    # ------------------------------------------------------------------
+
+    def feed(self, chunk: bytes):
+        if self._carry:
+            chunk = self._carry + chunk
+            self._carry = b""
+        base = self._offset
+        n = len(chunk)
+        i = 0
+
+        while i < n:
+            state = self._state
+
+            if state == _STRING:
+                match = _STRING_SPECIAL_RE.search(chunk, i)
+                if match is None:
+                    self._string_write(chunk[i:])
+                    i = n
+                    break
+                j = match.start()
+                if j > i:
+                    self._string_write(chunk[i:j])
+                if chunk[j] == _QUOTE:
+                    i = j + 1
+                    self._end_string()
+                    continue
+                # Escape sequence, possibly split across chunks
+                if j + 1 >= n or (chunk[j + 1] == ord("u") and j + 6 > n):
+                    self._carry = chunk[j:]
+                    i = n
+                    break
+                end = j + 6 if chunk[j + 1] == ord("u") else j + 2
+                self._string_escape(chunk[j:end])
+                i = end
+                continue
+
+            c = chunk[i]
+
+            if state == _LITERAL:
+                j = i
+                while j < n and chunk[j] not in _LITERAL_END:
+                    j += 1
+                self._literal.append(chunk[i:j])
+                if j == n:
+                    i = n
+                    break
+                i = j
+                self._finish_literal()
+                continue
+
+            if c in _WHITESPACE:
+                i += 1
+                continue
+
+            if state in (_VALUE, _VALUE_OR_END):
+                if c == _QUOTE:
+                    self._start_string(False)
+                elif c == ord("{"):
+                    self._open({})
+                elif c == ord("["):
+                    self._open([])
+                elif c in _LITERAL_START:
+                    self._state = _LITERAL
+                    continue
+                elif c == ord("]") and state == _VALUE_OR_END:
+                    self._close_container(c, base + i)
+                else:
+                    raise ValueError(f"Unexpected {chr(c)!r} at byte {base + i}")
+            elif state in (_KEY, _KEY_OR_END):
+                if c == _QUOTE:
+                    self._start_string(True)
+                elif c == ord("}") and state == _KEY_OR_END:
+                    self._close_container(c, base + i)
+                else:
+                    raise ValueError(f"Expected object key at byte {base + i}")
+            elif state == _COLON:
+                if c != ord(":"):
+                    raise ValueError(f"Expected ':' at byte {base + i}")
+                self._state = _VALUE
+            elif state == _AFTER_VALUE:
+                if c == ord(","):
+                    self._state = _KEY if isinstance(self._stack[-1][0], dict) else _VALUE
+                elif c in (ord("}"), ord("]")):
+                    self._close_container(c, base + i)
+                else:
+                    raise ValueError(f"Expected ',' or closing bracket at byte {base + i}")
+            else:  # _END
+                raise ValueError(f"Extra data at byte {base + i}")
+            i += 1
+
+        self._offset = base + n - len(self._carry)
+
+    def close(self) -> Any:
+        """Finish parsing and return the document"""
+        if self._state == _LITERAL and not self._stack:
+            self._finish_literal()
+        if self._state != _END or self._carry:
+            raise ValueError(f"Incomplete JSON document ({self._offset} bytes read)")
+        return self._root
+
+
+def parse_chunks(chunks: Iterable[bytes],
+                 sink_factory: Optional[Callable[[Path], Optional[StringSink]]] = None) -> Any:
+    """Parse an iterable of byte chunks into a document"""
+    parser = StreamingJSONParser(sink_factory)
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+    return parser.close()
+
+
+def read_json_response(response, sink_factory: Optional[Callable[[Path], Optional[StringSink]]] = None,
+                       chunk_size: int = 64 * 1024) -> Any:
+    """
+    Parse a ``requests`` response opened with ``stream=True`` incrementally.
+
+    Must be called before the owning session is closed.
+    """
+    return parse_chunks(response.iter_content(chunk_size=chunk_size), sink_factory)
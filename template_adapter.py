@@ -1,12 +1,106 @@
 """
 Template Adapter for GPT-4o Image Prompts Gallery
 Adapts the 333 GPT-4o prompt templates for ComfyUI nodes
+
+The parsed catalog is cached as a pickle snapshot in ``.cache/`` keyed by
+the size, mtime and SHA-256 of prompts.json, so later starts skip JSON
+parsing and normalization. ``get_template_adapter`` returns the shared,
+lazily created instance used by the routes and the node.
 """
 
+import bisect
+import hashlib
 import json
 import os
+import pickle
+import threading
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Sequence
+
+try:
+    from .atomic_io import atomic_write_bytes
+    from .image_manifest import ImageManifest, manifest_digest
+    from .search_index import SearchIndex, build_index, template_search_fields
+except ImportError:  # executed as a script (see __main__ below)
+    from atomic_io import atomic_write_bytes
+    from image_manifest import ImageManifest, manifest_digest
+    from search_index import SearchIndex, build_index, template_search_fields
+
+
+# English tag -> Chinese display name
+TAG_TRANSLATIONS = {
+    # 基础类型
+    'portrait': '人像',
+    'landscape': '风景',
+    'interior': '室内',
+    'nature': '自然',
+    'photography': '摄影',
+    'illustration': '插画',
+    'logo': '标志',
+    'minimalist': '极简',
+    'character': '角色',
+    'branding': '品牌',
+    'poster': '海报',
+    'ui': '界面',
+    
+    # 工艺材质
+    'paper-craft': '纸艺',
+    'clay': '粘土',
+    'felt': '毛毡',
+    'sculpture': '雕塑',
+    'pixel': '像素',
+    
+    # 对象主题
+    'toy': '玩具',
+    'vehicle': '交通工具',
+    'architecture': '建筑',
+    'food': '美食',
+    'product': '产品',
+    'animal': '动物',
+    'fashion': '时尚',
+    
+    # 风格流派
+    'abstract': '抽象',
+    'pattern': '图案',
+    'typography': '字体',
+    'vintage': '复古',
+    'retro': '复古',
+    'modern': '现代',
+    'fantasy': '奇幻',
+    'scifi': '科幻',
+    'futuristic': '未来',
+    'neon': '霓虹',
+    'cyberpunk': '赛博朋克',
+    
+    # 艺术形式
+    'anime': '动漫',
+    'cartoon': '卡通',
+    '3d': '三维',
+    'pixel-art': '像素艺术',
+    'watercolor': '水彩',
+    'oil-painting': '油画',
+    'sketch': '素描',
+    
+    # 其他
+    'emoji': '表情',
+    'infographic': '信息图',
+    'gaming': '游戏',
+    'creative': '创意',
+}
+
+
+# Fields returned by the summary listing when no ``fields`` are requested
+SUMMARY_FIELDS = ('id', 'title', 'coverImage', 'tags')
+
+# Fields a client may select for the summary listing
+SELECTABLE_FIELDS = frozenset((
+    'id', 'title', 'description', 'tags', 'coverImage', 'images',
+    'prompt', 'source', 'notes', 'examples', 'difficulty',
+    'coverImageMeta', 'imagesMeta'
+))
+
+# Bump when the snapshot layout or _normalize_template output changes
+SNAPSHOT_VERSION = 1
 
 
 class PromptTemplateAdapter:
@@ -15,12 +109,33 @@ class PromptTemplateAdapter:
     Provides bilingual template browsing and category management
     """
     
-    def __init__(self):
-        """Initialize adapter and load templates"""
+    def __init__(self, use_snapshot: bool = True):
+        """
+        Initialize adapter and load templates
+        
+        Args:
+            use_snapshot: Load from / write to the precompiled snapshot in ``.cache/``
+        """
         self.base_dir = Path(__file__).parent
         self.data_file = self.base_dir / "gpt4o-image-prompts-master" / "gpt4o-image-prompts-master" / "data" / "prompts.json"
+        self.snapshot_file = self.base_dir / ".cache" / "templates.pickle" if use_snapshot else None
+        self.image_manifest = ImageManifest(
+            str(self.data_file.parent.parent / "images"), str(self.base_dir / ".cache" / "image_manifest.json")
+        )
         self.templates = []
         self.categories = {}
+        # Changes whenever prompts.json, the record layout or the image manifest changes;
+        # used for HTTP validators
+        self.catalog_version = f"{SNAPSHOT_VERSION}-empty"
+        self._source_version = self.catalog_version
+        # Built once at load by _build_index()
+        self._records: Dict[Any, Dict[str, Any]] = {}        # id -> normalized record
+        self._tag_index: Dict[str, List[Any]] = {}            # tag -> ids, newest first
+        self._category_lists: Dict[str, List[Dict[str, Any]]] = {}
+        self._category_payloads: Dict[str, bytes] = {}        # tag -> serialized JSON
+        self._cursor_keys: Dict[str, List[Any]] = {}           # tag -> negated ids for bisect
+        self._search_index = None                              # built on first search
+        self._search_lock = threading.Lock()                   # warm-up thread vs first request
         self._load_templates()
     
     def _load_templates(self):
@@ -30,13 +145,23 @@ class PromptTemplateAdapter:
                 print(f"[PromptTemplateAdapter] Warning: Data file not found: {self.data_file}")
                 return
             
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            st = self.data_file.stat()
+            if self._load_snapshot(st):
+                print(f"[PromptTemplateAdapter] Loaded {len(self.templates)} templates (snapshot)")
+                self._apply_image_manifest()
+                return
+            
+            raw = self.data_file.read_bytes()
+            data = json.loads(raw)
             
             if 'items' in data:
                 self.templates = data['items']
                 print(f"[PromptTemplateAdapter] Loaded {len(self.templates)} templates")
-                self._build_categories()
+                self._build_index()
+                sha256 = hashlib.sha256(raw).hexdigest()
+                self._source_version = f"{SNAPSHOT_VERSION}-{sha256[:16]}"
+                self._save_snapshot(st, sha256)
+                self._apply_image_manifest()
             else:
                 print(f"[PromptTemplateAdapter] Warning: No 'items' found in data file")
         
@@ -45,85 +170,152 @@ class PromptTemplateAdapter:
             import traceback
             traceback.print_exc()
     
-    def _build_categories(self):
-        """Build category index from templates"""
-        # Collect all unique tags
-        all_tags = set()
+    def _load_snapshot(self, st: os.stat_result) -> bool:
+        """
+        Restore the catalog from the snapshot if it matches prompts.json
+        
+        The snapshot file holds two pickles: a small key (checked first) and
+        the catalog itself. A touched but unchanged file is accepted by hash,
+        and the key is then rewritten so the next start skips the hash again.
+        """
+        if self.snapshot_file is None:
+            return False
+        touched = False
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                key = pickle.load(f)
+                if key.get('version') != SNAPSHOT_VERSION:
+                    return False
+                if (key.get('mtime_ns'), key.get('size')) != (st.st_mtime_ns, st.st_size):
+                    if key.get('size') != st.st_size:
+                        return False
+                    if hashlib.sha256(self.data_file.read_bytes()).hexdigest() != key.get('sha256'):
+                        return False
+                    touched = True
+                catalog = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"[PromptTemplateAdapter] Ignoring unreadable snapshot: {e}")
+            return False
+        
+        self.templates = catalog['templates']
+        self._records = catalog['records']
+        self._tag_index = catalog['tag_index']
+        self.categories = catalog['categories']
+        self._source_version = f"{SNAPSHOT_VERSION}-{key['sha256'][:16]}"
+        if touched:
+            self._save_snapshot(st, key['sha256'])
+        return True
+    
+    def _save_snapshot(self, st: os.stat_result, sha256: str):
+        """Write the snapshot; failures (e.g. read-only install) are not fatal"""
+        if self.snapshot_file is None:
+            return
+        key = {'version': SNAPSHOT_VERSION, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': sha256}
+        catalog = {
+            'templates': self.templates,
+            'records': self._records,
+            'tag_index': self._tag_index,
+            'categories': self.categories,
+        }
+        try:
+            self.snapshot_file.parent.mkdir(exist_ok=True)
+            data = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(catalog, protocol=pickle.HIGHEST_PROTOCOL)
+            atomic_write_bytes(str(self.snapshot_file), data)
+        except OSError as e:
+            print(f"[PromptTemplateAdapter] Could not write snapshot: {e}")
+    
+    def _apply_image_manifest(self):
+        """
+        Attach image metadata (size, dimensions, colour...) from the manifest
+        to every record as ``coverImageMeta`` / ``imagesMeta``
+        
+        Records are replaced rather than mutated, so readers on other threads
+        keep seeing consistent objects; derived caches are dropped.
+        """
+        manifest = self.image_manifest
+        records = {}
+        for record_id, record in self._records.items():
+            record = dict(record)
+            record['coverImageMeta'] = manifest.get(record['coverImage'].split('/')[-1]) if record['coverImage'] else None
+            record['imagesMeta'] = [manifest.get(path.split('/')[-1]) for path in record['images']]
+            records[record_id] = record
+        self._records = records
+        self._category_lists = {}
+        self._category_payloads = {}
+        self.catalog_version = f"{self._source_version}-{manifest_digest(manifest.images)}"
+    
+    def refresh_image_manifest(self) -> bool:
+        """Re-probe new/changed images (slow on first run) and re-attach metadata if anything changed"""
+        if not self.image_manifest.refresh():
+            return False
+        self._apply_image_manifest()
+        print(f"[PromptTemplateAdapter] Image manifest updated ({len(self.image_manifest.images)} images)")
+        return True
+    
+    @staticmethod
+    def _normalize_template(template: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw prompts.json item into the bilingual record sent to the frontend"""
+        prompts = template.get('prompts', [])
+        
+        # Handle description - convert string to bilingual object
+        desc = template.get('description', '')
+        desc_obj = {
+            'zh': desc if desc else '',
+            'en': desc if desc else ''
+        }
+        
+        return {
+            'id': template.get('id'),
+            'title': template.get('title', ''),
+            'description': desc_obj,
+            'tags': template.get('tags', []),
+            'coverImage': template.get('coverImage', ''),
+            'images': template.get('images', []),
+            'prompt': {
+                'zh': prompts[1] if len(prompts) > 1 else prompts[0] if prompts else '',
+                'en': prompts[0] if prompts else ''
+            },
+            'source': template.get('source', {}),
+            'notes': template.get('notes', []),
+            'examples': template.get('examples', []),
+            'difficulty': template.get('difficulty', '')
+        }
+    
+    def _build_index(self):
+        """Build records, the tag -> ids index and the category list in one pass"""
+        self._records = {}
+        tag_index: Dict[str, List[Any]] = {}
+        
         for template in self.templates:
-            tags = template.get('tags', [])
-            all_tags.update(tags)
+            record = self._normalize_template(template)
+            self._records[record['id']] = record
+            for tag in dict.fromkeys(template.get('tags', [])):
+                tag_index.setdefault(tag, []).append(record['id'])
+        
+        # Sort by ID descending (newest first)
+        for ids in tag_index.values():
+            ids.sort(reverse=True)
+        self._tag_index = tag_index
+        self._category_lists = {}
+        self._category_payloads = {}
+        self._cursor_keys = {}
+        self._search_index = None
         
         # Build category dictionary
-        for tag in sorted(all_tags):
+        self.categories = {}
+        for tag in sorted(tag_index):
             self.categories[tag] = {
                 'id': tag,
                 'name_zh': self._translate_tag_zh(tag),
                 'name_en': tag.replace('-', ' ').title(),
-                'count': sum(1 for t in self.templates if tag in t.get('tags', []))
+                'count': len(tag_index[tag])
             }
     
     def _translate_tag_zh(self, tag: str) -> str:
         """Translate English tag to Chinese"""
-        translations = {
-            # 基础类型
-            'portrait': '人像',
-            'landscape': '风景',
-            'interior': '室内',
-            'nature': '自然',
-            'photography': '摄影',
-            'illustration': '插画',
-            'logo': '标志',
-            'minimalist': '极简',
-            'character': '角色',
-            'branding': '品牌',
-            'poster': '海报',
-            'ui': '界面',
-            
-            # 工艺材质
-            'paper-craft': '纸艺',
-            'clay': '粘土',
-            'felt': '毛毡',
-            'sculpture': '雕塑',
-            'pixel': '像素',
-            
-            # 对象主题
-            'toy': '玩具',
-            'vehicle': '交通工具',
-            'architecture': '建筑',
-            'food': '美食',
-            'product': '产品',
-            'animal': '动物',
-            'fashion': '时尚',
-            
-            # 风格流派
-            'abstract': '抽象',
-            'pattern': '图案',
-            'typography': '字体',
-            'vintage': '复古',
-            'retro': '复古',
-            'modern': '现代',
-            'fantasy': '奇幻',
-            'scifi': '科幻',
-            'futuristic': '未来',
-            'neon': '霓虹',
-            'cyberpunk': '赛博朋克',
-            
-            # 艺术形式
-            'anime': '动漫',
-            'cartoon': '卡通',
-            '3d': '三维',
-            'pixel-art': '像素艺术',
-            'watercolor': '水彩',
-            'oil-painting': '油画',
-            'sketch': '素描',
-            
-            # 其他
-            'emoji': '表情',
-            'infographic': '信息图',
-            'gaming': '游戏',
-            'creative': '创意',
-        }
-        return translations.get(tag, tag)
+        return TAG_TRANSLATIONS.get(tag, tag)
     
     def get_all_categories(self, lang: str = 'zh') -> List[Dict[str, Any]]:
         """
@@ -156,44 +348,73 @@ class PromptTemplateAdapter:
             category_id: Category/tag ID
         
         Returns:
-            List of template dictionaries
+            List of template dictionaries, newest first (shared records; treat as read-only)
+        """
+        lists = self._category_lists
+        if category_id not in lists:
+            lists[category_id] = [self._records[i] for i in self._tag_index.get(category_id, [])]
+        return lists[category_id]
+    
+    def get_category_summaries(self, category_id: str, cursor: Optional[int] = None, limit: int = 50,
+                               fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
         """
-        filtered = []
+        One page of lightweight template summaries for a category
         
-        for template in self.templates:
-            if category_id in template.get('tags', []):
-                # Extract both language prompts if available
-                prompts = template.get('prompts', [])
-                
-                # Handle description - convert string to bilingual object
-                desc = template.get('description', '')
-                desc_obj = {
-                    'zh': desc if desc else '',
-                    'en': desc if desc else ''
-                }
-                
-                prompt_data = {
-                    'id': template.get('id'),
-                    'title': template.get('title', ''),
-                    'description': desc_obj,
-                    'tags': template.get('tags', []),
-                    'coverImage': template.get('coverImage', ''),
-                    'images': template.get('images', []),
-                    'prompt': {
-                        'zh': prompts[1] if len(prompts) > 1 else prompts[0] if prompts else '',
-                        'en': prompts[0] if prompts else ''
-                    },
-                    'source': template.get('source', {}),
-                    'notes': template.get('notes', []),
-                    'examples': template.get('examples', []),
-                    'difficulty': template.get('difficulty', '')
-                }
-                
-                filtered.append(prompt_data)
+        Keyset pagination over the newest-first id order: ``cursor`` is the
+        last id of the previous page, so pages stay stable while paging.
         
-        # Sort by ID descending (newest first)
-        filtered.sort(key=lambda x: x['id'], reverse=True)
-        return filtered
+        Args:
+            category_id: Category/tag ID
+            cursor: Return templates with an id lower than this (None = first page)
+            limit: Page size
+            fields: Fields to include (default ``SUMMARY_FIELDS``; ``id`` is always included)
+        
+        Returns:
+            {'items': [...], 'nextCursor': id or None, 'total': int}
+        """
+        ids = self._tag_index.get(category_id, [])
+        start = 0
+        if cursor is not None:
+            # ids are sorted descending; bisect over the (cached) negated order
+            keys = self._cursor_keys.get(category_id)
+            if keys is None:
+                keys = self._cursor_keys[category_id] = [-i for i in ids]
+            start = bisect.bisect_right(keys, -cursor)
+        page_ids = ids[start:start + max(1, limit)]
+        
+        selected = ['id'] + [f for f in (fields or SUMMARY_FIELDS) if f in SELECTABLE_FIELDS and f != 'id']
+        items = []
+        for record_id in page_ids:
+            record = self._records[record_id]
+            items.append({field: record[field] for field in selected})
+        
+        has_more = start + len(page_ids) < len(ids)
+        return {
+            'items': items,
+            'nextCursor': page_ids[-1] if has_more and page_ids else None,
+            'total': len(ids)
+        }
+    
+    def get_category_payload(self, category_id: str) -> bytes:
+        """
+        Serialized JSON of ``get_templates_by_category``, cached per category
+        
+        Args:
+            category_id: Category/tag ID
+        
+        Returns:
+            UTF-8 JSON bytes ready to be sent as a response body
+        """
+        # Captured before reading the records: if _apply_image_manifest swaps in
+        # a new dict meanwhile, a payload built from old records lands in the old one
+        payloads = self._category_payloads
+        payload = payloads.get(category_id)
+        if payload is None:
+            templates = self.get_templates_by_category(category_id)
+            payload = json.dumps(templates, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            if category_id in self._tag_index:
+                payloads[category_id] = payload
+        return payload
     
     def get_template_by_id(self, template_id: int) -> Dict[str, Any]:
         """
@@ -203,36 +424,20 @@ class PromptTemplateAdapter:
             template_id: Template ID
         
         Returns:
-            Template dictionary or None
+            Template dictionary (shared record; treat as read-only) or None
         """
-        for template in self.templates:
-            if template.get('id') == template_id:
-                prompts = template.get('prompts', [])
-                
-                # Handle description - convert string to bilingual object
-                desc = template.get('description', '')
-                desc_obj = {
-                    'zh': desc if desc else '',
-                    'en': desc if desc else ''
-                }
-                
-                return {
-                    'id': template.get('id'),
-                    'title': template.get('title', ''),
-                    'description': desc_obj,
-                    'tags': template.get('tags', []),
-                    'coverImage': template.get('coverImage', ''),
-                    'images': template.get('images', []),
-                    'prompt': {
-                        'zh': prompts[1] if len(prompts) > 1 else prompts[0] if prompts else '',
-                        'en': prompts[0] if prompts else ''
-                    },
-                    'source': template.get('source', {}),
-                    'notes': template.get('notes', []),
-                    'examples': template.get('examples', []),
-                    'difficulty': template.get('difficulty', '')
-                }
-        return None
+        return self._records.get(template_id)
+    
+    @property
+    def search_index(self) -> SearchIndex:
+        """Full-text index over titles, prompts, tags and descriptions (built lazily)"""
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = build_index(
+                        (record_id, template_search_fields(record)) for record_id, record in self._records.items()
+                    )
+        return self._search_index
     
     def search_templates(self, keyword: str, lang: str = 'zh') -> List[Dict[str, Any]]:
         """
@@ -243,39 +448,59 @@ class PromptTemplateAdapter:
             lang: Language for search
         
         Returns:
-            List of matching templates
+            List of matching templates, most relevant first
         """
-        keyword_lower = keyword.lower()
+        total, hits = self.search_index.search(keyword, 0, len(self._records))
         results = []
         
-        for template in self.templates:
-            # Search in title
-            if keyword_lower in template.get('title', '').lower():
-                prompts = template.get('prompts', [])
-                
-                # Handle description - convert string to bilingual object
-                desc = template.get('description', '')
-                desc_obj = {
-                    'zh': desc if desc else '',
-                    'en': desc if desc else ''
-                }
-                
-                results.append({
-                    'id': template.get('id'),
-                    'title': template.get('title', ''),
-                    'description': desc_obj,
-                    'tags': template.get('tags', []),
-                    'coverImage': template.get('coverImage', ''),
-                    'prompt': {
-                        'zh': prompts[1] if len(prompts) > 1 else prompts[0] if prompts else '',
-                        'en': prompts[0] if prompts else ''
-                    },
-                    'difficulty': template.get('difficulty', '')
-                })
+        # Ranked by relevance (BM25)
+        for record_id, score in hits:
+            record = self._records[record_id]
+            results.append({
+                key: record[key]
+                for key in ('id', 'title', 'description', 'tags', 'coverImage', 'prompt', 'difficulty')
+            })
         
         return results
 
 
+_adapter_lock = threading.Lock()
+_adapter_instance: Optional[PromptTemplateAdapter] = None
+
+
+def get_template_adapter() -> PromptTemplateAdapter:
+    """Process-wide adapter, created on first use (thread-safe)"""
+    global _adapter_instance
+    adapter = _adapter_instance
+    if adapter is None:
+        with _adapter_lock:
+            if _adapter_instance is None:
+                _adapter_instance = PromptTemplateAdapter()
+            adapter = _adapter_instance
+    return adapter
+
+
+def warm_up_template_adapter(build_search_index: bool = True, refresh_images: bool = True) -> threading.Thread:
+    """
+    Load the shared adapter (and optionally its search index and image
+    manifest) on a daemon thread so the first request doesn't pay for it
+    and startup isn't blocked
+    """
+    def run():
+        try:
+            adapter = get_template_adapter()
+            if build_search_index:
+                adapter.search_index
+            if refresh_images:
+                adapter.refresh_image_manifest()
+        except Exception as e:
+            print(f"[PromptTemplateAdapter] Warm-up failed: {e}")
+    
+    thread = threading.Thread(target=run, name="tutu-template-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
 # For backward compatibility
 if __name__ == "__main__":
     # Test the adapter
@@ -0,0 +1,240 @@
+"""
+Thumbnails
+Resized variants of the template gallery images, generated on demand.
+
+Requested widths are snapped up to a few fixed sizes so the cache stays
+small, and images are never upscaled. Variants are encoded on a worker
+thread and stored in a content-addressed disk cache (the key is derived
+from the source file's SHA-256 and the variant parameters), so each one is
+generated once and identical sources share their thumbnails. Concurrent
+requests for the same variant wait for a single encode.
+
+Contact sheets (one sprite with the square cover tiles of a page of
+templates) are cached the same way, keyed by the hashes of all tiles.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+from .atomic_io import atomic_write_bytes
+from .tutu_logging import get_logger
+
+logger = get_logger("thumbnails")
+
+# Bump when the encoder settings change so old variants are not reused
+THUMBNAIL_VERSION = 1
+
+# Allowed output widths; requests are snapped up to the next one
+THUMBNAIL_WIDTHS = (160, 320, 480, 640, 960, 1280)
+
+# format name -> (PIL format, content type, file extension, save options)
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "png": ("PNG", "image/png", ".png", {"optimize": True}),
+}
+
+# Allowed contact sheet tile sizes (square, in pixels)
+CONTACT_SHEET_TILE_SIZES = (64, 96, 128, 192)
+
+# Source extension -> default output format when none is requested
+_DEFAULT_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp", ".gif": "png"}
+
+# Modes each encoder takes as-is (JPEG is flattened onto white separately)
+_SAVE_MODES = {"WEBP": ("RGB", "RGBA"), "PNG": ("RGB", "RGBA", "L", "LA", "P")}
+
+
+class Thumbnail(NamedTuple):
+    path: str
+    content_type: str
+    etag: str
+
+
+class ContactSheet(NamedTuple):
+    key: str
+    path: str
+    width: int
+    height: int
+
+
+def snap_width(width: int) -> int:
+    """Round a requested width up to the next allowed size"""
+    for allowed in THUMBNAIL_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def render_thumbnail(source_path: str, width: int, fmt: str) -> bytes:
+    """Decode, downscale (never upscale) and encode one variant"""
+    pil_format, _, _, options = THUMBNAIL_FORMATS[fmt]
+    with Image.open(source_path) as img:
+        # JPEG can decode at 1/2, 1/4, 1/8 scale, which is much faster
+        img.draft("RGB", (width, max(1, img.height * width // max(1, img.width))))
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+
+        if pil_format == "JPEG":
+            if img.mode in ("RGBA", "LA", "P"):
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                rgba = img.convert("RGBA")
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+        elif img.mode not in _SAVE_MODES[pil_format]:
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=pil_format, **options)
+        return buffer.getvalue()
+
+
+def render_contact_sheet(source_paths: Sequence[Optional[str]], tile: int, columns: int) -> bytes:
+    """
+    Compose square, centre-cropped tiles into one WebP sprite
+
+    Tile ``i`` is at ``(i % columns * tile, i // columns * tile)``; missing or
+    unreadable sources leave their tile empty.
+    """
+    rows = max(1, -(-len(source_paths) // columns))
+    sheet = Image.new("RGB", (columns * tile, rows * tile), (42, 42, 42))
+    for index, source_path in enumerate(source_paths):
+        if not source_path:
+            continue
+        try:
+            with Image.open(source_path) as img:
+                img.draft("RGB", (tile, tile))
+                img = ImageOps.exif_transpose(img)
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                cover = ImageOps.fit(img, (tile, tile), Image.LANCZOS)
+        except Exception as e:
+            logger.warning("contact sheet: skipping %s: %s", source_path, e)
+            continue
+        sheet.paste(cover, (index % columns * tile, index // columns * tile))
+
+    buffer = io.BytesIO()
+    sheet.save(buffer, format="WEBP", quality=75, method=4)
+    return buffer.getvalue()
+
+
+class ThumbnailService:
+    """Content-addressed thumbnail cache with a small encoder pool"""
+
+    def __init__(self, cache_dir: str, max_workers: int = 2):
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tutu-thumbnail")
+        self._lock = threading.Lock()
+        # (path, mtime_ns, size) -> source sha256
+        self._source_hashes: Dict[Tuple[str, int, int], str] = {}
+        # (path, width, format) or contact sheet key -> in-flight generation
+        self._pending: Dict[tuple, asyncio.Future] = {}
+
+    def default_format(self, source_path: str) -> str:
+        return _DEFAULT_FORMATS.get(os.path.splitext(source_path)[1].lower(), "png")
+
+    def _source_hash(self, source_path: str) -> str:
+        st = os.stat(source_path)
+        key = (source_path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._source_hashes.get(key)
+        if digest is None:
+            digest = _file_sha256(source_path)
+            with self._lock:
+                self._source_hashes[key] = digest
+        return digest
+
+    def _cache_path(self, cache_key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, cache_key[:2], cache_key + THUMBNAIL_FORMATS[fmt][2])
+
+    def _ensure(self, source_path: str, width: int, fmt: str) -> Thumbnail:
+        """Return the cached variant, generating it first if needed (worker thread)"""
+        source_hash = self._source_hash(source_path)
+        cache_key = hashlib.sha256(f"{source_hash}:{width}:{fmt}:{THUMBNAIL_VERSION}".encode()).hexdigest()
+        path = self._cache_path(cache_key, fmt)
+        if not os.path.exists(path):
+            data = render_thumbnail(source_path, width, fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_bytes(path, data)
+            logger.debug("thumbnail %s w=%d %s: %d bytes", os.path.basename(source_path), width, fmt, len(data))
+        return Thumbnail(path, THUMBNAIL_FORMATS[fmt][1], f'"{cache_key[:32]}"')
+
+    def _ensure_contact_sheet(self, source_paths: Tuple[Optional[str], ...], tile: int, columns: int) -> ContactSheet:
+        parts = [self._source_hash(path) if path and os.path.isfile(path) else "-" for path in source_paths]
+        cache_key = hashlib.sha256(
+            f"sheet:{tile}:{columns}:{THUMBNAIL_VERSION}:{','.join(parts)}".encode()
+        ).hexdigest()
+        path = self._cache_path(cache_key, "webp")
+        if not os.path.exists(path):
+            data = render_contact_sheet(
+                [p if h != "-" else None for p, h in zip(source_paths, parts)], tile, columns
+            )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_bytes(path, data)
+            logger.debug("contact sheet %d tiles @%d: %d bytes", len(source_paths), tile, len(data))
+        rows = max(1, -(-len(source_paths) // columns))
+        return ContactSheet(cache_key, path, columns * tile, rows * tile)
+
+    async def contact_sheet(self, source_paths: Sequence[Optional[str]], tile: int, columns: int = 8) -> ContactSheet:
+        """
+        Sprite of square cover tiles for ``source_paths`` (None = empty tile)
+
+        Args:
+            tile: Tile size, snapped up to one of ``CONTACT_SHEET_TILE_SIZES``
+            columns: Tiles per row
+        """
+        tile = next((size for size in CONTACT_SHEET_TILE_SIZES if tile <= size), CONTACT_SHEET_TILE_SIZES[-1])
+        source_paths = tuple(source_paths)
+        return await self._run_once(
+            ("sheet", source_paths, tile, columns), self._ensure_contact_sheet, source_paths, tile, columns
+        )
+
+    def contact_sheet_path(self, cache_key: str) -> Optional[str]:
+        """Cached sprite file for a key returned by ``contact_sheet`` (None if unknown)"""
+        if len(cache_key) != 64 or any(c not in "0123456789abcdef" for c in cache_key):
+            return None
+        path = self._cache_path(cache_key, "webp")
+        return path if os.path.exists(path) else None
+
+    async def _run_once(self, pending_key, func, *args):
+        """Run ``func`` on the encoder pool; concurrent callers with the same key share one run"""
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(pending_key)
+        if future is None:
+            future = loop.run_in_executor(self._executor, func, *args)
+            self._pending[pending_key] = future
+            future.add_done_callback(lambda _: self._pending.pop(pending_key, None))
+        return await asyncio.shield(future)
+
+    async def get(self, source_path: str, width: Optional[int] = None, fmt: Optional[str] = None) -> Thumbnail:
+        """
+        Path of the variant of ``source_path`` at (snapped) ``width`` in ``fmt``.
+
+        Args:
+            width: Requested width in pixels (None = original size, re-encoded)
+            fmt: One of ``THUMBNAIL_FORMATS`` (None = same family as the source)
+        """
+        fmt = fmt or self.default_format(source_path)
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        width = snap_width(width) if width else 1 << 16
+        return await self._run_once((source_path, width, fmt), self._ensure, source_path, width, fmt)
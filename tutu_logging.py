@@ -0,0 +1,213 @@
+"""
+Tutu Logging
+Leveled, lazily formatted logging for the Tutu nodes.
+
+All loggers live under the ``tutu`` namespace (``tutu.gemini``,
+``tutu.banana_pro`` ...). Levels are read from Tutuapi.json:
+
+    "log_level": "INFO",
+    "log_levels": {"gemini": "DEBUG"}
+
+Messages use %-style arguments so nothing is formatted unless the record
+is actually emitted; large objects are wrapped in ``Preview`` / ``LazyJSON``
+and can be rate limited with ``log_large``.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+ROOT_LOGGER_NAME = "tutu"
+DEFAULT_LEVEL = logging.INFO
+
+_PREFIXES = {
+    logging.DEBUG: "[Tutu DEBUG] ",
+    logging.INFO: "[Tutu] ",
+    logging.WARNING: "[Tutu] ",
+    logging.ERROR: "[Tutu] ",
+    logging.CRITICAL: "[Tutu] ",
+}
+
+
+class _TutuFormatter(logging.Formatter):
+    """Keep the familiar ``[Tutu]`` / ``[Tutu DEBUG]`` console prefixes"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        prefix = _PREFIXES.get(record.levelno, "[Tutu] ")
+        # Preserve leading blank lines used as visual separators
+        stripped = message.lstrip("\n")
+        return message[:len(message) - len(stripped)] + prefix + stripped
+
+
+def _init_root() -> logging.Logger:
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if not any(getattr(h, "_tutu_handler", False) for h in root.handlers):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_TutuFormatter("%(message)s"))
+        handler._tutu_handler = True
+        root.addHandler(handler)
+    # ComfyUI configures the root logger itself; don't print everything twice
+    root.propagate = False
+    if root.level == logging.NOTSET:
+        root.setLevel(DEFAULT_LEVEL)
+    return root
+
+
+_init_root()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return the ``tutu.<name>`` logger"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def _parse_level(value: Any) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        level = logging.getLevelName(value.strip().upper())
+        if isinstance(level, int):
+            return level
+    return None
+
+
+_configured_names = set()
+
+
+def configure_logging(config: Dict[str, Any]):
+    """Apply ``log_level`` / ``log_levels`` from a Tutuapi.json style dict"""
+    root = _init_root()
+    level = _parse_level(config.get("log_level"))
+    root.setLevel(level if level is not None else DEFAULT_LEVEL)
+
+    # Per-module overrides from a previous configuration no longer apply
+    for name in _configured_names:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _configured_names.clear()
+
+    for name, value in (config.get("log_levels") or {}).items():
+        level = _parse_level(value)
+        if level is None:
+            continue
+        if name != ROOT_LOGGER_NAME and not name.startswith(ROOT_LOGGER_NAME + "."):
+            name = f"{ROOT_LOGGER_NAME}.{name}"
+        logging.getLogger(name).setLevel(level)
+        _configured_names.add(name)
+
+
+def _truncate_data_urls(text: str, keep: int = 50) -> str:
+    """Shorten every inline base64 data URL to ``keep`` characters"""
+    marker = "data:image/"
+    if marker not in text:
+        return text
+    parts = []
+    pos = 0
+    while True:
+        start = text.find(marker, pos)
+        if start == -1:
+            parts.append(text[pos:])
+            break
+        end = len(text)
+        for terminator in ('"', "'", " ", ")", "]", "\n"):
+            pos_t = text.find(terminator, start, end)
+            if pos_t != -1:
+                end = pos_t
+        parts.append(text[pos:start])
+        url = text[start:end]
+        if len(url) > keep:
+            parts.append(f"{url[:keep]}...[{len(url) - keep} chars]")
+        else:
+            parts.append(url)
+        pos = end
+    return "".join(parts)
+
+
+class Preview:
+    """
+    Lazy, truncated ``str`` of an arbitrary object.
+
+    The object is only stringified when the log record is emitted, base64
+    data URLs are shortened and the result is capped at ``limit`` characters.
+    """
+
+    __slots__ = ("obj", "limit", "use_repr")
+
+    def __init__(self, obj: Any, limit: int = 200, use_repr: bool = False):
+        self.obj = obj
+        self.limit = limit
+        self.use_repr = use_repr
+
+    def __str__(self) -> str:
+        if isinstance(self.obj, str) and len(self.obj) > self.limit * 4:
+            # Avoid copying a multi-MB string just to throw most of it away
+            text = self.obj[:self.limit * 4]
+        else:
+            text = repr(self.obj) if self.use_repr else str(self.obj)
+        text = _truncate_data_urls(text)
+        if len(text) > self.limit:
+            return text[:self.limit] + "..."
+        return text
+
+    __repr__ = __str__
+
+
+class LazyJSON(Preview):
+    """Lazy ``json.dumps`` preview, for dumping response bodies at DEBUG level"""
+
+    __slots__ = ()
+
+    def __init__(self, obj: Any, limit: int = 500):
+        super().__init__(obj, limit)
+
+    def __str__(self) -> str:
+        try:
+            text = json.dumps(self.obj, indent=2, ensure_ascii=False)
+        except (TypeError, ValueError):
+            text = str(self.obj)
+        text = _truncate_data_urls(text)
+        if len(text) > self.limit:
+            return text[:self.limit] + "..."
+        return text
+
+
+class _RateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+
+    def acquire(self, key: str, interval: float):
+        """Return (allowed, suppressed_since_last)"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False, 0
+            self._last[key] = now
+            return True, self._suppressed.pop(key, 0)
+
+
+_RATE_LIMITER = _RateLimiter()
+
+
+def log_large(logger: logging.Logger, key: str, msg: str, *args: Any,
+              level: int = logging.DEBUG, interval: float = 2.0):
+    """
+    Emit a (typically large) record at most once per ``interval`` seconds per key.
+
+    The level check happens first, so at INFO this costs one method call.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    allowed, suppressed = _RATE_LIMITER.acquire(f"{logger.name}:{key}", interval)
+    if not allowed:
+        return
+    if suppressed:
+        msg = f"{msg} (省略了 {suppressed} 条同类日志)"
+    logger.log(level, msg, *args)
@@ -1,84 +1,440 @@
 """
 User Templates Manager
 Manages user-created custom prompt templates
+
+Templates are stored in a SQLite database (WAL mode) next to this file:
+one row per template with indexes on id and category, plus an FTS5 table
+for full-text search. Every change is a single small transaction instead
+of a rewrite of the whole collection, and concurrent writes are grouped
+into one commit by a background writer. An existing ``user_templates.json``
+is imported automatically the first time the database is created.
+
+Every row records the revision that last wrote it, and deletions leave a
+tombstone, so clients can sync with ``changes_since`` instead of
+refetching everything.
+
+Backups and migrations use NDJSON (one template per line): ``export_page``
+pages through the table by rowid, ``import_ndjson`` validates every line
+and writes the records in transactions of ``IMPORT_BATCH_SIZE``.
 """
 
 import json
-import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    from .background_io import GroupCommitWriter
+    from .search_index import template_search_fields, tokenize
+except ImportError:  # executed as a script (see __main__ below)
+    from background_io import GroupCommitWriter
+    from search_index import template_search_fields, tokenize
+
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    seq INTEGER PRIMARY KEY,  -- stable rowid: creation order and FTS rowid
+    id TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    revision INTEGER NOT NULL DEFAULT 0  -- revision of the last write (delta sync)
+);
+CREATE INDEX IF NOT EXISTS idx_templates_category ON templates(category);
+CREATE INDEX IF NOT EXISTS idx_templates_revision ON templates(revision);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+# Columns of the FTS table hold pre-tokenized text (CJK bigrams, see search_index)
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+    title, tags, description, prompt, tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+# bm25() column weights, same order as the FTS columns
+_FTS_WEIGHTS = (3.0, 2.0, 1.5, 1.0)
+
+# Records per transaction of an NDJSON import
+IMPORT_BATCH_SIZE = 2000
+
+# Invalid lines reported individually by an import (the rest are only counted)
+MAX_IMPORT_ERRORS = 100
+
+
+def _fts_row(template: Dict) -> Tuple[str, str, str, str]:
+    """Tokenized (title, tags, description, prompt) for the FTS table"""
+    fields = template_search_fields(template)
+    prompt = f"{fields['prompt_zh']} {fields['prompt_en']}"
+    return tuple(
+        " ".join(tokenize(text))
+        for text in (fields["title"], fields["tags"], fields["description"], prompt)
+    )
+
+
+def _check_fields(template: Dict) -> Dict:
+    """
+    Validate the user-editable fields of a template in place.
+
+    Shared by create, update and import, so whatever the store accepts
+    through the API also re-imports from its export. An empty prompt is
+    allowed; a single tag string becomes a one-element list and missing
+    fields get their defaults. Raises ValueError.
+    """
+    if not isinstance(template.setdefault("title", "Untitled"), str):
+        raise ValueError("title must be a string")
+    for field in ("prompt", "description"):
+        value = template.setdefault(field, {"zh": "", "en": ""})
+        if not isinstance(value, dict) or not all(isinstance(text, str) for text in value.values()):
+            raise ValueError(f"{field} must be an object of strings")
+    tags = template.setdefault("tags", ["custom"])
+    if isinstance(tags, str):
+        tags = template["tags"] = [tags]
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("tags must be a list of strings")
+    if not template.get("category"):
+        template["category"] = "user_custom"
+    elif not isinstance(template["category"], str):
+        raise ValueError("category must be a string")
+    return template
+
+
+def _import_record(record) -> Dict:
+    """
+    Validate one imported record and fill in defaults.
+
+    Accepts exported records (``prompt: {zh, en}``) as well as the flat
+    create payload (``prompt_zh`` / ``prompt_en``). Raises ValueError.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    template = dict(record)
+
+    for field in ("prompt", "description"):
+        value = template.get(field)
+        if value is None:
+            value = {"zh": template.pop(f"{field}_zh", ""), "en": template.pop(f"{field}_en", "")}
+        elif isinstance(value, str):
+            value = {"zh": value, "en": value}
+        template[field] = value
+    _check_fields(template)
+
+    template_id = template.get("id")
+    if template_id is None:
+        template["id"] = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    elif not isinstance(template_id, str) or not template_id.startswith("user_"):
+        raise ValueError("id must be a string starting with 'user_'")
+
+    now = datetime.now().isoformat()
+    template.setdefault("created_at", now)
+    template.setdefault("updated_at", now)
+    template.setdefault("source", "user_imported")
+    return template
+
+
+def _fts_query(keyword: str) -> Optional[str]:
+    """FTS5 MATCH expression: any of the query terms, each as a quoted phrase"""
+    terms = list(dict.fromkeys(tokenize(keyword, for_query=True)))
+    if not terms:
+        return None
+    return " OR ".join('"%s"' % term.replace('"', '""') for term in terms)
 
 
 class UserTemplatesManager:
     """Manage user-created custom templates"""
-    
-    def __init__(self):
+
+    def __init__(self, db_path: Optional[str] = None):
         """Initialize user templates manager"""
         self.base_dir = Path(__file__).parent
-        self.user_templates_file = self.base_dir / "user_templates.json"
-        self.templates = self._load_templates()
-    
-    def _load_templates(self) -> Dict:
-        """Load user templates from file"""
+        self.user_templates_file = self.base_dir / "user_templates.json"  # legacy storage, migrated once
+        self.db_path = Path(db_path) if db_path else self.base_dir / "user_templates.db"
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.fts_enabled = True
+        self._init_db()
+        # Creates/updates/deletes queued within a few ms share one transaction
+        self._writer = GroupCommitWriter(self._run_batch, name="tutu-user-templates-writer")
+
+    # ------------------------------------------------------------------
+    # Database plumbing
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the calling thread (sqlite3 connections are per thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction (BEGIN IMMEDIATE), serialized within this process.
+
+        Rows written inside it are tagged with the revision it will commit
+        as (``self._local.revision``).
+        """
+        with self._write_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._local.revision = self._read_revision(conn) + 1
+                changes = conn.total_changes
+                yield conn
+                if conn.total_changes != changes:
+                    # Every committed change bumps the revision (HTTP cache validator, delta sync)
+                    conn.execute(
+                        "INSERT INTO meta(key, value) VALUES('revision', ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        (str(self._local.revision),),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                # Also covers a failed COMMIT: the writer thread's connection must
+                # never be left inside a transaction (every later BEGIN would fail)
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        try:
+            conn.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: fall back to LIKE search
+            print(f"[User Templates] FTS5 unavailable, using LIKE search: {e}")
+            self.fts_enabled = False
+
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is None:
+            self._migrate_from_json()
+            with self._transaction() as conn:
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def _migrate_from_json(self):
+        """Import templates from the legacy user_templates.json (one transaction)"""
         if not self.user_templates_file.exists():
-            return {
-                "version": "1.0",
-                "created_at": datetime.now().isoformat(),
-                "templates": []
-            }
-        
+            return
         try:
             with open(self.user_templates_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                templates = json.load(f).get("templates", [])
         except Exception as e:
             print(f"[User Templates] Error loading templates: {e}")
-            return {
-                "version": "1.0",
-                "created_at": datetime.now().isoformat(),
-                "templates": []
-            }
-    
-    def _save_templates(self) -> bool:
-        """Save user templates to file"""
-        try:
-            self.templates["updated_at"] = datetime.now().isoformat()
-            with open(self.user_templates_file, 'w', encoding='utf-8') as f:
-                json.dump(self.templates, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"[User Templates] Error saving templates: {e}")
+            return
+        if templates:
+            imported = self.insert_templates(templates)
+            print(f"[User Templates] Migrated {imported} templates from {self.user_templates_file.name}")
+
+    def _insert(self, conn: sqlite3.Connection, template: Dict, replace: bool = False):
+        if replace:
+            self._delete_row(conn, template["id"])
+        cursor = conn.execute(
+            "INSERT INTO templates(id, category, title, data, created_at, updated_at, revision) VALUES(?, ?, ?, ?, ?, ?, ?)",
+            (
+                template["id"], template.get("category") or "user_custom", template.get("title") or "",
+                json.dumps(template, ensure_ascii=False), template.get("created_at"), template.get("updated_at"),
+                self._local.revision,
+            ),
+        )
+        conn.execute("DELETE FROM tombstones WHERE id = ?", (template["id"],))
+        if self.fts_enabled:
+            conn.execute(
+                "INSERT INTO templates_fts(rowid, title, tags, description, prompt) VALUES(?, ?, ?, ?, ?)",
+                (cursor.lastrowid,) + _fts_row(template),
+            )
+
+    def _delete_row(self, conn: sqlite3.Connection, template_id: str) -> bool:
+        row = conn.execute("SELECT rowid FROM templates WHERE id = ?", (template_id,)).fetchone()
+        if row is None:
             return False
-    
+        conn.execute("DELETE FROM templates WHERE rowid = ?", row)
+        if self.fts_enabled:
+            conn.execute("DELETE FROM templates_fts WHERE rowid = ?", row)
+        conn.execute(
+            "INSERT INTO tombstones(id, revision) VALUES(?, ?) ON CONFLICT(id) DO UPDATE SET revision = excluded.revision",
+            (template_id, self._local.revision),
+        )
+        return True
+
+    @staticmethod
+    def _read_revision(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    @property
+    def revision(self) -> int:
+        """Increases with every committed change (also by other processes)"""
+        return self._read_revision(self._connect())
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
     def get_all_templates(self) -> List[Dict]:
         """Get all user templates"""
-        return self.templates.get("templates", [])
-    
+        rows = self._connect().execute("SELECT data FROM templates ORDER BY rowid")
+        return [json.loads(data) for (data,) in rows]
+
+    def changes_since(self, since: int) -> Dict:
+        """
+        Templates written and ids deleted after revision ``since``
+
+        Returns {"revision", "full", "templates", "deleted"}; ``full`` means
+        ``templates`` is the complete collection (``since`` is 0 or unknown,
+        e.g. from before the database was recreated).
+        """
+        conn = self._connect()
+        # One read transaction: the revision and the rows come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            revision = self._read_revision(conn)
+            if since <= 0 or since > revision:
+                rows = conn.execute("SELECT data FROM templates ORDER BY seq")
+                return {"revision": revision, "full": True, "templates": [json.loads(data) for (data,) in rows], "deleted": []}
+            rows = conn.execute("SELECT data FROM templates WHERE revision > ? ORDER BY seq", (since,))
+            templates = [json.loads(data) for (data,) in rows]
+            deleted = [template_id for (template_id,) in conn.execute("SELECT id FROM tombstones WHERE revision > ?", (since,))]
+            return {"revision": revision, "full": False, "templates": templates, "deleted": deleted}
+        finally:
+            conn.execute("COMMIT")
+
     def get_template_by_id(self, template_id: str) -> Optional[Dict]:
         """Get a specific template by ID"""
-        for template in self.templates.get("templates", []):
-            if template.get("id") == template_id:
-                return template
-        return None
-    
+        row = self._connect().execute("SELECT data FROM templates WHERE id = ?", (template_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_templates_by_category(self, category: str) -> List[Dict]:
+        """Templates of one category, in creation order"""
+        rows = self._connect().execute(
+            "SELECT data FROM templates WHERE category = ? ORDER BY rowid", (category,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def search(self, keyword: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[Dict, float]]]:
+        """
+        Ranked full-text search over titles, tags, descriptions and prompts
+
+        Returns:
+            (total number of matches, [(template, score), ...] for the page), higher scores first
+        """
+        conn = self._connect()
+        if not self.fts_enabled:
+            pattern = f"%{keyword.strip()}%"
+            if pattern == "%%":
+                return 0, []
+            where = "title LIKE ? OR data LIKE ?"
+            total = conn.execute(f"SELECT COUNT(*) FROM templates WHERE {where}", (pattern, pattern)).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT data FROM templates WHERE {where} ORDER BY rowid DESC LIMIT ? OFFSET ?",
+                (pattern, pattern, limit, offset),
+            )
+            return total, [(json.loads(data), 1.0) for (data,) in rows]
+
+        match = _fts_query(keyword)
+        if match is None:
+            return 0, []
+        total = conn.execute("SELECT COUNT(*) FROM templates_fts WHERE templates_fts MATCH ?", (match,)).fetchone()[0]
+        weights = ", ".join(str(w) for w in _FTS_WEIGHTS)
+        rows = conn.execute(
+            f"""
+            SELECT t.data, -bm25(templates_fts, {weights}) AS score
+            FROM templates_fts JOIN templates t ON t.rowid = templates_fts.rowid
+            WHERE templates_fts MATCH ?
+            ORDER BY score DESC
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset),
+        )
+        return total, [(json.loads(data), score) for data, score in rows]
+
+    def search_templates(self, keyword: str) -> List[Dict]:
+        """Search user templates (title, prompts, tags, description), most relevant first"""
+        total, hits = self.search(keyword, 0, -1)
+        return [template for template, score in hits]
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def _new_id(self, conn: sqlite3.Connection) -> str:
+        count = conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+        prefix = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        template_id = f"{prefix}_{count}"
+        while conn.execute("SELECT 1 FROM templates WHERE id = ?", (template_id,)).fetchone():
+            count += 1
+            template_id = f"{prefix}_{count}"
+        return template_id
+
+    def _write(self, operation, error: str) -> Dict:
+        """Run ``operation(conn)`` through the group-commit writer and wait for the commit"""
+        try:
+            return self._writer.submit(operation).result()
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        except sqlite3.Error as e:
+            print(f"[User Templates] Error saving templates: {e}")
+            return {"success": False, "error": error}
+
+    def _run_batch(self, operations) -> List[Tuple[bool, object]]:
+        """One transaction for a batch of writes; a failing write only rolls back itself"""
+        results = []
+        with self._transaction() as conn:
+            for operation in operations:
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    value = operation(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    results.append((False, e))
+                else:
+                    conn.execute("RELEASE write_op")
+                    results.append((True, value))
+        return results
+
     def create_template(self, data: Dict) -> Dict:
         """
         Create a new template
-        
+
         Required fields:
         - title: str
         - prompt_zh: str
         - prompt_en: str
-        
+
         Optional fields:
         - description_zh: str
         - description_en: str
         - category: str
         - tags: List[str]
         """
+        result = self._write(lambda conn: self._create(conn, data), "Failed to save template")
+        if result.get("success"):
+            print(f"[User Templates] Created template: {result['template']['id']}")
+        return result
+
+    def _create(self, conn: sqlite3.Connection, data: Dict) -> Dict:
         # Generate ID
-        template_id = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(self.templates['templates'])}"
-        
+        template_id = self._new_id(conn)
+
         # Create template
         template = {
             "id": template_id,
@@ -97,115 +453,169 @@ class UserTemplatesManager:
             "updated_at": datetime.now().isoformat(),
             "source": "user_created"
         }
-        
-        # Add to templates list
-        self.templates["templates"].append(template)
-        
-        # Save
-        if self._save_templates():
-            print(f"[User Templates] Created template: {template_id}")
-            return {"success": True, "template": template}
-        else:
-            return {"success": False, "error": "Failed to save template"}
-    
+        _check_fields(template)
+        self._insert(conn, template)
+        return {"success": True, "template": template}
+
     def update_template(self, template_id: str, data: Dict) -> Dict:
         """Update an existing template"""
-        for i, template in enumerate(self.templates["templates"]):
-            if template.get("id") == template_id:
-                # Update fields
-                if "title" in data:
-                    template["title"] = data["title"]
-                if "prompt_zh" in data:
-                    template["prompt"]["zh"] = data["prompt_zh"]
-                if "prompt_en" in data:
-                    template["prompt"]["en"] = data["prompt_en"]
-                if "description_zh" in data:
-                    template["description"]["zh"] = data["description_zh"]
-                if "description_en" in data:
-                    template["description"]["en"] = data["description_en"]
-                if "category" in data:
-                    template["category"] = data["category"]
-                if "tags" in data:
-                    template["tags"] = data["tags"]
-                
-                template["updated_at"] = datetime.now().isoformat()
-                
-                # Save
-                if self._save_templates():
-                    print(f"[User Templates] Updated template: {template_id}")
-                    return {"success": True, "template": template}
-                else:
-                    return {"success": False, "error": "Failed to save template"}
-        
-        return {"success": False, "error": "Template not found"}
-    
+        result = self._write(lambda conn: self._update(conn, template_id, data), "Failed to save template")
+        if result.get("success"):
+            print(f"[User Templates] Updated template: {template_id}")
+        return result
+
+    def _update(self, conn: sqlite3.Connection, template_id: str, data: Dict) -> Dict:
+        row = conn.execute("SELECT data FROM templates WHERE id = ?", (template_id,)).fetchone()
+        if row is None:
+            return {"success": False, "error": "Template not found"}
+        template = json.loads(row[0])
+
+        # Update fields
+        if "title" in data:
+            template["title"] = data["title"]
+        if "prompt_zh" in data:
+            template.setdefault("prompt", {})["zh"] = data["prompt_zh"]
+        if "prompt_en" in data:
+            template.setdefault("prompt", {})["en"] = data["prompt_en"]
+        if "description_zh" in data:
+            template.setdefault("description", {})["zh"] = data["description_zh"]
+        if "description_en" in data:
+            template.setdefault("description", {})["en"] = data["description_en"]
+        if "category" in data:
+            template["category"] = data["category"]
+        if "tags" in data:
+            template["tags"] = data["tags"]
+
+        _check_fields(template)
+        template["updated_at"] = datetime.now().isoformat()
+
+        # Save (keeps the row's position: same rowid)
+        conn.execute(
+            "UPDATE templates SET category = ?, title = ?, data = ?, updated_at = ?, revision = ? WHERE id = ?",
+            (
+                template.get("category") or "user_custom", template.get("title") or "",
+                json.dumps(template, ensure_ascii=False), template["updated_at"], self._local.revision, template_id,
+            ),
+        )
+        if self.fts_enabled:
+            conn.execute(
+                "UPDATE templates_fts SET title = ?, tags = ?, description = ?, prompt = ? "
+                "WHERE rowid = (SELECT rowid FROM templates WHERE id = ?)",
+                _fts_row(template) + (template_id,),
+            )
+        return {"success": True, "template": template}
+
     def delete_template(self, template_id: str) -> Dict:
         """Delete a template"""
-        for i, template in enumerate(self.templates["templates"]):
-            if template.get("id") == template_id:
-                deleted = self.templates["templates"].pop(i)
-                
-                # Save
-                if self._save_templates():
-                    print(f"[User Templates] Deleted template: {template_id}")
-                    return {"success": True, "deleted": deleted}
-                else:
-                    # Restore if save failed
-                    self.templates["templates"].insert(i, deleted)
-                    return {"success": False, "error": "Failed to save changes"}
-        
-        return {"success": False, "error": "Template not found"}
-    
-    def search_templates(self, keyword: str) -> List[Dict]:
-        """Search user templates"""
-        keyword_lower = keyword.lower()
-        results = []
-        
-        for template in self.templates.get("templates", []):
-            # Search in title
-            if keyword_lower in template.get("title", "").lower():
-                results.append(template)
-                continue
-            
-            # Search in prompts
-            if keyword_lower in template.get("prompt", {}).get("zh", "").lower():
-                results.append(template)
+        result = self._write(lambda conn: self._delete(conn, template_id), "Failed to save changes")
+        if result.get("success"):
+            print(f"[User Templates] Deleted template: {template_id}")
+        return result
+
+    def _delete(self, conn: sqlite3.Connection, template_id: str) -> Dict:
+        row = conn.execute("SELECT data FROM templates WHERE id = ?", (template_id,)).fetchone()
+        if row is None:
+            return {"success": False, "error": "Template not found"}
+        self._delete_row(conn, template_id)
+        return {"success": True, "deleted": json.loads(row[0])}
+
+    def insert_templates(self, templates: Iterable[Dict], replace: bool = True) -> int:
+        """
+        Insert complete template records in one transaction (migration / bulk import)
+
+        Records without an ``id`` are skipped; existing ids are replaced if
+        ``replace`` is set, otherwise skipped. Returns the number written.
+        """
+        written = 0
+        with self._transaction() as conn:
+            for template in templates:
+                template_id = template.get("id") if isinstance(template, dict) else None
+                if not template_id:
+                    continue
+                exists = conn.execute("SELECT 1 FROM templates WHERE id = ?", (template_id,)).fetchone()
+                if exists and not replace:
+                    continue
+                self._insert(conn, template, replace=bool(exists))
+                written += 1
+        return written
+
+    def export_page(self, after: int = 0, limit: int = 1000) -> Tuple[int, bytes]:
+        """
+        NDJSON lines of up to ``limit`` templates with rowid > ``after``
+
+        Returns (rowid to continue after, body); the body is empty at the end.
+        """
+        rows = self._connect().execute(
+            "SELECT seq, data FROM templates WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit)
+        ).fetchall()
+        if not rows:
+            return after, b""
+        # ``data`` is single-line JSON already
+        return rows[-1][0], "".join(f"{data}\n" for _, data in rows).encode("utf-8")
+
+    def import_ndjson(self, lines: Iterable[Union[bytes, str]], replace: bool = True,
+                      progress: Optional[Callable[[Dict], None]] = None,
+                      batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+        """
+        Import templates from NDJSON lines (e.g. an ``export_page`` dump)
+
+        Every line is validated on its own; invalid lines are skipped and
+        reported, valid records are written ``batch_size`` per transaction.
+        Existing ids are replaced if ``replace`` is set, otherwise kept.
+        ``progress`` is called after every batch with the running counts.
+        """
+        stats = {"read": 0, "imported": 0, "skipped": 0, "invalid": 0}
+        errors = []
+        batch = []
+
+        def flush():
+            written = self.insert_templates(batch, replace=replace)
+            stats["imported"] += written
+            stats["skipped"] += len(batch) - written
+            batch.clear()
+            if progress is not None:
+                progress(dict(stats))
+
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
                 continue
-            if keyword_lower in template.get("prompt", {}).get("en", "").lower():
-                results.append(template)
+            stats["read"] += 1
+            try:
+                batch.append(_import_record(json.loads(line)))
+            except ValueError as e:  # includes JSON and UTF-8 decode errors
+                stats["invalid"] += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({"line": line_no, "error": str(e)})
                 continue
-            
-            # Search in tags
-            tags = template.get("tags", [])
-            if any(keyword_lower in tag.lower() for tag in tags):
-                results.append(template)
-        
-        return results
-    
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        print(f"[User Templates] Imported {stats['imported']} templates "
+              f"({stats['skipped']} skipped, {stats['invalid']} invalid)")
+        return {"success": True, **stats, "errors": errors}
+
     def get_stats(self) -> Dict:
         """Get statistics about user templates"""
-        templates = self.templates.get("templates", [])
-        
-        categories = {}
-        for template in templates:
-            cat = template.get("category", "unknown")
-            categories[cat] = categories.get(cat, 0) + 1
-        
+        conn = self._connect()
+        categories = dict(conn.execute("SELECT category, COUNT(*) FROM templates GROUP BY category"))
+
         return {
-            "total": len(templates),
+            "total": sum(categories.values()),
             "categories": categories,
-            "file_path": str(self.user_templates_file),
-            "file_exists": self.user_templates_file.exists()
+            "file_path": str(self.db_path),
+            "file_exists": self.db_path.exists()
         }
 
 
 # Test function
 if __name__ == "__main__":
     manager = UserTemplatesManager()
-    
+
     print("=== User Templates Manager Test ===")
     print(f"Stats: {manager.get_stats()}")
-    
+
     # Test create
     result = manager.create_template({
         "title": "Test Template",
@@ -215,11 +625,14 @@ if __name__ == "__main__":
         "tags": ["test", "sample"]
     })
     print(f"Create result: {result}")
-    
+
     # Test get all
     all_templates = manager.get_all_templates()
     print(f"Total templates: {len(all_templates)}")
-    
+
+    # Test search
+    print(f"Search '测试': {[t['id'] for t in manager.search_templates('测试')]}")
+
     if all_templates:
         # Test update
         first_id = all_templates[0]["id"]
@@ -227,8 +640,7 @@ if __name__ == "__main__":
             "title": "Updated Title"
         })
         print(f"Update result: {update_result}")
-        
+
         # Test delete
         # delete_result = manager.delete_template(first_id)
         # print(f"Delete result: {delete_result}")
-
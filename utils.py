@@ -1,7 +1,13 @@
+import base64
+import hashlib
+from io import BytesIO
 import numpy as np
 import torch
-from PIL import Image
-from typing import List, Union
+from PIL import Image, ImageFile
+from typing import Any, List, Optional, Union
+
+from .metrics import stage
+from .streaming_json import Base64Decoder, StringSink
 
 def pil2tensor(image: Union[Image.Image, List[Image.Image]]) -> torch.Tensor:
     """
@@ -51,4 +57,138 @@ def tensor2pil(image: torch.Tensor) -> List[Image.Image]:
     numpy_image = np.clip(255.0 * image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8)
     
     # Convert numpy array to PIL Image
-    return [Image.fromarray(numpy_image)]
\ No newline at end of file
+    return [Image.fromarray(numpy_image)]
+
+
+def tensor_to_uint8(image: torch.Tensor, strip_rows: int = 256) -> np.ndarray:
+    """
+    Convert the first frame of an image tensor to a uint8 array, strip by strip.
+    
+    Produces the same pixels as ``tensor2pil`` but never materializes a full
+    float copy of the frame: only ``strip_rows`` rows are scaled at a time,
+    which keeps the extra memory for a 4K reference at a few MB.
+    
+    Args:
+        image: Tensor with shape [B, H, W, C] or [H, W, C], values in range [0, 1]
+        strip_rows: Number of rows converted per step
+        
+    Returns:
+        np.ndarray: Array with shape [H, W, C] (or [H, W] for single channel)
+    """
+    frame = image[0] if len(image.shape) > 3 else image
+    if frame.shape[-1] == 1:
+        frame = frame[..., 0]
+    height = frame.shape[0]
+    out = np.empty(tuple(frame.shape), dtype=np.uint8)
+    for top in range(0, height, strip_rows):
+        strip = frame[top:top + strip_rows].detach().cpu().numpy()
+        out[top:top + strip_rows] = np.clip(255.0 * strip, 0, 255).astype(np.uint8)
+        del strip
+    return out
+
+
+def tensor_to_png_base64(image: torch.Tensor, **save_kwargs) -> str:
+    """
+    Encode the first frame of an image tensor as a base64 PNG string.
+    
+    Intermediate buffers (uint8 array, PIL image, PNG bytes) are released
+    before returning, so only the base64 string outlives the call.
+    
+    Args:
+        image: Tensor with shape [B, H, W, C] or [H, W, C]
+        **save_kwargs: Extra arguments for ``PIL.Image.save``
+        
+    Returns:
+        str: Base64 encoded PNG data (without data URI prefix)
+    """
+    with stage("tensor2pil"):
+        pixels = tensor_to_uint8(image)
+        pil_image = Image.fromarray(pixels)
+        del pixels
+    with stage("encode"):
+        buffered = BytesIO()
+        pil_image.save(buffered, format="PNG", **save_kwargs)
+        pil_image.close()
+        del pil_image
+    with stage("base64"):
+        encoded = base64.b64encode(buffered.getbuffer()).decode('ascii')
+        buffered.close()
+    return encoded
+
+
+def estimate_encode_bytes(image: torch.Tensor) -> int:
+    """
+    Rough upper bound of the transient memory needed to encode one frame.
+    
+    uint8 pixels + PIL copy + PNG buffer (worst case uncompressed) + base64.
+    """
+    shape = tuple(image.shape[1:] if len(image.shape) > 3 else image.shape)
+    pixels = int(np.prod(shape))
+    return pixels * 3 + pixels * 4 // 3
+
+
+def fingerprint_inputs(seed: int, *values: Any) -> Union[str, float]:
+    """
+    Build an IS_CHANGED value for ComfyUI's execution cache.
+    
+    Seed 0 means "random every run", so NaN is returned: it never compares
+    equal to itself, which forces the node to re-execute. Any other seed
+    yields a stable digest of the values, letting the executor reuse the
+    cached output while the settings are unchanged.
+    
+    ComfyUI only passes widget values to IS_CHANGED; linked inputs (images,
+    a forceInput prompt) are not available there, and their changes are
+    already part of the executor's cache signature.
+    
+    Args:
+        seed: Node seed value
+        *values: Remaining widget values (strings, numbers, booleans)
+        
+    Returns:
+        Union[str, float]: Hex digest, or NaN when seed is 0
+    """
+    if seed == 0:
+        return float("NaN")
+    
+    digest = hashlib.sha1()
+    digest.update(f"seed:{seed}".encode("utf-8"))
+    for value in values:
+        digest.update(f"{type(value).__name__}:{value!r}".encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class Base64ImageSink(StringSink):
+    """
+    Decode a streamed base64 JSON string straight into a PIL image.
+    
+    Used with ``streaming_json`` for ``inlineData.data`` / ``b64_json``
+    fields: decoded bytes go to ``ImageFile.Parser`` as they arrive, so the
+    base64 text is never held in memory. ``close()`` returns the image, or
+    None if the data could not be decoded (the error is kept in ``error``).
+    """
+    
+    def __init__(self):
+        self._parser = ImageFile.Parser()
+        self._decoder = Base64Decoder(self._parser.feed)
+        self.error: Optional[Exception] = None
+    
+    def write(self, data: bytes):
+        if self.error is not None:
+            return
+        try:
+            with stage("decode"):
+                self._decoder.feed(data)
+        except Exception as e:
+            self.error = e
+    
+    def close(self) -> Optional[Image.Image]:
+        try:
+            with stage("decode"):
+                if self.error is None:
+                    self._decoder.flush()
+                image = self._parser.close()
+        except Exception as e:
+            self.error = self.error or e
+            return None
+        return None if self.error is not None else image
@@ -187,9 +187,198 @@ let templateManagerState = {
     currentTemplate: null,
     currentLang: 'zh',
     allTemplates: {},
-    searchResults: []
+    searchResults: [],
+    searchQuery: '',
+    searchTotal: 0,
+    searchRequestId: 0,
+    categoryCursors: {},
+    categoryTotals: {},
+    categoryRequestId: 0,
+    templateDetails: {},
+    detailRequestId: 0,
+    // Aborted when the list is replaced (category switch, search, my templates)
+    listAbort: null,
+    // Aborted when another template detail is shown
+    detailAbort: null,
+    loadedSprites: new Set(),
+    // Pending /tutu/catalog-version response of the current modal session
+    versionCheck: null,
+    catalogVersion: null,
+    // Catalog version each loaded category page belongs to
+    categoryVersions: {},
+    // {revision, templates} of the user templates (also kept in IndexedDB)
+    userTemplatesCache: null
 };
 
+// IndexedDB cache of categories, category pages and user templates, validated
+// against /tutu/catalog-version so reopening the manager needs no refetch
+const CATALOG_DB_NAME = 'tutu-template-cache';
+const CATALOG_DB_STORE = 'entries';
+let catalogDbPromise = null;
+
+function openCatalogDb() {
+    if (!catalogDbPromise) {
+        catalogDbPromise = new Promise(resolve => {
+            if (!window.indexedDB) {
+                resolve(null);
+                return;
+            }
+            const request = indexedDB.open(CATALOG_DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(CATALOG_DB_STORE);
+            request.onsuccess = () => resolve(request.result);
+            // Private browsing, no quota, ...: work without the cache
+            request.onerror = () => resolve(null);
+            request.onblocked = () => resolve(null);
+        });
+    }
+    return catalogDbPromise;
+}
+
+async function catalogCacheGet(key) {
+    const db = await openCatalogDb();
+    if (!db) {
+        return undefined;
+    }
+    return new Promise(resolve => {
+        try {
+            const request = db.transaction(CATALOG_DB_STORE).objectStore(CATALOG_DB_STORE).get(key);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(undefined);
+        } catch (error) {
+            resolve(undefined);
+        }
+    });
+}
+
+async function catalogCacheSet(key, value) {
+    const db = await openCatalogDb();
+    if (!db) {
+        return;
+    }
+    try {
+        db.transaction(CATALOG_DB_STORE, 'readwrite').objectStore(CATALOG_DB_STORE).put(value, key);
+    } catch (error) {
+        console.warn("[Tutu v3] Failed to update the template cache:", error);
+    }
+}
+
+/**
+ * {catalog, userRevision} from the server, or null if it can't be reached
+ */
+function fetchCatalogVersion() {
+    return api.fetchApi('/tutu/catalog-version')
+        .then(r => (r.ok ? r.json() : null))
+        .catch(() => null);
+}
+
+// Page size for /tutu/search
+const SEARCH_PAGE_SIZE = 50;
+
+// Category listing is paged as lightweight summaries; full templates are loaded on click
+const CATEGORY_PAGE_SIZE = 100;
+const SUMMARY_FIELDS = 'id,title,coverImage,coverImageMeta,tags';
+
+// Gallery thumbnails are 150px tall; request enough width for HiDPI screens
+const GALLERY_THUMB_WIDTH = 320;
+
+// Card covers come from one /tutu/contact-sheet sprite per page (tiles shown at half size for HiDPI)
+const COVER_TILE_SIZE = 96;
+const COVER_DISPLAY_SIZE = 48;
+
+// Windowed template list: cards mounted beyond the visible rows on each side, and the gap between cards
+const LIST_OVERSCAN = 8;
+const LIST_ROW_GAP = 8;
+
+/**
+ * Start loading a new template list: aborts the fetches and image loads of
+ * the previous list and returns the signal for the new one.
+ * `append` (load more) keeps using the current signal.
+ */
+function beginListLoad(append = false) {
+    if (append && templateManagerState.listAbort) {
+        return templateManagerState.listAbort.signal;
+    }
+    templateManagerState.listAbort?.abort();
+    templateManagerState.listAbort = new AbortController();
+    return templateManagerState.listAbort.signal;
+}
+
+/**
+ * Load `url` into an image element; if `signal` aborts first, the src is
+ * cleared, which makes the browser drop the in-flight request.
+ */
+function loadTrackedImage(img, url, signal) {
+    return new Promise((resolve, reject) => {
+        if (signal?.aborted) {
+            reject(new DOMException('Image load aborted', 'AbortError'));
+            return;
+        }
+        const onAbort = () => {
+            img.removeAttribute('src');
+            reject(new DOMException('Image load aborted', 'AbortError'));
+        };
+        signal?.addEventListener('abort', onAbort, { once: true });
+        img.decoding = 'async';
+        img.onload = () => {
+            signal?.removeEventListener('abort', onAbort);
+            resolve(img);
+        };
+        img.onerror = () => {
+            signal?.removeEventListener('abort', onAbort);
+            reject(new Error(`Failed to load image: ${url}`));
+        };
+        img.src = url;
+    });
+}
+
+let lazyImageObserver = null;
+
+/**
+ * Load `img.dataset.src` once the image comes near the visible area
+ */
+function observeLazyImage(img, signal) {
+    const load = () => loadTrackedImage(img, img.dataset.src, signal).catch(error => {
+        if (error.name !== 'AbortError') {
+            console.error(error.message);
+        }
+    });
+    if (!('IntersectionObserver' in window)) {
+        load();
+        return;
+    }
+    if (!lazyImageObserver) {
+        lazyImageObserver = new IntersectionObserver(entries => {
+            for (const entry of entries) {
+                if (entry.isIntersecting) {
+                    lazyImageObserver.unobserve(entry.target);
+                    entry.target._lazyLoad();
+                }
+            }
+        }, { rootMargin: '200px' });
+    }
+    img._lazyLoad = load;
+    lazyImageObserver.observe(img);
+    signal?.addEventListener('abort', () => lazyImageObserver.unobserve(img), { once: true });
+}
+
+/**
+ * Download a contact-sheet sprite off-screen; cards show the placeholder
+ * colour until it is decoded, then the mounted cards are repainted.
+ */
+function preloadSprite(modal, url, signal) {
+    const loaded = templateManagerState.loadedSprites;
+    if (loaded.has(url)) {
+        return;
+    }
+    loadTrackedImage(new Image(), url, signal)
+        .then(img => img.decode?.())
+        .then(() => {
+            loaded.add(url);
+            refreshTemplateList(modal);
+        })
+        .catch(() => {});
+}
+
 /**
  * Create and open the template manager dialog
  */
@@ -394,9 +583,30 @@ function createTemplateManagerModal(node) {
 
 /**
  * Load template data from backend
+ * Categories cached in IndexedDB are shown immediately; the server is only
+ * asked for its catalog version, and categories are refetched if it changed.
  */
 async function loadTemplateData(modal, node) {
+    const versionCheck = templateManagerState.versionCheck = fetchCatalogVersion();
+    
     try {
+        const cached = await catalogCacheGet('categories');
+        if (cached) {
+            showCategories(modal, cached.categories);
+        }
+        
+        const version = await versionCheck;
+        if (version && templateManagerState.catalogVersion && version.catalog !== templateManagerState.catalogVersion) {
+            // Built-in templates changed on the server: drop details loaded for the old catalog
+            templateManagerState.templateDetails = {};
+        }
+        if (version) {
+            templateManagerState.catalogVersion = version.catalog;
+        }
+        if (cached && version && cached.version === version.catalog) {
+            return;
+        }
+        
         console.log("[Tutu v3] Loading categories from API...");
         
         // Fetch categories in both languages
@@ -420,13 +630,10 @@ async function loadTemplateData(modal, node) {
             throw new Error("No categories found");
         }
         
-        templateManagerState.categories = categories;
-        
-        // Render categories
-        renderCategories(modal, categories);
-        
-        // Update count - 显示实际模板数而非累加（因为一个模板可能有多个标签）
-        modal.querySelector('.template-count').textContent = `（333 个模板，${categories.length} 个分类）`;
+        if (version) {
+            catalogCacheSet('categories', { version: version.catalog, categories });
+        }
+        showCategories(modal, categories);
         
         console.log("[Tutu v3] Successfully loaded", categories.length, "categories");
         
@@ -437,6 +644,16 @@ async function loadTemplateData(modal, node) {
     }
 }
 
+function showCategories(modal, categories) {
+    templateManagerState.categories = categories;
+    
+    // Render categories
+    renderCategories(modal, categories);
+    
+    // Update count - 显示实际模板数而非累加（因为一个模板可能有多个标签）
+    modal.querySelector('.template-count').textContent = `（333 个模板，${categories.length} 个分类）`;
+}
+
 /**
  * Render category buttons
  */
@@ -473,32 +690,113 @@ function renderCategories(modal, categories) {
 
 /**
  * Load templates for a specific category
- * Note: In current implementation, we need to fetch from Python backend
- * For now, we'll show a placeholder
+ * Fetches one page of summaries (id/title/cover/tags) from the Python backend;
+ * further pages are appended via the "load more" button.
+ * Pages already loaded (in memory or IndexedDB) are shown right away and only
+ * refetched if they belong to an older catalog version.
  */
-async function loadCategoryTemplates(modal, category) {
+async function loadCategoryTemplates(modal, category, append = false) {
     const list = modal.querySelector('.template-list');
-    list.innerHTML = '<div class="loading">加载模板中...</div>';
     
     templateManagerState.currentCategory = category;
+    const requestId = ++templateManagerState.categoryRequestId;
+    // Switching category cancels the previous category's requests and image loads
+    const signal = beginListLoad(append);
+    
+    let shown = false;
+    if (!append) {
+        if (!templateManagerState.allTemplates[category.id]) {
+            const cached = await catalogCacheGet(`category:${category.id}`);
+            if (requestId !== templateManagerState.categoryRequestId) {
+                return;
+            }
+            if (cached) {
+                templateManagerState.allTemplates[category.id] = cached.items;
+                templateManagerState.categoryCursors[category.id] = cached.nextCursor;
+                templateManagerState.categoryTotals[category.id] = cached.total;
+                templateManagerState.categoryVersions[category.id] = cached.version;
+            }
+        }
+        
+        // Already loaded: show it, then check it is still current
+        if (templateManagerState.allTemplates[category.id]) {
+            renderCategoryTemplates(modal, category);
+            const version = await templateManagerState.versionCheck;
+            if (requestId !== templateManagerState.categoryRequestId
+                || !version || templateManagerState.categoryVersions[category.id] === version.catalog) {
+                return;
+            }
+            shown = true;
+        }
+    }
+    
+    if (!append && !shown) {
+        list.innerHTML = '<div class="loading">加载模板中...</div>';
+    }
     
     try {
-        const lang = templateManagerState.currentLang;
         // The category object from the adapter should have the correct ID key
-        const categoryKey = category.id; 
+        const params = new URLSearchParams({
+            category: category.id,
+            limit: CATEGORY_PAGE_SIZE,
+            fields: SUMMARY_FIELDS
+        });
+        const cursor = append ? templateManagerState.categoryCursors[category.id] : null;
+        if (cursor !== null && cursor !== undefined) {
+            params.set('cursor', cursor);
+        }
 
-        const response = await api.fetchApi(`/tutu/templates?category=${categoryKey}&lang=${lang}`);
+        const sheetParams = new URLSearchParams(params);
+        sheetParams.delete('fields');
+        sheetParams.set('size', COVER_TILE_SIZE);
+        // Covers are optional: a failed sheet only means cards without pictures
+        const sheetPromise = api.fetchApi(`/tutu/contact-sheet?${sheetParams}`, { signal })
+            .then(r => (r.ok ? r.json() : null))
+            .catch(() => null);
+
+        const response = await api.fetchApi(`/tutu/templates?${params}`, { signal });
         if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.error}`);
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.error || ''}`);
+        }
+        const page = await response.json();
+        const sheet = await sheetPromise;
+        const version = await templateManagerState.versionCheck;
+        
+        if (requestId !== templateManagerState.categoryRequestId) {
+            return; // user switched category meanwhile
+        }
+        
+        if (sheet) {
+            const tiles = new Map(sheet.items.map(tile => [tile.id, tile]));
+            for (const item of page.items) {
+                const tile = tiles.get(item.id);
+                if (tile) {
+                    item._cover = { sprite: sheet.sprite, x: tile.x, y: tile.y, tileSize: sheet.tileSize, width: sheet.width, height: sheet.height };
+                }
+            }
         }
-        const templates = await response.json();
         
         // Store templates under the original category ID
-        templateManagerState.allTemplates[category.id] = templates;
-        renderTemplateList(modal, templates);
+        const loaded = append ? (templateManagerState.allTemplates[category.id] || []) : [];
+        templateManagerState.allTemplates[category.id] = loaded.concat(page.items);
+        templateManagerState.categoryCursors[category.id] = page.nextCursor;
+        templateManagerState.categoryTotals[category.id] = page.total;
+        templateManagerState.categoryVersions[category.id] = version?.catalog;
+        if (version) {
+            catalogCacheSet(`category:${category.id}`, {
+                version: version.catalog,
+                items: templateManagerState.allTemplates[category.id],
+                nextCursor: page.nextCursor,
+                total: page.total
+            });
+        }
+        renderCategoryTemplates(modal, category);
         
     } catch (error) {
+        if (requestId !== templateManagerState.categoryRequestId || error.name === 'AbortError') {
+            return;
+        }
         console.error(`[Tutu v3] Failed to load templates for category: ${category.nameEn}`, error);
         list.innerHTML = `<div class="info-message error">加载模板失败。错误：${error.message}</div>`;
     }
@@ -506,58 +804,232 @@ async function loadCategoryTemplates(modal, category) {
     console.log("[Tutu v3] Category selected:", category);
 }
 
+/**
+ * Render the loaded part of a category plus a "load more" button if more pages exist
+ */
+function renderCategoryTemplates(modal, category) {
+    const list = modal.querySelector('.template-list');
+    const templates = templateManagerState.allTemplates[category.id] || [];
+    renderTemplateList(modal, templates);
+    
+    // Also restarts sprites whose download was cancelled by an earlier category switch
+    const sprites = new Set(templates.filter(tpl => tpl._cover).map(tpl => tpl._cover.sprite));
+    sprites.forEach(sprite => preloadSprite(modal, sprite, templateManagerState.listAbort?.signal));
+    
+    const cursor = templateManagerState.categoryCursors[category.id];
+    if (cursor === null || cursor === undefined || templates.length === 0) {
+        return;
+    }
+    const total = templateManagerState.categoryTotals[category.id];
+    const moreBtn = document.createElement('button');
+    moreBtn.className = 'search-load-more';
+    moreBtn.style.cssText = 'display: block; width: 100%; padding: 10px; background: #2a2a2a; border: none; border-top: 1px solid #3a3a3a; color: #aaa; cursor: pointer;';
+    moreBtn.textContent = `加载更多（已显示 ${templates.length} / ${total}）`;
+    moreBtn.addEventListener('click', () => {
+        moreBtn.disabled = true;
+        moreBtn.textContent = '加载中...';
+        loadCategoryTemplates(modal, category, true);
+    });
+    list.appendChild(moreBtn);
+}
+
+/**
+ * Show a template in the detail panel, fetching the full record first if
+ * only its summary has been loaded (category listings carry no prompts).
+ */
+async function openTemplateDetail(modal, template) {
+    const requestId = ++templateManagerState.detailRequestId;
+    if (template.prompt !== undefined) {
+        renderTemplateDetail(modal, template);
+        return;
+    }
+    
+    const cached = templateManagerState.templateDetails[template.id];
+    if (cached) {
+        renderTemplateDetail(modal, cached);
+        return;
+    }
+    
+    try {
+        const response = await api.fetchApi(`/tutu/templates/${encodeURIComponent(template.id)}`);
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.error || ''}`);
+        }
+        const detail = await response.json();
+        templateManagerState.templateDetails[template.id] = detail;
+        
+        if (requestId === templateManagerState.detailRequestId) {
+            renderTemplateDetail(modal, detail);
+        }
+    } catch (error) {
+        console.error("[Tutu v3] Failed to load template detail:", template.id, error);
+    }
+}
+
+/**
+ * Cover of a card as a window into the page's contact-sheet sprite
+ */
+function renderCoverTile(tpl) {
+    const cover = tpl._cover;
+    if (!cover) {
+        return '';
+    }
+    const scale = COVER_DISPLAY_SIZE / cover.tileSize;
+    const placeholder = tpl.coverImageMeta ? tpl.coverImageMeta.color : '#2a2a2a';
+    // Only reference the sprite once preloadSprite has it, so unmounted pages never start downloads
+    const sprite = templateManagerState.loadedSprites.has(cover.sprite)
+        ? ` url('${cover.sprite}') -${cover.x * scale}px -${cover.y * scale}px / ${cover.width * scale}px ${cover.height * scale}px no-repeat`
+        : '';
+    return `<div class="template-item-cover" style="flex: none; width: ${COVER_DISPLAY_SIZE}px; height: ${COVER_DISPLAY_SIZE}px; border-radius: 4px;` +
+        ` background: ${placeholder}${sprite};"></div>`;
+}
+
+/**
+ * Render a template list as a window: only the cards in (or near) the visible
+ * part of the scroll container are in the DOM. All cards get the height of
+ * the first one, so their positions are computed instead of laid out.
+ */
 function renderTemplateList(modal, templates) {
     const list = modal.querySelector('.template-list');
     if (!templates || templates.length === 0) {
         list.innerHTML = `<div class="info-message">此分类中未找到模板。</div>`;
+        list._templateWindow = null;
         return;
     }
     
-    list.innerHTML = templates.map(tpl => `
-        <div class="template-item" data-template-id="${tpl.id}">
-            <div class="template-item-title">${tpl.title}</div>
-            <div class="template-item-meta">
-                <span>ID: ${tpl.id}</span>
-            </div>
-        </div>
-    `).join('');
+    // Keep the scroll position when the same list grew (load more), start at the top otherwise
+    const previous = list._templateWindow;
+    const keepScroll = previous && previous.templates[0] === templates[0];
+    const scrollTop = list.scrollTop;
+    
+    const viewport = document.createElement('div');
+    viewport.className = 'template-window';
+    viewport.style.cssText = 'position: relative;';
+    list.replaceChildren(viewport);
+    
+    const view = {
+        list,
+        viewport,
+        templates,
+        rowHeight: 0,
+        first: -1,
+        last: -1,
+        activeId: previous?.activeId ?? templateManagerState.currentTemplate?.id
+    };
+    list._templateWindow = view;
     
-    // Add click event to each item
-    list.querySelectorAll('.template-item').forEach(item => {
-        item.addEventListener('click', () => {
-            list.querySelectorAll('.template-item').forEach(i => i.classList.remove('active'));
-            item.classList.add('active');
-            
-            // 🔧 修复：处理字符串和数字ID
-            // 用户模板ID是字符串（如"user_20251123_005604_0"），预置模板ID是数字
-            const templateIdStr = item.dataset.templateId;
-            const templateIdNum = parseInt(templateIdStr, 10);
-            let template = null;
-            
-            // 优先从传入的模板数组中查找（适用于搜索结果）
-            // 尝试同时匹配字符串和数字ID
-            template = templates.find(t => t.id === templateIdStr || t.id === templateIdNum);
-            
-            // 如果没找到，尝试从所有已加载的分类中查找
-            if (!template) {
-                for (const categoryId in templateManagerState.allTemplates) {
-                    const categoryTemplates = templateManagerState.allTemplates[categoryId];
-                    template = categoryTemplates.find(t => t.id === templateIdStr || t.id === templateIdNum);
-                    if (template) {
-                        break;
-                    }
+    // Measure one card to get the row pitch
+    const probe = createTemplateCard(view, 0);
+    viewport.appendChild(probe);
+    view.rowHeight = (probe.offsetHeight || 64) + LIST_ROW_GAP;
+    viewport.style.height = `${templates.length * view.rowHeight}px`;
+    list.scrollTop = keepScroll ? scrollTop : 0;
+    updateTemplateWindow(view, true);
+    
+    bindTemplateWindow(modal, list);
+}
+
+/**
+ * Scroll, resize and click handling of the windowed list (bound once per list element)
+ */
+function bindTemplateWindow(modal, list) {
+    if (list._templateWindowBound) {
+        return;
+    }
+    list._templateWindowBound = true;
+    
+    let frame = 0;
+    const schedule = () => {
+        if (!frame) {
+            frame = requestAnimationFrame(() => {
+                frame = 0;
+                if (list._templateWindow) {
+                    updateTemplateWindow(list._templateWindow, false);
                 }
-            }
-            
-            if (template) {
-                renderTemplateDetail(modal, template);
-            } else {
-                console.error("[Tutu v3] Template not found:", templateIdStr);
-            }
-        });
+            });
+        }
+    };
+    list.addEventListener('scroll', schedule, { passive: true });
+    if ('ResizeObserver' in window) {
+        new ResizeObserver(schedule).observe(list);
+    }
+    
+    // One delegated handler instead of a listener per card
+    list.addEventListener('click', (event) => {
+        const view = list._templateWindow;
+        const item = event.target.closest('.template-item');
+        if (!view || !item || !view.viewport.contains(item)) {
+            return;
+        }
+        const template = view.templates[parseInt(item.dataset.index, 10)];
+        if (!template) {
+            console.error("[Tutu v3] Template not found:", item.dataset.templateId);
+            return;
+        }
+        view.activeId = template.id;
+        view.viewport.querySelectorAll('.template-item').forEach(i => i.classList.toggle('active', i === item));
+        openTemplateDetail(modal, template);
     });
 }
 
+/**
+ * Mount the cards of the rows currently in view (plus LIST_OVERSCAN rows around them)
+ */
+function updateTemplateWindow(view, force) {
+    const { list, viewport, templates, rowHeight } = view;
+    // Offset of the visible area inside the window (headers above it scroll away first)
+    const top = list.getBoundingClientRect().top - viewport.getBoundingClientRect().top;
+    const first = Math.max(0, Math.floor(top / rowHeight) - LIST_OVERSCAN);
+    const last = Math.min(templates.length, Math.ceil((top + list.clientHeight) / rowHeight) + LIST_OVERSCAN);
+    if (!force && first === view.first && last === view.last) {
+        return;
+    }
+    view.first = first;
+    view.last = last;
+    
+    const fragment = document.createDocumentFragment();
+    for (let index = first; index < last; index++) {
+        fragment.appendChild(createTemplateCard(view, index));
+    }
+    viewport.replaceChildren(fragment);
+}
+
+/**
+ * Re-render the mounted cards of the current list (e.g. once a cover sprite has loaded)
+ */
+function refreshTemplateList(modal) {
+    const view = modal.querySelector('.template-list')?._templateWindow;
+    if (view && view.viewport.isConnected) {
+        updateTemplateWindow(view, true);
+    }
+}
+
+function createTemplateCard(view, index) {
+    const tpl = view.templates[index];
+    const item = document.createElement('div');
+    item.className = 'template-item' + (tpl.id === view.activeId ? ' active' : '');
+    item.dataset.templateId = tpl.id;
+    item.dataset.index = index;
+    item.title = tpl.title;
+    item.style.cssText = `position: absolute; left: 0; right: 0; top: ${index * view.rowHeight}px; margin: 0; box-sizing: border-box; overflow: hidden;` +
+        (view.rowHeight ? ` height: ${view.rowHeight - LIST_ROW_GAP}px;` : '') +
+        (tpl._cover ? ' display: flex; gap: 10px; align-items: center;' : '');
+    item.innerHTML = `
+        ${renderCoverTile(tpl)}
+        <div style="min-width: 0;">
+            <div class="template-item-title" style="white-space: nowrap; overflow: hidden; text-overflow: ellipsis;"></div>
+            <div class="template-item-meta">
+                <span></span>
+            </div>
+        </div>
+    `;
+    // Titles of user templates are user input: set as text, not HTML
+    item.querySelector('.template-item-title').textContent = tpl.title;
+    item.querySelector('.template-item-meta span').textContent = `ID: ${tpl.id}`;
+    return item;
+}
+
 function renderTemplateDetail(modal, template) {
     templateManagerState.currentTemplate = template;
     
@@ -626,7 +1098,9 @@ function renderTemplateDetail(modal, template) {
     const activePromptLang = modal.querySelector('.prompt-tabs .tab-btn.active')?.dataset?.lang || 'zh';
     detailContent.querySelector('.prompt-text').value = template.prompt[activePromptLang] || '';
     
-    // Images
+    // Images (loaded when scrolled into view; switching templates cancels loads still in flight)
+    templateManagerState.detailAbort?.abort();
+    templateManagerState.detailAbort = new AbortController();
     const gallery = detailContent.querySelector('.images-gallery');
     if (template.images && template.images.length > 0) {
         // Use the custom image API endpoint
@@ -634,11 +1108,17 @@ function renderTemplateDetail(modal, template) {
             // Extract just the filename from the path (e.g., "images/333.jpeg" -> "333.jpeg")
             const filename = img.split('/').pop();
             const imageUrl = `/tutu/images/${filename}`;
-            return `<img src="${imageUrl}" alt="Example" class="image-thumb" data-image-index="${index}" data-image-url="${imageUrl}" onerror="console.error('Failed to load image:', this.src)" />`;
+            // Gallery shows a resized variant; the viewer opens the original
+            const thumbUrl = `${imageUrl}?w=${GALLERY_THUMB_WIDTH}&format=webp`;
+            // Manifest metadata: reserve the aspect ratio and paint the dominant colour while loading
+            const meta = (template.imagesMeta || [])[index];
+            const sizeAttrs = meta ? `width="${meta.width}" height="${meta.height}" style="background-color: ${meta.color};"` : '';
+            return `<img data-src="${thumbUrl}" alt="Example" class="image-thumb" decoding="async" ${sizeAttrs} data-image-index="${index}" data-image-url="${imageUrl}" />`;
         }).join('');
         
         // Add double-click event listeners to images
         gallery.querySelectorAll('.image-thumb').forEach(img => {
+            observeLazyImage(img, templateManagerState.detailAbort.signal);
             img.addEventListener('dblclick', () => {
                 const imageUrl = img.dataset.imageUrl;
                 const allImages = Array.from(gallery.querySelectorAll('.image-thumb')).map(i => i.dataset.imageUrl);
@@ -661,42 +1141,91 @@ function renderTemplateDetail(modal, template) {
 
 /**
  * Load user templates
+ * The last known copy (memory or IndexedDB) is shown immediately; the server
+ * only sends what changed since its revision.
  */
 async function loadUserTemplates(modal) {
     const list = modal.querySelector('.template-list');
-    list.innerHTML = '<div class="loading">加载用户模板中...</div>';
+    
+    // Drop any category page (and its images) still in flight
+    templateManagerState.categoryRequestId++;
+    const signal = beginListLoad();
+    templateManagerState.currentCategory = { id: 'user_custom', nameZh: '我的模板', nameEn: 'My Templates' };
     
     try {
-        const response = await api.fetchApi('/tutu/user-templates');
+        const cached = templateManagerState.userTemplatesCache || await catalogCacheGet('user-templates');
+        if (signal.aborted) {
+            return;
+        }
+        if (cached) {
+            templateManagerState.allTemplates['user_custom'] = cached.templates;
+            renderUserTemplates(modal, cached.templates);
+        } else {
+            list.innerHTML = '<div class="loading">加载用户模板中...</div>';
+        }
+        
+        const since = cached ? cached.revision : 0;
+        const response = await api.fetchApi(`/tutu/user-templates/changes?since=${since}`, { signal });
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const userTemplates = await response.json();
+        const changes = await response.json();
         
-        console.log("[Tutu v3] Loaded user templates:", userTemplates);
+        if (cached && !changes.full && changes.templates.length === 0 && changes.deleted.length === 0) {
+            return; // the cached copy is current
+        }
+        const userTemplates = changes.full ? changes.templates : mergeTemplateChanges(cached.templates, changes);
+        console.log("[Tutu v3] Loaded user templates:", userTemplates.length, changes.full ? "(full)" : "(delta)");
         
         // Store in state
+        templateManagerState.userTemplatesCache = { revision: changes.revision, templates: userTemplates };
+        catalogCacheSet('user-templates', templateManagerState.userTemplatesCache);
         templateManagerState.allTemplates['user_custom'] = userTemplates;
-        templateManagerState.currentCategory = { id: 'user_custom', nameZh: '我的模板', nameEn: 'My Templates' };
         
         // Render
-        if (userTemplates.length === 0) {
-            list.innerHTML = `
-                <div class="info-message">
-                    <p><strong>还没有自定义模板</strong></p>
-                    <p>点击"创建新模板"添加您的第一个模板！</p>
-                </div>
-            `;
-        } else {
-            renderTemplateList(modal, userTemplates);
-        }
+        renderUserTemplates(modal, userTemplates);
         
     } catch (error) {
+        if (error.name === 'AbortError') {
+            return;
+        }
         console.error("[Tutu v3] Failed to load user templates:", error);
         list.innerHTML = `<div class="info-message error">加载用户模板失败：${error.message}</div>`;
     }
 }
 
+/**
+ * Apply a /tutu/user-templates/changes delta: changed records replace their
+ * old version in place, new ones are appended, tombstoned ids are removed
+ */
+function mergeTemplateChanges(templates, changes) {
+    const changed = new Map(changes.templates.map(tpl => [tpl.id, tpl]));
+    const deleted = new Set(changes.deleted);
+    const merged = templates
+        .filter(tpl => !deleted.has(tpl.id))
+        .map(tpl => {
+            const update = changed.get(tpl.id);
+            changed.delete(tpl.id);
+            return update || tpl;
+        });
+    return merged.concat(Array.from(changed.values()));
+}
+
+function renderUserTemplates(modal, userTemplates) {
+    const list = modal.querySelector('.template-list');
+    if (userTemplates.length === 0) {
+        list.innerHTML = `
+            <div class="info-message">
+                <p><strong>还没有自定义模板</strong></p>
+                <p>点击"创建新模板"添加您的第一个模板！</p>
+            </div>
+        `;
+        list._templateWindow = null;
+    } else {
+        renderTemplateList(modal, userTemplates);
+    }
+}
+
 /**
  * Open template editor (create or edit mode)
  */
@@ -1206,17 +1735,29 @@ function switchPromptLanguage(modal, lang) {
 }
 
 /**
- * Search templates across all categories
+ * Search templates across all categories (server-side, ranked)
+ * Built-in and user templates are searched together via /tutu/search,
+ * so results are not limited to categories that were already opened.
  */
-async function searchTemplates(modal, keyword) {
+async function searchTemplates(modal, keyword, append = false) {
     const list = modal.querySelector('.template-list');
     
+    // Any newer search (or clearing the box) makes in-flight responses stale
+    const requestId = ++templateManagerState.searchRequestId;
+    
     if (!keyword.trim()) {
+        templateManagerState.searchQuery = '';
+        templateManagerState.searchResults = [];
         // Clear search, restore current category view
         if (templateManagerState.currentCategory) {
-            const templates = templateManagerState.allTemplates[templateManagerState.currentCategory.id];
-            if (templates) {
-                renderTemplateList(modal, templates);
+            const category = templateManagerState.currentCategory;
+            if (templateManagerState.allTemplates[category.id]) {
+                renderCategoryTemplates(modal, category);
+            } else if (category.id === 'user_custom') {
+                // Its loading was cancelled by the search
+                loadUserTemplates(modal);
+            } else {
+                loadCategoryTemplates(modal, category);
             }
         }
         return;
@@ -1224,62 +1765,34 @@ async function searchTemplates(modal, keyword) {
     
     console.log("[Tutu v3] Searching for:", keyword);
     
-    // Show loading
-    list.innerHTML = '<div class="loading">搜索中...</div>';
+    if (!append) {
+        // Show loading
+        list.innerHTML = '<div class="loading">搜索中...</div>';
+        templateManagerState.searchResults = [];
+    }
+    
+    const signal = beginListLoad(append);
     
     try {
-        // Collect all templates from all loaded categories
-        let allTemplates = [];
-        for (const categoryId in templateManagerState.allTemplates) {
-            const templates = templateManagerState.allTemplates[categoryId];
-            allTemplates = allTemplates.concat(templates);
+        const offset = append ? templateManagerState.searchResults.length : 0;
+        const params = new URLSearchParams({ q: keyword, offset: offset, limit: SEARCH_PAGE_SIZE });
+        const response = await api.fetchApi(`/tutu/search?${params}`, { signal });
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.error || ''}`);
         }
+        const data = await response.json();
         
-        // If no templates are loaded yet, we need to load them first
-        if (allTemplates.length === 0) {
-            list.innerHTML = '<div class="info-message">请先选择一个分类以加载模板。</div>';
-            return;
+        if (requestId !== templateManagerState.searchRequestId) {
+            return; // superseded by a newer search
         }
         
-        // Search in title, description, and tags (case-insensitive)
-        const searchLower = keyword.toLowerCase();
-        const results = allTemplates.filter(template => {
-            // Search in title
-            if (template.title && template.title.toLowerCase().includes(searchLower)) {
-                return true;
-            }
-            
-            // Search in description (both languages)
-            if (template.description) {
-                if (template.description.zh && template.description.zh.toLowerCase().includes(searchLower)) {
-                    return true;
-                }
-                if (template.description.en && template.description.en.toLowerCase().includes(searchLower)) {
-                    return true;
-                }
-            }
-            
-            // Search in tags
-            if (template.tags && Array.isArray(template.tags)) {
-                if (template.tags.some(tag => tag.toLowerCase().includes(searchLower))) {
-                    return true;
-                }
-            }
-            
-            // Search in prompt text (both languages)
-            if (template.prompt) {
-                if (template.prompt.zh && template.prompt.zh.toLowerCase().includes(searchLower)) {
-                    return true;
-                }
-                if (template.prompt.en && template.prompt.en.toLowerCase().includes(searchLower)) {
-                    return true;
-                }
-            }
-            
-            return false;
-        });
+        templateManagerState.searchQuery = keyword;
+        templateManagerState.searchTotal = data.total;
+        templateManagerState.searchResults = templateManagerState.searchResults.concat(data.results);
+        const results = templateManagerState.searchResults;
         
-        console.log(`[Tutu v3] Found ${results.length} results for "${keyword}"`);
+        console.log(`[Tutu v3] Found ${data.total} results for "${keyword}"`);
         
         // Display results
         if (results.length === 0) {
@@ -1289,22 +1802,40 @@ async function searchTemplates(modal, keyword) {
                     <p>请尝试其他关键词或按分类浏览。</p>
                 </div>
             `;
-        } else {
-            // Render search results
-            renderTemplateList(modal, results);
-            
-            // Add search header
-            const searchHeader = document.createElement('div');
-            searchHeader.className = 'search-header';
-            searchHeader.innerHTML = `
-                <div style="padding: 10px; background: #2a2a2a; border-bottom: 1px solid #3a3a3a; color: #aaa; font-size: 13px;">
-                    找到 ${results.length} 个结果，关键词："${keyword}"
-                </div>
-            `;
-            list.insertBefore(searchHeader, list.firstChild);
+            return;
+        }
+        
+        // Render search results
+        renderTemplateList(modal, results);
+        
+        // Add search header
+        const searchHeader = document.createElement('div');
+        searchHeader.className = 'search-header';
+        searchHeader.innerHTML = `
+            <div style="padding: 10px; background: #2a2a2a; border-bottom: 1px solid #3a3a3a; color: #aaa; font-size: 13px;">
+                找到 ${data.total} 个结果，关键词："${keyword}"
+            </div>
+        `;
+        list.insertBefore(searchHeader, list.firstChild);
+        
+        // Load more
+        if (results.length < data.total) {
+            const moreBtn = document.createElement('button');
+            moreBtn.className = 'search-load-more';
+            moreBtn.style.cssText = 'display: block; width: 100%; padding: 10px; background: #2a2a2a; border: none; border-top: 1px solid #3a3a3a; color: #aaa; cursor: pointer;';
+            moreBtn.textContent = `加载更多（已显示 ${results.length} / ${data.total}）`;
+            moreBtn.addEventListener('click', () => {
+                moreBtn.disabled = true;
+                moreBtn.textContent = '加载中...';
+                searchTemplates(modal, keyword, true);
+            });
+            list.appendChild(moreBtn);
         }
         
     } catch (error) {
+        if (requestId !== templateManagerState.searchRequestId || error.name === 'AbortError') {
+            return;
+        }
         console.error("[Tutu v3] Search error:", error);
         list.innerHTML = `<div class="info-message error">搜索失败：${error.message}</div>`;
     }